@@ -1,8 +1,10 @@
+from .api import _render_baseline
 from .api import _render_migration_diffs
 from .api import compare_metadata
 from .api import produce_migrations
 from .api import render_python_code
 from .api import RevisionContext
+from .api import table_fingerprints
 from .compare import _produce_net_changes
 from .compare import comparators
 from .render import render_op_text
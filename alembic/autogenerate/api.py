@@ -1,19 +1,25 @@
 from __future__ import annotations
 
 import contextlib
+import copy
 from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import Iterator
+from typing import List
+from typing import Mapping
 from typing import Optional
 from typing import Sequence
 from typing import Set
+from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
 
 from sqlalchemy import inspect
+from sqlalchemy import MetaData
 
 from . import compare
+from . import fingerprint
 from . import render
 from .. import util
 from ..operations import ops
@@ -25,7 +31,6 @@ if TYPE_CHECKING:
     from sqlalchemy.engine import Connection
     from sqlalchemy.engine import Dialect
     from sqlalchemy.engine import Inspector
-    from sqlalchemy.sql.schema import MetaData
     from sqlalchemy.sql.schema import SchemaItem
 
     from ..config import Config
@@ -40,7 +45,11 @@ if TYPE_CHECKING:
     from ..script.base import ScriptDirectory
 
 
-def compare_metadata(context: MigrationContext, metadata: MetaData) -> Any:
+def compare_metadata(
+    context: MigrationContext,
+    metadata: MetaData,
+    fingerprints: Optional[Mapping[str, str]] = None,
+) -> Any:
     """Compare a database schema to that given in a
     :class:`~sqlalchemy.schema.MetaData` instance.
 
@@ -153,6 +162,13 @@ def compare_metadata(context: MigrationContext, metadata: MetaData) -> Any:
      instance.
     :param metadata: a :class:`~sqlalchemy.schema.MetaData`
      instance.
+    :param fingerprints: optional dictionary of table fingerprints, as
+     returned by :func:`.table_fingerprints` for the metadata as of a
+     previous comparison.  Tables present both in the database and the
+     metadata whose fingerprint is unchanged are neither reflected nor
+     compared.
+
+     .. versionadded:: 1.12.0
 
     .. seealso::
 
@@ -161,12 +177,16 @@ def compare_metadata(context: MigrationContext, metadata: MetaData) -> Any:
 
     """
 
-    migration_script = produce_migrations(context, metadata)
+    migration_script = produce_migrations(
+        context, metadata, fingerprints=fingerprints
+    )
     return migration_script.upgrade_ops.as_diffs()
 
 
 def produce_migrations(
-    context: MigrationContext, metadata: MetaData
+    context: MigrationContext,
+    metadata: MetaData,
+    fingerprints: Optional[Mapping[str, str]] = None,
 ) -> MigrationScript:
     """Produce a :class:`.MigrationScript` structure based on schema
     comparison.
@@ -176,6 +196,12 @@ def produce_migrations(
     :class:`.MigrationScript` object.   For an example of what this looks like,
     see the example in :ref:`customizing_revision`.
 
+    :param fingerprints: optional dictionary of table fingerprints, as
+     returned by :func:`.table_fingerprints`; see
+     :paramref:`.compare_metadata.fingerprints`.
+
+     .. versionadded:: 1.12.0
+
     .. seealso::
 
         :func:`.compare_metadata` - returns more fundamental "diff"
@@ -184,6 +210,7 @@ def produce_migrations(
     """
 
     autogen_context = AutogenContext(context, metadata=metadata)
+    autogen_context._previous_fingerprints = fingerprints
 
     migration_script = ops.MigrationScript(
         rev_id=None,
@@ -196,6 +223,35 @@ def produce_migrations(
     return migration_script
 
 
+def table_fingerprints(
+    context: MigrationContext, metadata: MetaData
+) -> Dict[str, str]:
+    """Return a fingerprint of each :class:`~sqlalchemy.schema.Table` of
+    the given :class:`~sqlalchemy.schema.MetaData`, keyed on the table
+    key.
+
+    The fingerprint is a hash of the ``op.create_table()`` and
+    ``op.create_index()`` directives autogenerate would render for the
+    table, so that it changes whenever a column, type, constraint or index
+    of the table changes.  Fingerprints taken when the database matched
+    the metadata may be passed to :func:`.compare_metadata` or
+    :func:`.produce_migrations` to compare only those tables which
+    changed since.
+
+    .. versionadded:: 1.12.0
+
+    .. seealso::
+
+        :paramref:`.EnvironmentContext.configure.table_fingerprints`
+
+    """
+
+    autogen_context = AutogenContext(
+        context, metadata=metadata, autogenerate=False
+    )
+    return autogen_context._table_fingerprints
+
+
 def render_python_code(
     up_or_down_op: Union[UpgradeOps, DowngradeOps],
     sqlalchemy_module_prefix: str = "sa.",
@@ -268,6 +324,45 @@ def _render_migration_diffs(
     )
 
 
+def _render_baseline(
+    context: MigrationContext, template_args: Dict[Any, Any]
+) -> None:
+    """Render the operations which create the schema present in the
+    database from an empty database, used by the ``squash`` command.
+
+    """
+    from ..runtime.migration import MigrationContext
+
+    if context.as_sql or context.connection is None:
+        raise util.CommandError(
+            "The schema to squash is reflected from the database, which "
+            "requires a database connection; it can't be used in offline "
+            "mode"
+        )
+
+    metadata = MetaData()
+    metadata.reflect(
+        context.connection,
+        only=lambda name, metadata: name != context.version_table,
+    )
+
+    def include_name(name, type_, parent_names):
+        # don't reflect any tables, so that the reflected schema is
+        # compared to an empty database
+        return type_ != "table"
+
+    empty_context = MigrationContext.configure(
+        connection=context.connection,
+        opts=dict(context.opts, include_name=include_name),
+    )
+    migration_script = produce_migrations(empty_context, metadata)
+
+    autogen_context = AutogenContext(empty_context, metadata=metadata)
+    render._render_python_into_templatevars(
+        autogen_context, migration_script, template_args
+    )
+
+
 class AutogenContext:
     """Maintains configuration and state that's specific to an
     autogenerate operation."""
@@ -324,6 +419,8 @@ class AutogenContext:
     migration_context: MigrationContext = None  # type: ignore[assignment]
     """The :class:`.MigrationContext` established by the ``env.py`` script."""
 
+    _previous_fingerprints: Optional[Mapping[str, str]] = None
+
     def __init__(
         self,
         migration_context: MigrationContext,
@@ -382,16 +479,57 @@ class AutogenContext:
         self.imports = set()
         self.opts: Dict[str, Any] = opts
         self._has_batch: bool = False
+        self._reflection_info: Dict[Optional[str], Any] = {}
+        self._reflected_records: Dict[
+            Tuple[str, Optional[str]], Dict[Any, List[Dict[str, Any]]]
+        ] = {}
+        self._deferred_server_defaults: Optional[List[Any]] = None
 
     @util.memoized_property
     def inspector(self) -> Inspector:
-        if self.connection is None:
+        if (
+            self.connection is None
+            and self.migration_context is not None
+            and self.migration_context._schema_snapshot_path
+        ):
+            from .snapshot import SnapshotInspector
+
+            # provides the Inspector methods autogenerate uses
+            return SnapshotInspector(  # type: ignore[return-value]
+                self.migration_context._load_schema_snapshot(),
+                self.migration_context.dialect,
+            )
+        elif self.connection is None:
             raise TypeError(
                 "can't return inspector as this "
                 "AutogenContext has no database connection"
             )
         return inspect(self.connection)
 
+    @util.memoized_property
+    def _table_fingerprints(self) -> Dict[str, str]:
+        return fingerprint.metadata_fingerprints(self)
+
+    def _for_connection(self, connection: Connection) -> AutogenContext:
+        """Return a copy of this context which uses the given connection,
+        along with a :class:`.MigrationContext` of its own, so that it may
+        be used within another thread."""
+
+        from ..runtime.migration import MigrationContext
+
+        migration_context = self.migration_context
+        context = copy.copy(self)
+        context.__dict__.pop("inspector", None)
+        context.migration_context = MigrationContext(
+            migration_context.dialect,
+            connection,
+            migration_context.opts,
+            migration_context.environment_context,
+        )
+        context.connection = connection
+        context.imports = set()
+        return context
+
     @contextlib.contextmanager
     def _within_batch(self) -> Iterator[None]:
         self._has_batch = True
@@ -523,6 +661,7 @@ class RevisionContext:
             # e.g. multiple databases
         }
         self.generated_revisions = [self._default_revision()]
+        self._table_fingerprints: Dict[str, Dict[str, str]] = {}
 
     def _to_script(
         self, migration_script: MigrationScript
@@ -542,7 +681,7 @@ class RevisionContext:
             )
 
         assert migration_script.rev_id is not None
-        return self.script_directory.generate_revision(
+        script = self.script_directory.generate_revision(
             migration_script.rev_id,
             migration_script.message,
             refresh=True,
@@ -553,6 +692,12 @@ class RevisionContext:
             depends_on=migration_script.depends_on,
             **template_args,
         )
+        if script is not None and self._table_fingerprints:
+            fingerprint.write_fingerprints(
+                fingerprint.fingerprints_path(script.path),
+                self._table_fingerprints,
+            )
+        return script
 
     def run_autogenerate(
         self, rev: tuple, migration_context: MigrationContext
@@ -604,9 +749,29 @@ class RevisionContext:
         self._last_autogen_context: AutogenContext = autogen_context
 
         if autogenerate:
+            use_fingerprints = migration_context.opts.get(
+                "table_fingerprints", False
+            )
+            if use_fingerprints:
+                autogen_context._previous_fingerprints = (
+                    fingerprint.load_fingerprints(
+                        [
+                            fingerprint.fingerprints_path(script.path)
+                            for script in self.script_directory.get_revisions(
+                                rev
+                            )
+                            if script is not None
+                        ],
+                        upgrade_token,
+                    )
+                )
             compare._populate_migration_script(
                 autogen_context, migration_script
             )
+            if use_fingerprints:
+                self._table_fingerprints[
+                    upgrade_token
+                ] = autogen_context._table_fingerprints
 
         if self.process_revision_directives:
             self.process_revision_directives(
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import logging
 import re
@@ -16,7 +17,7 @@ from typing import TYPE_CHECKING
 from typing import Union
 
 from sqlalchemy import event
-from sqlalchemy import inspect
+from sqlalchemy import pool
 from sqlalchemy import schema as sa_schema
 from sqlalchemy import text
 from sqlalchemy import types as sqltypes
@@ -66,13 +67,11 @@ comparators = util.Dispatcher(uselist=True)
 def _produce_net_changes(
     autogen_context: AutogenContext, upgrade_ops: UpgradeOps
 ) -> None:
-    connection = autogen_context.connection
-    assert connection is not None
     include_schemas = autogen_context.opts.get("include_schemas", False)
 
-    inspector: Inspector = inspect(connection)
+    inspector = autogen_context.inspector
 
-    default_schema = connection.dialect.default_schema_name
+    default_schema = inspector.default_schema_name
     schemas: Set[Optional[str]]
     if include_schemas:
         schemas = set(inspector.get_schema_names())
@@ -128,6 +127,11 @@ def _autogen_for_tables(
         [(table.schema, table.name) for table in autogen_context.sorted_tables]
     ).difference([(version_table_schema, version_table)])
 
+    if autogen_context._previous_fingerprints is not None:
+        _skip_unchanged_tables(
+            autogen_context, inspector, conn_table_names, metadata_table_names
+        )
+
     _compare_tables(
         conn_table_names,
         metadata_table_names,
@@ -137,6 +141,39 @@ def _autogen_for_tables(
     )
 
 
+def _skip_unchanged_tables(
+    autogen_context: AutogenContext,
+    inspector: Inspector,
+    conn_table_names: Set[Tuple[Optional[str], str]],
+    metadata_table_names: OrderedSet,
+) -> None:
+    """Remove the tables present both in the database and the metadata
+    whose fingerprint matches that of the previous revision, so that
+    they're neither reflected nor compared."""
+
+    previous = autogen_context._previous_fingerprints
+    assert previous is not None
+    fingerprints = autogen_context._table_fingerprints
+    default_schema = inspector.default_schema_name
+
+    skipped = 0
+    for schema, tname in list(metadata_table_names):
+        key = sa_schema._get_table_key(tname, schema)
+        conn_name = (schema if schema != default_schema else None, tname)
+        if conn_name in conn_table_names and previous.get(
+            key
+        ) == fingerprints.get(key):
+            metadata_table_names.discard((schema, tname))
+            conn_table_names.discard(conn_name)
+            skipped += 1
+
+    if skipped:
+        log.info(
+            "Skipped %d table(s) unchanged since the previous revision",
+            skipped,
+        )
+
+
 def _compare_tables(
     conn_table_names: set,
     metadata_table_names: set,
@@ -144,7 +181,7 @@ def _compare_tables(
     upgrade_ops: UpgradeOps,
     autogen_context: AutogenContext,
 ) -> None:
-    default_schema = inspector.bind.dialect.default_schema_name
+    default_schema = inspector.default_schema_name
 
     # tables coming from the connection will not have "schema"
     # set if it matches default_schema_name; so we need a list
@@ -194,6 +231,27 @@ def _compare_tables(
             if not modify_table_ops.is_empty():
                 upgrade_ops.ops.append(modify_table_ops)
 
+    # reflect the tables present in the database all at once, per schema,
+    # where SQLAlchemy supports it, along with the indexes, unique
+    # constraints and foreign keys to compare
+    reflection_info = autogen_context._reflection_info
+    reflected_records = autogen_context._reflected_records
+    for s in {schema for schema, tname in conn_table_names}:
+        table_names = [
+            tname for schema, tname in conn_table_names if schema == s
+        ]
+        info = sqla_compat._get_reflection_info(
+            inspector, s, table_names, table_names
+        )
+        if info is not None:
+            reflection_info[s] = info
+        for kind in ("indexes", "unique_constraints", "foreign_keys"):
+            records = sqla_compat._get_multi_reflected(
+                inspector, kind, s, table_names
+            )
+            if records is not None:
+                reflected_records[(kind, s)] = records
+
     removal_metadata = sa_schema.MetaData()
     for s, tname in conn_table_names.difference(metadata_table_names):
         name = sa_schema._get_table_key(tname, s)
@@ -210,7 +268,7 @@ def _compare_tables(
                 (inspector),
                 # fmt: on
             )
-            sqla_compat._reflect_table(inspector, t)
+            sqla_compat._reflect_table(inspector, t, reflection_info.get(s))
         if autogen_context.run_object_filters(t, tname, "table", True, None):
             modify_table_ops = ops.ModifyTableOps(tname, [], schema=s)
 
@@ -240,39 +298,220 @@ def _compare_tables(
                 _compat_autogen_column_reflect(inspector),
                 # fmt: on
             )
-            sqla_compat._reflect_table(inspector, t)
+            sqla_compat._reflect_table(inspector, t, reflection_info.get(s))
         conn_column_info[(s, tname)] = t
 
-    for s, tname in sorted(existing_tables, key=lambda x: (x[0] or "", x[1])):
-        s = s or None
-        name = "%s.%s" % (s, tname) if s else tname
-        metadata_table = tname_to_table[(s, tname)]
-        conn_table = existing_metadata.tables[name]
+    compare_tables = [
+        (
+            s or None,
+            tname,
+            tname_to_table[(s or None, tname)],
+            existing_metadata.tables[
+                sa_schema._get_table_key(tname, s or None)
+            ],
+        )
+        for s, tname in sorted(
+            existing_tables, key=lambda x: (x[0] or "", x[1])
+        )
+    ]
 
-        if autogen_context.run_object_filters(
-            metadata_table, tname, "table", False, conn_table
+    # server default comparisons which are made by the server are
+    # collected while the tables are compared, then evaluated at once
+    if autogen_context.connection is not None:
+        autogen_context._deferred_server_defaults = []
+
+    workers = autogen_context.opts.get("compare_workers", 1)
+    try:
+        if (
+            workers > 1
+            and len(compare_tables) > 1
+            and _can_compare_concurrently(autogen_context)
         ):
-            modify_table_ops = ops.ModifyTableOps(tname, [], schema=s)
-            with _compare_columns(
-                s,
-                tname,
-                conn_table,
-                metadata_table,
-                modify_table_ops,
-                autogen_context,
-                inspector,
-            ):
-                comparators.dispatch("table")(
-                    autogen_context,
-                    modify_table_ops,
-                    s,
-                    tname,
-                    conn_table,
-                    metadata_table,
-                )
+            results = _compare_tables_concurrently(
+                autogen_context, compare_tables, workers
+            )
+        else:
+            results = [
+                _compare_table(autogen_context, inspector, *table)
+                for table in compare_tables
+            ]
+    finally:
+        deferred = autogen_context._deferred_server_defaults
+        autogen_context._deferred_server_defaults = None
 
-            if not modify_table_ops.is_empty():
-                upgrade_ops.ops.append(modify_table_ops)
+    if deferred:
+        _compare_deferred_server_defaults(autogen_context, deferred, results)
+
+    for result in results:
+        if result is not None and not result.is_empty():
+            upgrade_ops.ops.append(result)
+
+
+def _can_compare_concurrently(autogen_context: AutogenContext) -> bool:
+    """Return True if other connections of the engine of the context's
+    connection see the same database as that connection, so that
+    tables may be compared using them.
+
+    That's not the case when the connection was in a transaction when
+    the context was configured, which may include changes the others
+    can't see, when execution options such as ``schema_translate_map``
+    were set upon the connection, or when the engine's pool shares a
+    single connection, such as for a SQLite ``:memory:`` database.  As
+    SQLAlchemy begins a transaction as soon as the connection is used,
+    the transaction is checked for as of when the context was configured,
+    as :meth:`.MigrationContext.begin_transaction` does.
+
+    """
+    connection = autogen_context.connection
+    if connection is None:
+        return False
+
+    engine = connection.engine
+    if autogen_context.migration_context._in_external_transaction:
+        reason = "the connection is in a transaction"
+    elif dict(connection.get_execution_options()) != dict(
+        engine.get_execution_options()
+    ):
+        reason = "execution options are set upon the connection"
+    elif isinstance(engine.pool, (pool.SingletonThreadPool, pool.StaticPool)):
+        reason = "the engine's pool shares a single connection"
+    else:
+        return True
+
+    log.info("Comparing tables serially, as %s", reason)
+    return False
+
+
+def _compare_deferred_server_defaults(
+    autogen_context: AutogenContext,
+    deferred: List[Tuple[AlterColumnOp, Any, str, str]],
+    results: List[Optional[ModifyTableOps]],
+) -> None:
+    """Evaluate the server default comparisons deferred by
+    :func:`._compare_server_default`, removing the column operations
+    whose defaults turn out to be equal and which change nothing else."""
+
+    equal = autogen_context.migration_context.impl._server_defaults_equal(
+        [comparison for alter_column_op, comparison, tname, cname in deferred]
+    )
+
+    unchanged = set()
+    for (alter_column_op, comparison, tname, cname), is_equal in zip(
+        deferred, equal
+    ):
+        if is_equal:
+            alter_column_op.modify_server_default = False
+            if not alter_column_op.has_changes():
+                unchanged.add(alter_column_op)
+        else:
+            log.info("Detected server default on column '%s.%s'", tname, cname)
+
+    if unchanged:
+        for modify_table_ops in results:
+            if modify_table_ops is not None:
+                modify_table_ops.ops = [
+                    op for op in modify_table_ops.ops if op not in unchanged
+                ]
+
+
+def _compare_table(
+    autogen_context: AutogenContext,
+    inspector: Inspector,
+    schema: Optional[str],
+    tname: Union[quoted_name, str],
+    metadata_table: Table,
+    conn_table: Table,
+) -> Optional[ModifyTableOps]:
+    if not autogen_context.run_object_filters(
+        metadata_table, tname, "table", False, conn_table
+    ):
+        return None
+
+    modify_table_ops = ops.ModifyTableOps(tname, [], schema=schema)
+    with _compare_columns(
+        schema,
+        tname,
+        conn_table,
+        metadata_table,
+        modify_table_ops,
+        autogen_context,
+        inspector,
+    ):
+        comparators.dispatch("table")(
+            autogen_context,
+            modify_table_ops,
+            schema,
+            tname,
+            conn_table,
+            metadata_table,
+        )
+    return modify_table_ops
+
+
+def _compare_tables_concurrently(
+    autogen_context: AutogenContext,
+    compare_tables: List[
+        Tuple[Optional[str], Union[quoted_name, str], Table, Table]
+    ],
+    workers: int,
+) -> List[Optional[ModifyTableOps]]:
+    """Compare tables within a pool of threads, as configured by
+    :paramref:`.EnvironmentContext.configure.compare_workers`, returning
+    the results in the order of the given tables.
+
+    Each thread compares its share of the tables using its own
+    connection from the engine of the context's connection.
+
+    """
+    assert autogen_context.connection is not None
+    engine = autogen_context.connection.engine
+    workers = min(workers, len(compare_tables))
+
+    def compare_share(
+        share: int,
+    ) -> Tuple[List[Optional[ModifyTableOps]], Set[str]]:
+        with engine.connect() as connection:
+            context = autogen_context._for_connection(connection)
+            inspector = context.inspector
+            return [
+                _compare_table(context, inspector, *table)
+                for table in compare_tables[share::workers]
+            ], context.imports
+
+    log.info(
+        "Comparing %d tables using %d workers", len(compare_tables), workers
+    )
+    with ThreadPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(compare_share, share) for share in range(workers)
+        ]
+
+    results: List[Optional[ModifyTableOps]] = [None] * len(compare_tables)
+    for share, future in enumerate(futures):
+        share_results, imports = future.result()
+        results[share::workers] = share_results
+        autogen_context.imports.update(imports)
+    return results
+
+
+def _get_reflected(
+    autogen_context: AutogenContext,
+    kind: str,
+    tname: Union[quoted_name, str],
+    schema: Optional[str],
+) -> List[Dict[str, Any]]:
+    """Return the inspector records of the given kind, such as
+    ``"indexes"``, for a table, from those reflected all at once by
+    :func:`._compare_tables` if present, else from the inspector."""
+
+    reflected = autogen_context._reflected_records.get((kind, schema))
+    if reflected is not None:
+        records = reflected.get((schema, tname))
+        if records is not None:
+            return records
+    return getattr(autogen_context.inspector, "get_%s" % kind)(
+        tname, schema=schema
+    )
 
 
 _IndexColumnSortingOps: Mapping[str, Any] = util.immutabledict(
@@ -563,8 +802,8 @@ def _compare_indexes_and_uniques(
         # 1b. ... and from connection, if the table exists
         if hasattr(inspector, "get_unique_constraints"):
             try:
-                conn_uniques = inspector.get_unique_constraints(  # type:ignore[assignment] # noqa
-                    tname, schema=schema
+                conn_uniques = _get_reflected(  # type:ignore[assignment]
+                    autogen_context, "unique_constraints", tname, schema
                 )
                 supports_unique_constraints = True
             except NotImplementedError:
@@ -588,8 +827,8 @@ def _compare_indexes_and_uniques(
                     if uq.get("duplicates_index"):
                         unique_constraints_duplicate_unique_indexes = True
         try:
-            conn_indexes = inspector.get_indexes(  # type:ignore[assignment]
-                tname, schema=schema
+            conn_indexes = _get_reflected(  # type:ignore[assignment]
+                autogen_context, "indexes", tname, schema
             )
         except NotImplementedError:
             pass
@@ -1196,13 +1435,22 @@ def _compare_server_default(
 
         alter_column_op.existing_server_default = conn_col_default
 
+        deferred = autogen_context._deferred_server_defaults
         is_diff = autogen_context.migration_context._compare_server_default(
             conn_col,
             metadata_col,
             rendered_metadata_default,
             rendered_conn_default,
+            defer=deferred is not None,
         )
-        if is_diff:
+        if isinstance(is_diff, expression.ClauseElement):
+            # to be evaluated by the server once all tables are compared;
+            # until then the default is taken to have changed, so that
+            # the operation is kept
+            assert deferred is not None
+            deferred.append((alter_column_op, is_diff, tname, cname))
+            alter_column_op.modify_server_default = metadata_default
+        elif is_diff:
             alter_column_op.modify_server_default = metadata_default
             log.info("Detected server default on column '%s.%s'", tname, cname)
 
@@ -1251,7 +1499,6 @@ def _compare_foreign_keys(
     if conn_table is None or metadata_table is None:
         return
 
-    inspector = autogen_context.inspector
     metadata_fks = {
         fk
         for fk in metadata_table.constraints
@@ -1260,7 +1507,9 @@ def _compare_foreign_keys(
 
     conn_fks_list = [
         fk
-        for fk in inspector.get_foreign_keys(tname, schema=schema)
+        for fk in _get_reflected(
+            autogen_context, "foreign_keys", tname, schema
+        )
         if autogen_context.run_name_filters(
             fk["name"],
             "foreign_key_constraint",
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import os
+from typing import Dict
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+from . import render
+from ..operations import ops
+
+if TYPE_CHECKING:
+    from sqlalchemy.sql.schema import Table
+
+    from .api import AutogenContext
+
+log = logging.getLogger(__name__)
+
+FINGERPRINTS_VERSION = 1
+
+FINGERPRINTS_SUFFIX = ".fingerprints.json"
+
+
+def table_fingerprint(autogen_context: AutogenContext, table: Table) -> str:
+    """Return a hash of the given :class:`~sqlalchemy.schema.Table`,
+    as the ``op.create_table()`` and ``op.create_index()`` directives
+    autogenerate renders for it.
+
+    The hash changes whenever a column, type, server default, constraint,
+    index or comment of the table changes.
+
+    """
+    rendered = [
+        render.render_op_text(
+            autogen_context, ops.CreateTableOp.from_table(table)
+        )
+    ]
+    rendered.extend(
+        sorted(
+            render.render_op_text(
+                autogen_context, ops.CreateIndexOp.from_index(index)
+            )
+            for index in table.indexes
+        )
+    )
+    return hashlib.sha1("\n".join(rendered).encode("utf-8")).hexdigest()
+
+
+def metadata_fingerprints(autogen_context: AutogenContext) -> Dict[str, str]:
+    """Return the fingerprint of each table of the target metadata,
+    keyed on the table key."""
+
+    # tables are rendered with the default module prefixes, so that the
+    # fingerprints don't depend on those configured; rendering also adds
+    # to the imports of the context, which are those of the script being
+    # generated
+    context = copy.copy(autogen_context)
+    context.opts = {
+        "sqlalchemy_module_prefix": "sa.",
+        "alembic_module_prefix": "op.",
+        "user_module_prefix": None,
+        "render_as_batch": False,
+        "render_item": autogen_context.opts.get("render_item"),
+    }
+    context.imports = set()
+    return {
+        key: table_fingerprint(context, table)
+        for key, table in autogen_context.table_key_to_table.items()
+    }
+
+
+def fingerprints_path(script_path: str) -> str:
+    """Return the path of the fingerprints file stored alongside the
+    revision file at ``script_path``."""
+
+    return os.path.splitext(script_path)[0] + FINGERPRINTS_SUFFIX
+
+
+def write_fingerprints(
+    path: str, fingerprints: Mapping[str, Mapping[str, str]]
+) -> None:
+    """Write the table fingerprints of each upgrade token to the
+    fingerprints file at ``path``."""
+
+    document = {
+        "version": FINGERPRINTS_VERSION,
+        "fingerprints": {
+            token: dict(sorted(tables.items()))
+            for token, tables in sorted(fingerprints.items())
+        },
+    }
+    with open(path, "w", encoding="utf-8") as file_:
+        json.dump(document, file_, indent=1)
+        file_.write("\n")
+
+
+def load_fingerprints(
+    paths: Sequence[str], upgrade_token: str
+) -> Optional[Dict[str, str]]:
+    """Load the table fingerprints stored for the given upgrade token
+    in the fingerprints files at ``paths``.
+
+    Only the fingerprints on which all of the files agree are returned.
+    ``None`` is returned if there are no files or any of them is missing
+    or can't be read, in which case all tables are to be compared.
+
+    """
+    result: Optional[Dict[str, str]] = None
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as file_:
+                document = json.load(file_)
+        except FileNotFoundError:
+            log.info("No table fingerprints at %s", path)
+            return None
+        except ValueError as err:
+            log.warning("Table fingerprints %s can't be read: %s", path, err)
+            return None
+
+        if document.get("version") != FINGERPRINTS_VERSION:
+            log.info("Table fingerprints %s are of another version", path)
+            return None
+
+        fingerprints = document["fingerprints"].get(upgrade_token)
+        if fingerprints is None:
+            return None
+        elif result is None:
+            result = dict(fingerprints)
+        else:
+            result = {
+                key: value
+                for key, value in result.items()
+                if fingerprints.get(key) == value
+            }
+    return result
@@ -0,0 +1,658 @@
+from __future__ import annotations
+
+import ast
+import importlib
+import json
+import logging
+import os
+import re
+from typing import Any
+from typing import Collection
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from sqlalchemy import dialects as sa_dialects
+from sqlalchemy import exc
+from sqlalchemy import inspect
+from sqlalchemy import schema as sa_schema
+from sqlalchemy import sql
+from sqlalchemy import types as sqltypes
+from sqlalchemy.sql.elements import TextClause
+
+from .compare import _IndexColumnSortingOps
+from .. import util
+from ..util import sqla_compat
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+    from sqlalchemy.engine import Dialect
+    from sqlalchemy.engine.reflection import Inspector
+    from sqlalchemy.sql.schema import Column
+    from sqlalchemy.sql.schema import Table
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+# the kinds of reflected records stored for each table, each of which
+# is returned by the Inspector method "get_<kind>()"
+_KINDS = (
+    "columns",
+    "pk_constraint",
+    "foreign_keys",
+    "indexes",
+    "unique_constraints",
+    "check_constraints",
+    "table_comment",
+    "table_options",
+)
+
+
+def write_snapshot(
+    connection: Connection,
+    path: str,
+    heads: Iterable[str] = (),
+    include_schemas: bool = False,
+) -> None:
+    """Reflect the tables of the database and write them, along with the
+    given version heads, to a schema snapshot file at ``path``.
+
+    The tables of the default schema are reflected; if
+    ``include_schemas`` is True, those of all schemas are reflected.
+    The file is replaced once it's been written in full.
+
+    """
+    inspector = inspect(connection)
+    default_schema = inspector.default_schema_name
+
+    schemas: List[Optional[str]] = [None]
+    schema_names: List[str] = []
+    if include_schemas:
+        schema_names = inspector.get_schema_names()
+        schemas.extend(
+            name
+            for name in schema_names
+            if name not in (default_schema, "information_schema")
+        )
+
+    tables = []
+    for schema in schemas:
+        table_names = sorted(inspector.get_table_names(schema=schema))
+        if not table_names:
+            continue
+        info = sqla_compat._get_reflection_info(
+            inspector, schema, table_names, table_names
+        )
+        for tname in table_names:
+            table: Dict[str, Any] = {"schema": schema, "name": tname}
+            for kind in _KINDS:
+                records = _reflect(inspector, info, kind, schema, tname)
+                if records is not None:
+                    table[kind] = _encode(records)
+            tables.append(table)
+
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "dialect": connection.dialect.name,
+        "default_schema_name": default_schema,
+        "schema_names": schema_names,
+        "heads": list(heads),
+        "tables": tables,
+    }
+
+    tmp_path = "%s.tmp" % path
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file_:
+            json.dump(snapshot, file_, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    log.info("Wrote schema snapshot of %d tables to %s", len(tables), path)
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """Load a schema snapshot file written by :func:`.write_snapshot`."""
+
+    try:
+        with open(path, encoding="utf-8") as file_:
+            snapshot = json.load(file_)
+    except FileNotFoundError as err:
+        raise util.CommandError(
+            "Schema snapshot %s doesn't exist; it's written when migrations "
+            "are run against the database" % path
+        ) from err
+    except ValueError as err:
+        raise util.CommandError(
+            "Schema snapshot %s can't be read: %s" % (path, err)
+        ) from err
+
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise util.CommandError(
+            "Schema snapshot %s has version %r; expected %r"
+            % (path, snapshot.get("version"), SNAPSHOT_VERSION)
+        )
+    return snapshot
+
+
+def _reflect(
+    inspector: Inspector,
+    info: Any,
+    kind: str,
+    schema: Optional[str],
+    tname: str,
+) -> Any:
+    if info is not None:
+        records = getattr(info, kind).get((schema, tname))
+        if records is not None:
+            return records
+    try:
+        return getattr(inspector, "get_%s" % kind)(tname, schema=schema)
+    except NotImplementedError:
+        return None
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    elif isinstance(value, sqltypes.TypeEngine):
+        return _encode_type(value)
+    elif isinstance(value, TextClause):
+        return value.text
+    elif value is None or isinstance(value, (str, int, float)):
+        return value
+    else:
+        return str(value)
+
+
+def _encode_type(type_: sqltypes.TypeEngine) -> Dict[str, Any]:
+    """Encode a type as its class name along with the arguments of its
+    ``repr()``, which are taken as literals."""
+
+    mod = type(type_).__module__
+    match = re.match(r"sqlalchemy\.dialects\.(\w+)", mod)
+    if not match and not mod.startswith("sqlalchemy."):
+        # a type from a third party library; it's restored as NullType
+        return {"__type__": None}
+
+    try:
+        encoded = _encode_type_expr(ast.parse(repr(type_), mode="eval").body)
+    except (SyntaxError, ValueError):
+        log.warning(
+            "Type %r can't be recorded in schema snapshot; it will be "
+            "restored as NullType",
+            type_,
+        )
+        return {"__type__": None}
+    if match:
+        encoded["dialect"] = match.group(1)
+    return encoded
+
+
+def _encode_type_expr(node: ast.expr) -> Any:
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise ValueError("unsupported type expression")
+        encoded: Dict[str, Any] = {"__type__": node.func.id}
+        if node.args:
+            encoded["args"] = [_encode_type_expr(arg) for arg in node.args]
+        if node.keywords:
+            encoded["kwargs"] = {
+                keyword.arg: _encode_type_expr(keyword.value)
+                for keyword in node.keywords
+            }
+        return encoded
+    elif isinstance(node, (ast.List, ast.Tuple)):
+        return [_encode_type_expr(elt) for elt in node.elts]
+    else:
+        value = ast.literal_eval(node)
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError("unsupported type argument")
+        return value
+
+
+def _type_class(name: str, dialect: Optional[str]) -> Optional[type]:
+    """Return the type class of the given name, from the SQLAlchemy
+    dialect module named if any, otherwise from ``sqlalchemy.types``."""
+
+    modules: List[Any] = []
+    if dialect is not None and dialect in sa_dialects.__all__:
+        modules.append(
+            importlib.import_module("sqlalchemy.dialects.%s" % dialect)
+        )
+    modules.append(sqltypes)
+
+    if not name.startswith("_"):
+        for module in modules:
+            cls = getattr(module, name, None)
+            if isinstance(cls, type) and issubclass(cls, sqltypes.TypeEngine):
+                return cls
+    return None
+
+
+class SnapshotInspector:
+    """Provides the methods of an
+    :class:`~sqlalchemy.engine.reflection.Inspector` used by autogenerate,
+    returning the tables recorded by a schema snapshot rather than querying
+    a database, so that autogenerate may compare against a snapshot with
+    no database connection.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    def __init__(self, snapshot: Dict[str, Any], dialect: Dialect) -> None:
+        if not sqla_compat.sqla_2:
+            raise util.CommandError(
+                "Autogenerating from a schema snapshot requires "
+                "SQLAlchemy 2.0 or greater"
+            )
+        if snapshot["dialect"] != dialect.name:
+            raise util.CommandError(
+                "Schema snapshot was written for dialect %r; the %r "
+                "dialect is in use" % (snapshot["dialect"], dialect.name)
+            )
+
+        self.dialect = dialect
+        self.snapshot = snapshot
+        self._tables: Dict[Tuple[Optional[str], str], Dict[str, Any]] = {
+            (table["schema"], table["name"]): table
+            for table in snapshot["tables"]
+        }
+
+    @property
+    def default_schema_name(self) -> Optional[str]:
+        return self.snapshot["default_schema_name"]
+
+    def get_schema_names(self, **kw: Any) -> List[str]:
+        return list(self.snapshot["schema_names"])
+
+    def get_table_names(
+        self, schema: Optional[str] = None, **kw: Any
+    ) -> List[str]:
+        return [name for (s, name) in self._tables if s == schema]
+
+    def has_table(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> bool:
+        return (schema, table_name) in self._tables
+
+    def get_columns(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> List[Dict[str, Any]]:
+        return self._records("columns", table_name, schema)
+
+    def get_pk_constraint(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> Dict[str, Any]:
+        return self._records("pk_constraint", table_name, schema)
+
+    def get_foreign_keys(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> List[Dict[str, Any]]:
+        return self._records("foreign_keys", table_name, schema)
+
+    def get_indexes(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> List[Dict[str, Any]]:
+        return self._records("indexes", table_name, schema)
+
+    def get_unique_constraints(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> List[Dict[str, Any]]:
+        return self._records("unique_constraints", table_name, schema)
+
+    def get_check_constraints(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> List[Dict[str, Any]]:
+        return self._records("check_constraints", table_name, schema)
+
+    def get_table_comment(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> Dict[str, Any]:
+        return self._records("table_comment", table_name, schema)
+
+    def get_table_options(
+        self, table_name: str, schema: Optional[str] = None, **kw: Any
+    ) -> Dict[str, Any]:
+        return self._records("table_options", table_name, schema)
+
+    def _records(
+        self, kind: str, table_name: str, schema: Optional[str]
+    ) -> Any:
+        try:
+            table = self._tables[(schema, table_name)]
+        except KeyError:
+            raise exc.NoSuchTableError(table_name)
+        if kind not in table:
+            # the backend doesn't reflect this kind of record
+            raise NotImplementedError()
+        return self._decode(table[kind])
+
+    def get_multi_columns(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], List[Dict[str, Any]]]:
+        return self._multi_records("columns", schema, filter_names)
+
+    def get_multi_pk_constraint(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], Dict[str, Any]]:
+        return self._multi_records("pk_constraint", schema, filter_names)
+
+    def get_multi_foreign_keys(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], List[Dict[str, Any]]]:
+        return self._multi_records("foreign_keys", schema, filter_names)
+
+    def get_multi_indexes(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], List[Dict[str, Any]]]:
+        return self._multi_records("indexes", schema, filter_names)
+
+    def get_multi_unique_constraints(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], List[Dict[str, Any]]]:
+        return self._multi_records("unique_constraints", schema, filter_names)
+
+    def get_multi_check_constraints(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], List[Dict[str, Any]]]:
+        return self._multi_records("check_constraints", schema, filter_names)
+
+    def get_multi_table_comment(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], Dict[str, Any]]:
+        return self._multi_records("table_comment", schema, filter_names)
+
+    def get_multi_table_options(
+        self,
+        schema: Optional[str] = None,
+        filter_names: Optional[Sequence[str]] = None,
+        **kw: Any,
+    ) -> Dict[Tuple[Optional[str], str], Dict[str, Any]]:
+        return self._multi_records("table_options", schema, filter_names)
+
+    def _multi_records(
+        self,
+        kind: str,
+        schema: Optional[str],
+        filter_names: Optional[Sequence[str]],
+    ) -> Dict[Tuple[Optional[str], str], Any]:
+        if filter_names is None:
+            filter_names = self.get_table_names(schema)
+
+        records = {}
+        for name in filter_names:
+            table = self._tables.get((schema, name))
+            if table is None:
+                continue
+            elif kind not in table:
+                raise NotImplementedError()
+            records[(schema, name)] = self._decode(table[kind])
+        return records
+
+    def reflect_table(
+        self,
+        table: Table,
+        include_columns: Optional[Collection[str]],
+        exclude_columns: Collection[str] = (),
+        resolve_fks: bool = True,
+        **kw: Any,
+    ) -> None:
+        """Populate the given :class:`~sqlalchemy.schema.Table` from the
+        snapshot, as :meth:`.Inspector.reflect_table` does from the
+        database; tables referred to by its foreign keys are reflected
+        from the snapshot as well if ``resolve_fks`` is True."""
+
+        schema, name = table.schema, table.name
+        if (schema, name) not in self._tables:
+            raise exc.NoSuchTableError(name)
+
+        options = self._optional_records("table_options", name, schema)
+        if options:
+            table.dialect_kwargs.update(options)
+
+        for col_d in self.get_columns(name, schema):
+            table.metadata.dispatch.column_reflect(self, table, col_d)
+            table.dispatch.column_reflect(self, table, col_d)
+
+            # column_reflect listeners may change the name
+            colname = col_d["name"]
+            if (include_columns and colname not in include_columns) or (
+                colname in exclude_columns
+            ):
+                continue
+            table.append_column(self._column(col_d), replace_existing=True)
+
+        pk_cons = self._optional_records("pk_constraint", name, schema)
+        if pk_cons and pk_cons["constrained_columns"]:
+            table.append_constraint(
+                sa_schema.PrimaryKeyConstraint(
+                    *[
+                        colname
+                        for colname in pk_cons["constrained_columns"]
+                        if colname in table.c
+                    ],
+                    name=pk_cons.get("name"),
+                    **pk_cons.get("dialect_options", {}),
+                )
+            )
+
+        for fkey_d in self._optional_records("foreign_keys", name, schema):
+            constrained_columns = fkey_d["constrained_columns"]
+            if any(colname not in table.c for colname in constrained_columns):
+                continue
+            referred_schema = fkey_d["referred_schema"]
+            referred_table = fkey_d["referred_table"]
+            if resolve_fks:
+                self._reflect_referred(table, referred_table, referred_schema)
+            prefix = (
+                [referred_schema, referred_table]
+                if referred_schema is not None
+                else [referred_table]
+            )
+            table.append_constraint(
+                sa_schema.ForeignKeyConstraint(
+                    constrained_columns,
+                    [
+                        ".".join(prefix + [colname])
+                        for colname in fkey_d["referred_columns"]
+                    ],
+                    name=fkey_d["name"],
+                    link_to_name=True,
+                    **fkey_d.get("options", {}),
+                )
+            )
+
+        for index_d in self._optional_records("indexes", name, schema):
+            if index_d.get("duplicates_constraint"):
+                continue
+            index = self._index(table, index_d)
+            if index is not None:
+                table.append_constraint(index)
+
+        for const_d in self._optional_records(
+            "unique_constraints", name, schema
+        ):
+            if const_d.get("duplicates_index") or any(
+                colname not in table.c for colname in const_d["column_names"]
+            ):
+                continue
+            table.append_constraint(
+                sa_schema.UniqueConstraint(
+                    *const_d["column_names"],
+                    name=const_d["name"],
+                    **const_d.get("dialect_options", {}),
+                )
+            )
+
+        for const_d in self._optional_records(
+            "check_constraints", name, schema
+        ):
+            table.append_constraint(sa_schema.CheckConstraint(**const_d))
+
+        comment = self._optional_records("table_comment", name, schema)
+        if comment:
+            table.comment = comment["text"]
+
+    def _optional_records(
+        self, kind: str, table_name: str, schema: Optional[str]
+    ) -> Any:
+        try:
+            return self._records(kind, table_name, schema)
+        except NotImplementedError:
+            return {} if kind in ("pk_constraint", "table_comment") else []
+
+    def _column(self, col_d: Dict[str, Any]) -> Column[Any]:
+        col_kw = {
+            key: col_d[key]
+            for key in (
+                "nullable",
+                "autoincrement",
+                "quote",
+                "info",
+                "key",
+                "comment",
+            )
+            if key in col_d
+        }
+        col_kw.update(col_d.get("dialect_options", {}))
+
+        colargs: List[Any] = []
+        default = col_d.get("default")
+        if isinstance(default, sa_schema.FetchedValue):
+            colargs.append(default)
+        elif default is not None:
+            colargs.append(sa_schema.DefaultClause(sql.text(default)))
+        if "computed" in col_d:
+            colargs.append(sa_schema.Computed(**col_d["computed"]))
+        if "identity" in col_d:
+            colargs.append(sa_schema.Identity(**col_d["identity"]))
+
+        return sa_schema.Column(
+            col_d["name"], col_d["type"], *colargs, **col_kw
+        )
+
+    def _index(
+        self, table: Table, index_d: Dict[str, Any]
+    ) -> Optional[sa_schema.Index]:
+        expressions = index_d.get("expressions")
+        column_sorting = index_d.get("column_sorting", {})
+
+        elements: List[Any] = []
+        for position, colname in enumerate(index_d["column_names"]):
+            if colname is None:
+                if not expressions:
+                    return None
+                elements.append(sql.text(expressions[position]))
+            elif colname in table.c:
+                element: Any = table.c[colname]
+                for option in column_sorting.get(colname, ()):
+                    if option in _IndexColumnSortingOps:
+                        element = _IndexColumnSortingOps[option](element)
+                elements.append(element)
+            else:
+                return None
+
+        return sa_schema.Index(
+            index_d["name"],
+            *elements,
+            unique=index_d["unique"],
+            **index_d.get("dialect_options", {}),
+        )
+
+    def _reflect_referred(
+        self, table: Table, referred_table: str, referred_schema: Optional[str]
+    ) -> None:
+        metadata = table.metadata
+        if (
+            sa_schema._get_table_key(referred_table, referred_schema)
+            not in metadata.tables
+            and (referred_schema, referred_table) in self._tables
+        ):
+            self.reflect_table(
+                sa_schema.Table(
+                    referred_table, metadata, schema=referred_schema
+                ),
+                None,
+            )
+
+    def _decode(self, value: Any) -> Any:
+        # records are decoded on each access, as column_reflect listeners
+        # may modify them
+        if isinstance(value, dict):
+            if "__type__" in value:
+                return self._type(value)
+            return {key: self._decode(item) for key, item in value.items()}
+        elif isinstance(value, list):
+            return [self._decode(item) for item in value]
+        else:
+            return value
+
+    def _type(
+        self, encoded: Dict[str, Any], dialect: Optional[str] = None
+    ) -> sqltypes.TypeEngine:
+        name = encoded["__type__"]
+        if name is None:
+            return sqltypes.NullType()
+
+        dialect = encoded.get("dialect", dialect)
+        cls = _type_class(name, dialect)
+        if cls is None:
+            util.warn(
+                "Couldn't restore type %s from schema snapshot; "
+                "using NullType" % name
+            )
+            return sqltypes.NullType()
+
+        args = [
+            self._type_arg(arg, dialect) for arg in encoded.get("args", ())
+        ]
+        kwargs = {
+            key: self._type_arg(arg, dialect)
+            for key, arg in encoded.get("kwargs", {}).items()
+        }
+        try:
+            return cls(*args, **kwargs)
+        except Exception:
+            util.warn(
+                "Couldn't restore type %s from schema snapshot; "
+                "using NullType" % name
+            )
+            return sqltypes.NullType()
+
+    def _type_arg(self, value: Any, dialect: Optional[str]) -> Any:
+        if isinstance(value, dict) and "__type__" in value:
+            return self._type(value, dialect)
+        elif isinstance(value, list):
+            return [self._type_arg(item, dialect) for item in value]
+        else:
+            return value
@@ -1,20 +1,29 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import json
 import os
+import time
 from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Sequence
 from typing import TYPE_CHECKING
 from typing import Union
 
 from . import autogenerate as autogen
 from . import util
 from .runtime.environment import EnvironmentContext
+from .runtime.migration import StepStatistics
 from .script import ScriptDirectory
 
 if TYPE_CHECKING:
     from alembic.config import Config
     from alembic.script.base import Script
     from .runtime.environment import ProcessRevisionDirectiveFn
+    from .runtime.migration import MigrationInfo
+    from .runtime.plan import StepPlan
 
 
 def list_templates(config: Config):
@@ -356,11 +365,175 @@ def merge(
     )
 
 
+def squash(
+    config: Config,
+    revision: str,
+    message: Optional[str] = None,
+) -> Optional[Script]:
+    """Squash a linear series of revisions into a single baseline revision.
+
+    :param config: a :class:`.Config` instance.
+
+    :param revision: the last revision of the series to be squashed, which
+     starts at base; may also be given as the range ``base:<revision>``.
+
+    :param message: string message to apply to the baseline revision.
+
+    The baseline revision creates the schema as it exists at the given
+    revision.  The schema is reflected from the database that ``env.py``
+    connects to, which must be at the given revision, and is compared
+    to an empty database using :func:`.autogenerate.produce_migrations`.
+
+    The baseline revision keeps the identifier of the given revision, so
+    that later revisions, as well as databases at the given revision, are
+    not affected.   The identifiers of the other revisions in the series
+    are recorded in the ``replaces`` identifier of the baseline.  As only
+    a database at the given revision has the schema which the baseline
+    creates, ``upgrade`` and ``downgrade`` refuse to run against a
+    database whose version table refers to one of the other revisions;
+    such a database must be upgraded to the given revision before its
+    revision files are squashed, or stamped explicitly.   The files of the
+    squashed revisions, along with their table fingerprints files, are
+    moved into the ``archive/`` directory of the script directory.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    script = ScriptDirectory.from_config(config)
+
+    if ":" in revision:
+        start, revision = revision.split(":", 1)
+        if start not in ("", "base"):
+            raise util.CommandError(
+                "Squash range must start at base; got '%s'" % start
+            )
+
+    with script._catch_revision_errors():
+        target = script.get_revision(revision)
+    if target is None:
+        raise util.CommandError("No revision to squash at '%s'" % revision)
+
+    squashed = list(script.iterate_revisions(target.revision, "base"))
+    for sc in squashed:
+        assert sc is not None
+        if sc.is_merge_point or sc.dependencies:
+            raise util.CommandError(
+                "Revision %s is a mergepoint or has dependencies; only "
+                "a linear series of revisions can be squashed" % sc.revision
+            )
+        elif sc is not target and len(sc._all_nextrev) > 1:
+            raise util.CommandError(
+                "Revision %s has more than one revision depending on it; "
+                "only a linear series of revisions can be squashed"
+                % sc.revision
+            )
+        elif sc is not target and sc._orig_branch_labels:
+            raise util.CommandError(
+                "Revision %s has branch labels %s; only the last revision "
+                "of the series may have branch labels"
+                % (sc.revision, util.format_as_comma(sc._orig_branch_labels))
+            )
+    if len(squashed) < 2:
+        raise util.CommandError(
+            "Revision %s is a base revision; there are no revisions "
+            "to squash" % target.revision
+        )
+
+    replaces = util.unique_list(
+        rev
+        for sc in reversed(squashed)
+        for rev in sc.replaces + (sc.revision,)
+        if rev != target.revision
+    )
+
+    template_args = {
+        "config": config  # Let templates use config for
+        # e.g. multiple databases
+    }
+
+    def squash_revisions(rev, context):
+        if tuple(rev) != (target.revision,):
+            raise util.CommandError(
+                "Target database must be at revision %s in order to squash; "
+                "it is at %s"
+                % (target.revision, util.format_as_comma(rev) or "base")
+            )
+        autogen._render_baseline(context, template_args)
+        return []
+
+    with EnvironmentContext(
+        config,
+        script,
+        fn=squash_revisions,
+        as_sql=False,
+        template_args=template_args,
+    ):
+        script.run_env()
+
+    if "imports" not in template_args:
+        raise util.CommandError(
+            "Can't determine the schema at revision %s; env.py did not "
+            "run migrations against a database connection" % target.revision
+        )
+
+    archive_dir = os.path.join(script.dir, "archive")
+    archived = []
+    for sc in squashed:
+        assert sc is not None
+        paths = [sc.path]
+        fingerprints_path = autogen.fingerprint.fingerprints_path(sc.path)
+        if os.path.exists(fingerprints_path):
+            paths.append(fingerprints_path)
+        for path in paths:
+            archive_path = os.path.join(archive_dir, os.path.basename(path))
+            if os.path.exists(archive_path):
+                raise util.CommandError(
+                    "File %s already exists in the archive" % archive_path
+                )
+            archived.append((path, archive_path))
+
+    script._ensure_directory(archive_dir)
+    moved = []
+    try:
+        for path, archive_path in archived:
+            os.replace(path, archive_path)
+            moved.append((path, archive_path))
+            if not path.endswith((".pyc", ".pyo")):
+                pyc_path = util.pyc_file_from_path(path)
+                if pyc_path:
+                    os.unlink(pyc_path)
+
+        baseline = script.generate_revision(
+            target.revision,
+            message if message is not None else "baseline",
+            head="base",
+            version_path=os.path.dirname(target.path),
+            branch_labels=target._orig_branch_labels or None,
+            replaces=tuple(replaces),
+            **template_args,  # type:ignore[arg-type]
+        )
+    except BaseException:
+        for path, archive_path in reversed(moved):
+            os.replace(archive_path, path)
+        raise
+
+    util.msg(
+        "Squashed %d revisions into baseline revision %s; revision files "
+        "were moved to %r" % (len(squashed), target.revision, archive_dir),
+        **config.messaging_opts,
+    )
+    return baseline
+
+
 def upgrade(
     config: Config,
     revision: str,
     sql: bool = False,
     tag: Optional[str] = None,
+    timing: bool = False,
+    timing_log: Optional[str] = None,
+    plan: bool = False,
 ) -> None:
     """Upgrade to a later version.
 
@@ -374,6 +547,33 @@ def upgrade(
      ``env.py`` scripts via the :meth:`.EnvironmentContext.get_tag_argument`
      method.
 
+    :param timing: if True, print a summary of the time taken and
+     statements executed by each migration step once the upgrade is
+     complete, slowest first.
+
+     .. versionadded:: 1.12.0
+
+    :param timing_log: path of a file to which the time taken and
+     statements executed by each migration step are appended as JSON
+     lines, once the upgrade is complete; see :class:`.StepStatistics`.
+
+     .. versionadded:: 1.12.0
+
+    :param plan: if True, don't run the migrations; instead, record the
+     operations each migration step would invoke, and print them along
+     with the tables each would rewrite or scan while locked and the
+     estimated number of rows and size of those tables, flagging the
+     steps which would do so for large tables.  The version table isn't
+     changed.  The steps are planned within a transaction, or a
+     savepoint if a transaction is in progress, which is always rolled
+     back, so that statements which migration scripts execute directly
+     upon the connection returned by :meth:`.Operations.get_bind` are
+     undone; on backends without transactional DDL, where a statement
+     may commit implicitly, that connection refuses to execute
+     statements.  See :class:`.StepPlan`.
+
+     .. versionadded:: 1.12.0
+
     """
 
     script = ScriptDirectory.from_config(config)
@@ -384,9 +584,19 @@ def upgrade(
             raise util.CommandError("Range revision not allowed")
         starting_rev, revision = revision.split(":", 2)
 
+    if plan and (sql or timing or timing_log):
+        raise util.CommandError(
+            "--plan can't be combined with --sql, --timing or --timing-log"
+        )
+
     def upgrade(rev, context):
         return script._upgrade_revs(revision, rev)
 
+    step_infos: Optional[List[MigrationInfo]] = (
+        [] if timing or timing_log else None
+    )
+    step_plans: Optional[List[StepPlan]] = [] if plan else None
+
     with EnvironmentContext(
         config,
         script,
@@ -395,9 +605,307 @@ def upgrade(
         starting_rev=starting_rev,
         destination_rev=revision,
         tag=tag,
+        step_infos=step_infos,
+        plan=step_plans,
     ):
         script.run_env()
 
+    if step_plans is not None:
+        _print_plan(config, step_plans)
+
+    if step_infos is not None:
+        if timing_log:
+            _write_timing_log(timing_log, step_infos)
+        if timing:
+            _print_timing_summary(config, step_infos)
+
+
+def _write_timing_log(path: str, step_infos: List[MigrationInfo]) -> None:
+    with open(path, "a") as file_:
+        for info in step_infos:
+            assert info.statistics is not None
+            entry = {
+                "revision": info.up_revision_id,
+                "down_revisions": list(info.down_revision_ids),
+                "is_upgrade": info.is_upgrade,
+            }
+            entry.update(info.statistics.to_dict())
+            file_.write(json.dumps(entry) + "\n")
+
+
+def _print_timing_summary(
+    config: Config, step_infos: List[MigrationInfo]
+) -> None:
+    format_ = "%-14s %10s %10s %10s %10s %10s"
+    config.print_stdout(
+        format_, "Revision", "Elapsed", "DDL", "DML", "Statements", "Rows"
+    )
+    total = StepStatistics()
+    for info in sorted(
+        step_infos,
+        key=lambda info: info.statistics.elapsed,  # type: ignore[union-attr]
+        reverse=True,
+    ):
+        statistics = info.statistics
+        assert statistics is not None
+        config.print_stdout(
+            format_,
+            info.up_revision_id,
+            "%.3fs" % statistics.elapsed,
+            "%.3fs" % statistics.ddl_elapsed,
+            "%.3fs" % statistics.dml_elapsed,
+            statistics.statements,
+            statistics.rows,
+        )
+        total.elapsed += statistics.elapsed
+        total.ddl_elapsed += statistics.ddl_elapsed
+        total.dml_elapsed += statistics.dml_elapsed
+        total.statements += statistics.statements
+        total.rows += statistics.rows
+    config.print_stdout(
+        format_,
+        "Total",
+        "%.3fs" % total.elapsed,
+        "%.3fs" % total.ddl_elapsed,
+        "%.3fs" % total.dml_elapsed,
+        total.statements,
+        total.rows,
+    )
+
+
+def _print_plan(config: Config, step_plans: List[StepPlan]) -> None:
+    if not step_plans:
+        config.print_stdout("No migrations to run.")
+        return
+
+    format_ = "  %-20s %-30s %-8s %12s %12s"
+    config.print_stdout(
+        format_, "Operation", "Table", "Effect", "Rows", "Size"
+    )
+    for step_plan in step_plans:
+        info = step_plan.info
+        doc = getattr(info.up_revision, "doc", None)
+        config.print_stdout(
+            "%s%s -> %s%s",
+            "! " if step_plan.locks_large_table else "",
+            ", ".join(info.down_revision_ids) or "<base>",
+            info.up_revision_id,
+            ", %s" % doc if doc else "",
+        )
+        for planned in step_plan.operations:
+            config.print_stdout(
+                format_,
+                planned.name,
+                ".".join(
+                    name
+                    for name in (planned.schema, planned.table_name)
+                    if name
+                )
+                or "-",
+                planned.effect or "-",
+                "-" if planned.rows is None else planned.rows,
+                "-" if planned.size is None else _format_size(planned.size),
+            )
+
+    large = [
+        util.not_none(step_plan.info.up_revision_id)
+        for step_plan in step_plans
+        if step_plan.locks_large_table
+    ]
+    if large:
+        config.print_stdout(
+            "%d of %d steps rewrite or scan large tables: %s",
+            len(large),
+            len(step_plans),
+            ", ".join(large),
+        )
+
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return "%d bytes" % size
+    value = float(size)
+    for unit in ("kB", "MB", "GB"):
+        value /= 1024
+        if value < 1024:
+            break
+    return "%.1f %s" % (value, unit)
+
+
+class TargetResult:
+    """The outcome of upgrading a single target with
+    :func:`.upgrade_many`.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    target: Union[str, Mapping[str, str]]
+    """The target, as it was passed to :func:`.upgrade_many`."""
+
+    error: Optional[Exception]
+    """The exception raised while upgrading the target, or ``None`` if
+    the upgrade succeeded."""
+
+    elapsed: float
+    """The time taken to upgrade the target, in seconds."""
+
+    def __init__(
+        self,
+        target: Union[str, Mapping[str, str]],
+        error: Optional[Exception],
+        elapsed: float,
+    ) -> None:
+        self.target = target
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def success(self) -> bool:
+        """True if the upgrade of the target succeeded."""
+        return self.error is None
+
+    @property
+    def name(self) -> str:
+        """A name for the target, with any password obfuscated."""
+        if isinstance(self.target, str):
+            return util.obfuscate_url_pw(self.target)
+        return ", ".join(
+            "%s=%s"
+            % (
+                key,
+                util.obfuscate_url_pw(value)
+                if key == "sqlalchemy.url"
+                else value,
+            )
+            for key, value in self.target.items()
+        )
+
+
+def _target_config(config: Config, options: Mapping[str, str]) -> Config:
+    from .config import Config
+
+    target_config = Config(
+        file_=config.config_file_name,
+        ini_section=config.config_ini_section,
+        output_buffer=config.output_buffer,
+        stdout=config.stdout,
+        cmd_opts=config.cmd_opts,
+        config_args=config.config_args,
+        attributes=dict(config.attributes),
+    )
+
+    # use a copy of the already parsed .ini file, rather than
+    # parsing it again for each target
+    target_config.file_config = copy.deepcopy(config.file_config)
+    for name, value in options.items():
+        target_config.set_main_option(name, value.replace("%", "%%"))
+    return target_config
+
+
+def upgrade_many(
+    config: Config,
+    targets: Sequence[Union[str, Mapping[str, str]]],
+    revision: str,
+    tag: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> List[TargetResult]:
+    """Upgrade several databases to a later version.
+
+    The revision files are loaded once and shared by all targets.   For
+    each target, ``env.py`` is run with a copy of the given
+    :class:`.Config` in which the target's options are set; a target
+    given as a string is a database URL, which is set as the
+    ``sqlalchemy.url`` option, while a target given as a dictionary
+    may set any number of options, such as a schema name that's
+    consulted by a custom ``env.py``.   Each target is upgraded in its
+    own transaction, as established by ``env.py``; a target which fails
+    doesn't affect the others.
+
+    A report of each target is written to standard output, and a list
+    of :class:`.TargetResult` objects is returned.   If any target
+    failed, :class:`.MultipleTargetsFailed` is raised once all targets
+    have been run, with the list available as its ``results``
+    attribute.
+
+    :param config: a :class:`.Config` instance.
+
+    :param targets: the targets to upgrade; database URL strings, or
+     dictionaries of options to set within the main section of the
+     configuration.
+
+    :param revision: string revision target
+
+    :param tag: an arbitrary "tag" that can be intercepted by custom
+     ``env.py`` scripts via the :meth:`.EnvironmentContext.get_tag_argument`
+     method.
+
+    :param workers: the number of targets to upgrade concurrently, each
+     within its own thread.  Defaults to one at a time.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    script = ScriptDirectory.from_config(config)
+
+    if ":" in revision:
+        raise util.CommandError("Range revision not allowed")
+
+    # load the revision map before the targets run, so that it's
+    # shared by all of them
+    script.revision_map.heads
+
+    def upgrade(rev, context):
+        return script._upgrade_revs(revision, rev)
+
+    def run(target: Union[str, Mapping[str, str]]) -> TargetResult:
+        options = (
+            {"sqlalchemy.url": target} if isinstance(target, str) else target
+        )
+        start = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            with EnvironmentContext(
+                _target_config(config, options),
+                script,
+                fn=upgrade,
+                destination_rev=revision,
+                tag=tag,
+            ):
+                script.run_env()
+        except Exception as err:
+            error = err
+        return TargetResult(target, error, time.perf_counter() - start)
+
+    if workers is not None and workers > 1:
+        with util.ModuleClsProxy._proxies_per_context():
+            with ThreadPoolExecutor(workers) as executor:
+                results = list(executor.map(run, targets))
+    else:
+        results = [run(target) for target in targets]
+
+    for result in results:
+        if result.success:
+            config.print_stdout(
+                "%s: upgraded (%.2fs)", result.name, result.elapsed
+            )
+        else:
+            config.print_stdout(
+                "%s: FAILED (%.2fs): %s",
+                result.name,
+                result.elapsed,
+                result.error,
+            )
+
+    failed = sum(1 for result in results if not result.success)
+    if failed:
+        raise util.MultipleTargetsFailed(
+            "%d of %d targets failed to upgrade" % (failed, len(results)),
+            results,
+        )
+    return results
+
 
 def downgrade(
     config: Config,
@@ -682,6 +1190,7 @@ def stamp(
         destination_rev=util.to_tuple(destination_revs),
         tag=tag,
         purge=purge,
+        stamp=True,
     ):
         script.run_env()
 
@@ -719,6 +1228,39 @@ def edit(config: Config, rev: str) -> None:
             util.open_in_editor(sc.path)
 
 
+def compile_versions(config: Config) -> None:
+    """Compile all revision files into a single revision bundle.
+
+    :param config: a :class:`.Config` instance.
+
+    The bundle is written to the location given by the
+    ``revision_bundle_path`` configuration option, which defaults to
+    ``__pycache__/alembic_versions.bundle`` within the script directory.
+    It's read when building the revision map when the ``revision_bundle``
+    option is enabled, so that the revision files themselves don't need to
+    be read or compiled.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    script = ScriptDirectory.from_config(config)
+
+    try:
+        with util.status(
+            f"Writing revision bundle {script.revision_bundle_path!r}",
+            **config.messaging_opts,
+        ):
+            count = script._write_revision_bundle()
+    except OSError as err:
+        raise util.CommandError(
+            "Can't write revision bundle %s: %s"
+            % (script.revision_bundle_path, err)
+        ) from err
+
+    util.msg("Compiled %d revision files" % count, **config.messaging_opts)
+
+
 def ensure_version(config: Config, sql: bool = False) -> None:
     """Create the alembic version table if it doesn't exist already .
 
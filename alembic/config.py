@@ -472,6 +472,31 @@ class CommandLine:
                         help="Indicate the current revision",
                     ),
                 ),
+                "timing": (
+                    "--timing",
+                    dict(
+                        action="store_true",
+                        help="Print a summary of the time taken by each "
+                        "migration step",
+                    ),
+                ),
+                "timing_log": (
+                    "--timing-log",
+                    dict(
+                        type=str,
+                        help="Append the time taken by each migration step "
+                        "to the given file as JSON lines",
+                    ),
+                ),
+                "plan": (
+                    "--plan",
+                    dict(
+                        action="store_true",
+                        help="Don't run the migrations; report the "
+                        "operations each would run and the tables they "
+                        "would rewrite or lock",
+                    ),
+                ),
                 "purge": (
                     "--purge",
                     dict(
@@ -488,11 +513,19 @@ class CommandLine:
                         "environment and version locations",
                     ),
                 ),
+                "workers": (
+                    "--workers",
+                    dict(
+                        type=int,
+                        help="Number of targets to upgrade concurrently",
+                    ),
+                ),
             }
             positional_help = {
                 "directory": "location of scripts directory",
                 "revision": "revision identifier",
                 "revisions": "one or more revisions, or 'heads' for all heads",
+                "targets": "one or more database URLs",
             }
             for arg in kwargs:
                 if arg in kwargs_opts:
@@ -511,6 +544,12 @@ class CommandLine:
                         nargs="+",
                         help=positional_help.get("revisions"),
                     )
+                elif arg == "targets":
+                    subparser.add_argument(
+                        "targets",
+                        nargs="+",
+                        help=positional_help.get("targets"),
+                    )
                 else:
                     subparser.add_argument(arg, help=positional_help.get(arg))
 
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from collections import namedtuple
+import logging
 import re
+import time
 from typing import Any
 from typing import Callable
 from typing import Dict
@@ -15,11 +17,15 @@ from typing import TYPE_CHECKING
 from typing import Union
 
 from sqlalchemy import cast
+from sqlalchemy import exc
 from sqlalchemy import schema
 from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 
 from . import base
 from .. import util
+from ..runtime.tracing import SlowStatementLog
+from ..runtime.tracing import TracedStatement
 from ..util import sqla_compat
 
 if TYPE_CHECKING:
@@ -46,6 +52,35 @@ if TYPE_CHECKING:
     from ..autogenerate.api import AutogenContext
     from ..operations.batch import ApplyBatchImpl
     from ..operations.batch import BatchOperationsImpl
+    from ..runtime.migration import StepStatistics
+    from ..runtime.tracing import StatementTracer
+
+log = logging.getLogger(__name__)
+
+SERVER_DEFAULT_BATCH = 500
+"""The number of server default comparisons evaluated by each ``SELECT``
+emitted by :meth:`.DefaultImpl._server_defaults_equal`."""
+
+_ddl_statement = re.compile(
+    r"\s*(CREATE|ALTER|DROP|TRUNCATE|RENAME|COMMENT)\b", re.I
+)
+_dml_statement = re.compile(r"\s*(INSERT|UPDATE|DELETE|MERGE)\b", re.I)
+
+
+def _is_ddl(construct: ClauseElement) -> bool:
+    if isinstance(construct, schema.DDLElement):
+        return True
+    elif isinstance(construct, TextClause):
+        return _ddl_statement.match(construct.text) is not None
+    else:
+        return False
+
+
+def _is_dml(construct: ClauseElement) -> bool:
+    if isinstance(construct, TextClause):
+        return _dml_statement.match(construct.text) is not None
+    else:
+        return bool(getattr(construct, "is_dml", False))
 
 
 class ImplMeta(type):
@@ -88,6 +123,9 @@ class DefaultImpl(metaclass=ImplMeta):
     type_arg_extract: Sequence[str] = ()
     # on_null is known to be supported only by oracle
     identity_attrs_ignore: Tuple[str, ...] = ("on_null",)
+    # prefix of a statement returning the plan of a DML statement, or
+    # None if the backend has no such statement
+    explain_prefix: Optional[str] = "EXPLAIN"
 
     def __init__(
         self,
@@ -105,7 +143,21 @@ class DefaultImpl(metaclass=ImplMeta):
 
         self.output_buffer = output_buffer
         self.memo: dict = {}
+        self._server_defaults_equal_cache: Dict[Any, bool] = {}
+
+        # statistics for the migration step being run, if any; collected
+        # by _exec()
+        self.statistics: Optional[StepStatistics] = None
         self.context_opts = context_opts
+
+        tracers: List[StatementTracer] = list(
+            util.to_tuple(context_opts.get("statement_tracers"), default=())
+        )
+        threshold = context_opts.get("slow_statement_threshold")
+        if threshold is not None:
+            tracers.append(SlowStatementLog(threshold))
+        self.tracers = tuple(tracers)
+        self.explain_dml = context_opts.get("explain_dml", False)
         if transactional_ddl is not None:
             self.transactional_ddl = transactional_ddl
 
@@ -158,9 +210,102 @@ class DefaultImpl(metaclass=ImplMeta):
         execution_options: Optional[dict[str, Any]] = None,
         multiparams: Sequence[dict] = (),
         params: Dict[str, Any] = util.immutabledict(),
+        explain: bool = False,
     ) -> Optional[CursorResult]:
         if isinstance(construct, str):
             construct = text(construct)
+
+        if self.statistics is None and not self.tracers and not explain:
+            return self._exec_construct(
+                construct, execution_options, multiparams, params
+            )
+
+        is_ddl = _is_ddl(construct)
+        traced: Optional[TracedStatement] = None
+        if self.tracers or explain:
+            traced = TracedStatement(
+                construct,
+                self.dialect,
+                tuple(multiparams) + (params,) if params else multiparams,
+                is_ddl,
+            )
+            if explain and not self.as_sql and _is_dml(construct):
+                traced.plan = self._explain(traced)
+            for tracer in self.tracers:
+                tracer.before_execute(traced)
+
+        start = time.perf_counter()
+        try:
+            result = self._exec_construct(
+                construct, execution_options, multiparams, params
+            )
+        except BaseException as err:
+            if traced is not None:
+                traced.duration = time.perf_counter() - start
+                for tracer in self.tracers:
+                    tracer.handle_error(traced, err)
+            raise
+        elapsed = time.perf_counter() - start
+
+        rowcount = (
+            result.rowcount
+            if result is not None and not result.returns_rows and not is_ddl
+            else None
+        )
+        if self.statistics is not None:
+            if is_ddl:
+                self.statistics._add_ddl(elapsed)
+            else:
+                self.statistics._add_dml(elapsed, rowcount or 0)
+        if traced is not None:
+            traced.duration = elapsed
+            traced.rowcount = rowcount
+            for tracer in self.tracers:
+                tracer.after_execute(traced)
+        return result
+
+    def _explain(self, traced: TracedStatement) -> Optional[List[str]]:
+        """Return the lines of the plan of the given DML statement, which
+        is logged at INFO level."""
+
+        if self.explain_prefix is None:
+            log.info(
+                "EXPLAIN is not supported for dialect %r", self.dialect.name
+            )
+            return None
+
+        # the plan is for the statement with its parameters rendered
+        # inline, as EXPLAIN can't be given bound parameters on all
+        # backends
+        try:
+            sql = str(
+                traced.construct.compile(
+                    dialect=self.dialect,
+                    compile_kwargs={"literal_binds": True},
+                )
+            )
+        except Exception:
+            log.info(
+                "Can't render parameters inline to EXPLAIN %s", traced.sql
+            )
+            return None
+
+        conn = self.connection
+        assert conn is not None
+        result = conn.exec_driver_sql("%s %s" % (self.explain_prefix, sql))
+        plan = [
+            " ".join(str(value) for value in row) for row in result.fetchall()
+        ]
+        log.info("Plan for %s:\n%s", sql, "\n".join(plan))
+        return plan
+
+    def _exec_construct(
+        self,
+        construct: ClauseElement,
+        execution_options: Optional[dict[str, Any]],
+        multiparams: Sequence[dict],
+        params: Dict[str, Any],
+    ) -> Optional[CursorResult]:
         if self.as_sql:
             if multiparams or params:
                 # TODO: coverage
@@ -199,7 +344,7 @@ class DefaultImpl(metaclass=ImplMeta):
         sql: Union[ClauseElement, str],
         execution_options: Optional[dict[str, Any]] = None,
     ) -> None:
-        self._exec(sql, execution_options)
+        self._exec(sql, execution_options, explain=self.explain_dml)
 
     def alter_column(
         self,
@@ -550,6 +695,95 @@ class DefaultImpl(metaclass=ImplMeta):
     ):
         return rendered_inspector_default != rendered_metadata_default
 
+    def _server_default_comparison(
+        self,
+        inspector_column: Column[Any],
+        metadata_column: Column[Any],
+        rendered_metadata_default: Optional[str],
+        rendered_inspector_default: Optional[str],
+    ) -> Union[bool, ColumnElement[bool]]:
+        """Compare server defaults as :meth:`.compare_server_default`
+        does, or return an expression which is true if the defaults are
+        equal when evaluated by the server.
+
+        Autogenerate evaluates the expressions returned for all columns
+        at once using :meth:`._server_defaults_equal`.  The default
+        implementation compares the defaults immediately.
+
+        """
+        return self.compare_server_default(
+            inspector_column,
+            metadata_column,
+            rendered_metadata_default,
+            rendered_inspector_default,
+        )
+
+    def _defers_server_default_comparison(self) -> bool:
+        """Return True if :meth:`._server_default_comparison` may be used
+        in place of :meth:`.compare_server_default`.
+
+        This isn't the case for a subclass which overrides only
+        :meth:`.compare_server_default`, such as a third party subclass of
+        an impl which compares defaults on the server.
+
+        """
+
+        def defined_by(name: str) -> type:
+            return next(cls for cls in type(self).__mro__ if name in vars(cls))
+
+        return issubclass(
+            defined_by("_server_default_comparison"),
+            defined_by("compare_server_default"),
+        )
+
+    def _server_defaults_equal(
+        self, comparisons: Sequence[ColumnElement[bool]]
+    ) -> List[bool]:
+        """Evaluate the given server default comparisons, returning
+        whether each is true.
+
+        The comparisons are evaluated :data:`.SERVER_DEFAULT_BATCH` at a
+        time, as the columns of a single ``SELECT``.  The result of each
+        distinct comparison is cached, so that defaults repeated across
+        columns are evaluated once.
+
+        """
+        cache = self._server_defaults_equal_cache
+        keys = [self._server_default_comparison_key(c) for c in comparisons]
+
+        pending: Dict[Any, ColumnElement[bool]] = {}
+        for key, comparison in zip(keys, comparisons):
+            if key not in cache:
+                pending.setdefault(key, comparison)
+
+        to_evaluate = list(pending.items())
+        for start in range(0, len(to_evaluate), SERVER_DEFAULT_BATCH):
+            batch = to_evaluate[start : start + SERVER_DEFAULT_BATCH]
+            assert self.connection is not None
+            row = self.connection.execute(
+                sqla_compat._select(*[comparison for key, comparison in batch])
+            ).first()
+            assert row is not None
+            for (key, comparison), value in zip(batch, row):
+                cache[key] = bool(value)
+
+        return [cache[key] for key in keys]
+
+    def _server_default_comparison_key(
+        self, comparison: ColumnElement[bool]
+    ) -> Any:
+        try:
+            return str(
+                comparison.compile(
+                    dialect=self.dialect,
+                    compile_kwargs={"literal_binds": True},
+                )
+            )
+        except exc.CompileError:
+            # can't be rendered without bound parameters; not cached
+            # beyond the comparison itself
+            return comparison
+
     def correct_for_autogen_constraints(
         self,
         conn_uniques: Set[UniqueConstraint],
@@ -601,6 +835,18 @@ class DefaultImpl(metaclass=ImplMeta):
 
         """
 
+    def _table_statistics(
+        self, table_name: str, schema: Optional[str]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        """Return the estimated number of rows and the size in bytes of
+        the given table, either of which may be ``None`` if not known.
+
+        Used when planning an upgrade; the default implementation
+        knows neither.
+
+        """
+        return None, None
+
     def start_migrations(self) -> None:
         """A hook called when :meth:`.EnvironmentContext.run_migrations`
         is called.
@@ -49,6 +49,7 @@ class MSSQLImpl(DefaultImpl):
     __dialect__ = "mssql"
     transactional_ddl = True
     batch_separator = "GO"
+    explain_prefix = None
 
     type_synonyms = DefaultImpl.type_synonyms + ({"VARCHAR", "NVARCHAR"},)
     identity_attrs_ignore = (
@@ -3,10 +3,12 @@ from __future__ import annotations
 import re
 from typing import Any
 from typing import Optional
+from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
 
 from sqlalchemy import schema
+from sqlalchemy import text
 from sqlalchemy import types as sqltypes
 from sqlalchemy.ext.compiler import compiles
 
@@ -46,6 +48,23 @@ class MySQLImpl(DefaultImpl):
     )
     type_arg_extract = [r"character set ([\w\-_]+)", r"collate ([\w\-_]+)"]
 
+    def _table_statistics(
+        self, table_name: str, schema: Optional[str]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        assert self.connection is not None
+        row = self.connection.execute(
+            text(
+                "SELECT TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH "
+                "FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = coalesce(:schema, DATABASE()) "
+                "AND TABLE_NAME = :table_name"
+            ),
+            {"table_name": table_name, "schema": schema},
+        ).first()
+        if row is None:
+            return None, None
+        return row[0], row[1]
+
     def alter_column(  # type:ignore[override]
         self,
         table_name: str,
@@ -93,6 +93,26 @@ class PostgresqlImpl(DefaultImpl):
                 )
         self._exec(CreateIndex(index, **kw))
 
+    def _table_statistics(
+        self, table_name: str, schema: Optional[str]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        assert self.connection is not None
+        row = self.connection.execute(
+            text(
+                "SELECT c.reltuples, pg_total_relation_size(c.oid) "
+                "FROM pg_catalog.pg_class c "
+                "JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relname = :table_name "
+                "AND n.nspname = coalesce(:schema, current_schema())"
+            ),
+            {"table_name": table_name, "schema": schema},
+        ).first()
+        if row is None:
+            return None, None
+        reltuples, size = row
+        # reltuples is -1 for a table which hasn't yet been analyzed
+        return (int(reltuples) if reltuples >= 0 else None), size
+
     def prep_table_for_batch(self, batch_impl, table):
         for constraint in table.constraints:
             if (
@@ -107,6 +127,24 @@ class PostgresqlImpl(DefaultImpl):
         metadata_column,
         rendered_metadata_default,
         rendered_inspector_default,
+    ):
+        comparison = self._server_default_comparison(
+            inspector_column,
+            metadata_column,
+            rendered_metadata_default,
+            rendered_inspector_default,
+        )
+        if isinstance(comparison, bool):
+            return comparison
+
+        return not self._server_defaults_equal([comparison])[0]
+
+    def _server_default_comparison(
+        self,
+        inspector_column,
+        metadata_column,
+        rendered_metadata_default,
+        rendered_inspector_default,
     ):
         # don't do defaults for SERIAL columns
         if (
@@ -128,6 +166,11 @@ class PostgresqlImpl(DefaultImpl):
         ):
             return not defaults_equal
 
+        if self.connection is None:
+            # autogenerating from a schema snapshot; the defaults can
+            # only be compared as rendered
+            return not defaults_equal
+
         metadata_default = metadata_column.server_default.arg
 
         if isinstance(metadata_default, str):
@@ -137,12 +180,9 @@ class PostgresqlImpl(DefaultImpl):
 
             metadata_default = literal_column(metadata_default)
 
-        # run a real compare against the server
-        return not self.connection.scalar(
-            sqla_compat._select(
-                literal_column(conn_col_default) == metadata_default
-            )
-        )
+        # compare against the server; autogenerate evaluates these along
+        # with those of the other columns
+        return literal_column(conn_col_default) == metadata_default
 
     def alter_column(  # type:ignore[override]
         self,
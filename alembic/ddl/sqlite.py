@@ -4,6 +4,7 @@ import re
 from typing import Any
 from typing import Dict
 from typing import Optional
+from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
 
@@ -39,6 +40,35 @@ class SQLiteImpl(DefaultImpl):
     """SQLite supports transactional DDL, but pysqlite does not:
     see: http://bugs.python.org/issue10740
     """
+    explain_prefix = "EXPLAIN QUERY PLAN"
+
+    def _table_statistics(
+        self, table_name: str, schema: Optional[str]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        # row estimates are only present in sqlite_stat1 once ANALYZE has
+        # been run; the first number of each entry's stat column is the
+        # number of rows of the table
+        assert self.connection is not None
+        prefix = (
+            self.dialect.identifier_preparer.quote_schema(schema) + "."
+            if schema
+            else ""
+        )
+        if not self.connection.scalar(
+            sql.text(
+                "SELECT 1 FROM %ssqlite_master "
+                "WHERE type = 'table' AND name = 'sqlite_stat1'" % prefix
+            )
+        ):
+            return None, None
+        stats = self.connection.scalars(
+            sql.text(
+                "SELECT stat FROM %ssqlite_stat1 WHERE tbl = :tbl" % prefix
+            ),
+            {"tbl": table_name},
+        ).all()
+        rows = [int(stat.split()[0]) for stat in stats if stat]
+        return (max(rows) if rows else None), None
 
     def requires_recreate_in_batch(
         self, batch_op: BatchOperationsImpl
@@ -1273,6 +1273,12 @@ def run_async(
     The async connection passed to the callable shares the same
     transaction as the connection running in the migration context.
 
+    When migrations are run from asyncio code using
+    :class:`.AsyncEnvironmentContext` or :class:`.AsyncMigrationContext`,
+    the callable receives the
+    :class:`~sqlalchemy.ext.asyncio.AsyncConnection` that was passed to
+    ``configure()``.
+
     Any additional arg or kw_arg passed to this function are passed
     to the provided async function.
 
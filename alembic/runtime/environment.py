@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from typing import Any
+from typing import AsyncContextManager
 from typing import Callable
 from typing import Collection
 from typing import ContextManager
@@ -20,6 +21,7 @@ from sqlalchemy.sql.schema import FetchedValue
 from typing_extensions import Literal
 
 from .migration import _ProxyTransaction
+from .migration import AsyncMigrationContext
 from .migration import MigrationContext
 from .. import util
 from ..operations import Operations
@@ -27,6 +29,7 @@ from ..operations import Operations
 if TYPE_CHECKING:
     from sqlalchemy.engine import URL
     from sqlalchemy.engine.base import Connection
+    from sqlalchemy.ext.asyncio import AsyncConnection
     from sqlalchemy.sql.elements import ClauseElement
     from sqlalchemy.sql.schema import MetaData
     from sqlalchemy.sql.schema import SchemaItem
@@ -532,6 +535,95 @@ class EnvironmentContext(util.ModuleClsProxy):
          only takes effect when the table is first created.
          Defaults to True; setting to False should not be necessary and is
          here for backwards compatibility reasons.
+        :param checkpoint_table: The name of the table in which
+         :meth:`.MigrationContext.checkpoint` records the progress of
+         migration steps, within the
+         :paramref:`.EnvironmentContext.configure.version_table_schema`.
+         Defaults to the name of the version table with the suffix
+         ``_checkpoint``, e.g. ``'alembic_version_checkpoint'``.
+
+         .. versionadded:: 1.12.0
+
+        :param version_table_write_mode: when to write changes in the
+         current heads to the version table.  Defaults to ``"immediate"``,
+         where the version table is updated after each migration step.
+         When set to ``"deferred"``, the heads are maintained in memory as
+         the steps are run, and only the net difference between the
+         heads at the start and at the end of
+         :meth:`.MigrationContext.run_migrations` is written, as a single
+         UPDATE in the usual case of a single head, saving a round trip
+         per migration.   Can't be combined with
+         :paramref:`.EnvironmentContext.configure.transaction_per_migration`.
+
+         When the database supports transactional DDL, the migrations and
+         the version table write take place within the same transaction
+         and are committed or rolled back together, so the deferred mode
+         is as safe as the immediate one.   When it doesn't, such as with
+         MySQL, each migration's DDL takes effect as it runs; if a
+         migration fails, the heads reached by the migrations which
+         completed are written before the error is raised, however if the
+         process is killed or the connection is lost partway through, the
+         version table will still indicate the heads present when the run
+         started, and the migrations which had completed would be run again
+         on the next run.  The heads passed to
+         :paramref:`.EnvironmentContext.configure.on_version_apply`
+         callables are the in-memory heads, which in the deferred mode
+         aren't yet written to the version table.
+
+         .. versionadded:: 1.12.0
+
+        :param branch_workers: the number of independent branches whose
+         migrations may be run concurrently by
+         :meth:`.MigrationContext.run_migrations`.  Defaults to 1, where
+         all migration steps are run in order on the configured
+         connection.  When greater than 1, the upgrade steps to be run are
+         divided into groups which share no revisions, down revisions or
+         dependencies, such as branches with their own ``branch_labels``
+         and bases, and each group is run within its own thread, on its own
+         connection acquired from the :class:`~sqlalchemy.engine.Engine`
+         of the configured connection.  Each step runs in its own
+         transaction on that connection, as with
+         :paramref:`.EnvironmentContext.configure.transaction_per_migration`,
+         and the version table is written by one step at a time.  The
+         configured connection itself is only used to read the current
+         heads, so any transaction it's in doesn't enclose the migrations.
+         If a step fails, no further steps are started, and the error is
+         raised once the steps already running have completed.  Only takes
+         effect in "online" mode; can't be combined with
+         :paramref:`.EnvironmentContext.configure.version_table_write_mode`
+         of ``"deferred"``.
+
+         .. versionadded:: 1.12.0
+
+        :param statement_tracers: a :class:`.StatementTracer` or collection
+         of :class:`.StatementTracer` objects, which are notified before
+         and after each statement emitted by migration operations is
+         executed, or when it fails, along with the compiled SQL and the
+         time it took.
+
+         .. versionadded:: 1.12.0
+
+        :param slow_statement_threshold: a number of seconds; when present,
+         each statement emitted by migration operations which takes at
+         least this long is logged as a warning on the
+         ``alembic.runtime.tracing`` logger, using a
+         :class:`.SlowStatementLog`.
+
+         .. versionadded:: 1.12.0
+
+        :param explain_dml: if True, the plan for each INSERT, UPDATE,
+         DELETE or MERGE statement emitted by :meth:`.Operations.execute`
+         is retrieved using ``EXPLAIN`` before the statement is run, and
+         is logged at the INFO level on the ``alembic.ddl.impl`` logger as
+         well as made available as :attr:`.TracedStatement.plan`.  The
+         statement's parameters are rendered inline for this purpose;
+         statements whose parameters can't be rendered aren't explained.
+         Only takes effect in "online" mode, and on backends with an
+         ``EXPLAIN`` statement returning rows, which excludes SQL Server
+         and Oracle.
+
+         .. versionadded:: 1.12.0
+
         :param on_version_apply: a callable or collection of callables to be
             run for each migration step.
             The callables will be run in the order they are given, once for
@@ -743,6 +835,82 @@ class EnvironmentContext(util.ModuleClsProxy):
 
             :paramref:`.EnvironmentContext.configure.include_object`
 
+        :param compare_workers: the number of threads within which the
+         tables present both in the database and in the target metadata
+         are compared by autogenerate.  Defaults to 1, where each table is
+         compared in turn.  When greater than 1, the tables are divided
+         among a pool of threads, each of which uses its own connection
+         acquired from the :class:`~sqlalchemy.engine.Engine` of the
+         configured connection for any database access that comparison
+         requires, such as server default comparison on PostgreSQL, so the
+         tables must be visible to other connections of the engine, and
+         the pool of the engine should provide at least this number of
+         connections.  Tables are compared serially if the connection was
+         in a transaction when the context was configured, if execution
+         options such as ``schema_translate_map`` are set upon the
+         connection, or if the pool of the engine shares one connection,
+         such as :class:`~sqlalchemy.pool.StaticPool`, as the other
+         connections may not see the same database.  The operations
+         detected are the same and are produced in the same order as when
+         comparing serially.  Hooks
+         such as :paramref:`.EnvironmentContext.configure.include_object`,
+         :paramref:`.EnvironmentContext.configure.compare_type` and
+         :paramref:`.EnvironmentContext.configure.compare_server_default`
+         callables are invoked from within the threads.
+
+         .. versionadded:: 1.12.0
+
+        :param schema_snapshot: path of a schema snapshot file, a JSON
+         document recording the tables of the database as reflected,
+         including their columns, indexes, constraints and comments,
+         along with the current version heads.  When migrations are run
+         against a database connection, the snapshot is written once they
+         complete and the transaction begun by
+         :meth:`.EnvironmentContext.begin_transaction` is committed, or if the
+         file doesn't yet exist; it isn't written, and a warning is emitted,
+         if the connection was already in a transaction when the context
+         was configured.  When the context is
+         configured with only a ``url`` or ``dialect_name`` and no
+         connection, autogenerate, including the ``alembic check``
+         command, compares the target metadata against the snapshot, and
+         the current heads are those recorded by the snapshot, so that no
+         database connection is needed.  The tables of all schemas are
+         recorded if :paramref:`.EnvironmentContext.configure.include_schemas`
+         is set.  Server defaults are compared as rendered, without the
+         server side comparison PostgreSQL would otherwise perform.  Types
+         from outside of SQLAlchemy are restored as
+         :class:`~sqlalchemy.types.NullType`.  Comparing against a snapshot
+         requires SQLAlchemy 2.0.
+
+         .. versionadded:: 1.12.0
+
+         .. seealso::
+
+            :ref:`autogenerate_snapshot`
+
+        :param table_fingerprints: when True, ``alembic revision
+         --autogenerate`` stores a fingerprint of each table of the target
+         metadata in a file alongside each revision file it generates,
+         named for the revision file with the suffix
+         ``.fingerprints.json``.  The fingerprint is a hash of the
+         ``op.create_table()`` and ``op.create_index()`` directives
+         rendered for the table.  When autogenerate next runs, tables
+         present both in the database and the metadata whose fingerprint
+         matches that stored alongside the current head revision are
+         neither reflected nor compared; tables which are new, removed or
+         changed are compared as usual.  If the head revision has no
+         fingerprints file, such as when it was written by hand, all
+         tables are compared.  The fingerprints assume the database
+         matches the metadata once the revision is applied; if the
+         generated revision is edited to leave out some changes, delete
+         its fingerprints file.
+
+         .. versionadded:: 1.12.0
+
+         .. seealso::
+
+            :func:`.autogenerate.table_fingerprints`
+
         :param render_item: Callable that can be used to override how
          any schema item, i.e. column, constraint, type,
          etc., is rendered for autogenerate.  The callable receives a
@@ -1040,3 +1208,134 @@ class EnvironmentContext(util.ModuleClsProxy):
 
     def get_impl(self) -> DefaultImpl:
         return self.get_context().impl
+
+
+class AsyncEnvironmentContext(EnvironmentContext):
+    """An :class:`.EnvironmentContext` for use with asyncio.
+
+    :meth:`.AsyncEnvironmentContext.configure` accepts an
+    :class:`~sqlalchemy.ext.asyncio.AsyncConnection`, and the methods
+    which make use of the database are awaitable, running upon the
+    :class:`.AsyncMigrationContext` which is established.  This allows
+    an asyncio application to run migrations from within its own event
+    loop, rather than by way of an ``env.py`` script calling upon
+    ``asyncio.run()``::
+
+        from alembic.runtime.environment import AsyncEnvironmentContext
+
+        def upgrade(rev, context):
+            return script._upgrade_revs("head", rev)
+
+        async with engine.connect() as connection:
+            async with AsyncEnvironmentContext(
+                config, script, fn=upgrade, destination_rev="head"
+            ) as context:
+                context.configure(
+                    connection=connection, target_metadata=target_metadata
+                )
+                async with context.begin_transaction():
+                    await context.run_migrations()
+
+    Within the ``async with`` block, the :class:`.AsyncEnvironmentContext`
+    is available as ``from alembic import context`` to the current task
+    only, so that several may be in use by concurrent tasks at once.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    _async_migration_context: Optional[AsyncMigrationContext] = None
+
+    async def __aenter__(self) -> AsyncEnvironmentContext:
+        self._per_context = util.ModuleClsProxy._proxies_per_context()
+        self._per_context.__enter__()
+        self._install_proxy()
+        return self
+
+    async def __aexit__(self, *arg: Any) -> None:
+        self._remove_proxy()
+        self._per_context.__exit__(*arg)
+
+    def configure(  # type: ignore[override]
+        self, connection: Optional[AsyncConnection] = None, **kw: Any
+    ) -> None:
+        """Configure a :class:`.AsyncMigrationContext` within this
+        :class:`.AsyncEnvironmentContext`.
+
+        Accepts the same arguments as :meth:`.EnvironmentContext.configure`,
+        except that ``connection`` is an
+        :class:`~sqlalchemy.ext.asyncio.AsyncConnection`.
+
+        """
+        super().configure(
+            connection=connection.sync_connection
+            if connection is not None
+            else None,
+            **kw,
+        )
+        assert self._migration_context is not None
+        self._async_migration_context = AsyncMigrationContext(
+            self._migration_context, connection
+        )
+
+    async def run_migrations(  # type: ignore[override]
+        self, **kw: Any
+    ) -> None:
+        """Run migrations as determined by the current command line
+        configuration; see :meth:`.EnvironmentContext.run_migrations`.
+
+        """
+        await self.get_async_context().run_migrations(**kw)
+
+    async def execute(  # type: ignore[override]
+        self,
+        sql: Union[ClauseElement, str],
+        execution_options: Optional[dict] = None,
+    ) -> None:
+        """Execute the given SQL using the current change context; see
+        :meth:`.EnvironmentContext.execute`.
+
+        """
+        await self.get_async_context().execute(
+            sql, execution_options=execution_options
+        )
+
+    def begin_transaction(  # type: ignore[override]
+        self,
+    ) -> AsyncContextManager[None]:
+        """Return an async context manager that will enclose an operation
+        within a "transaction"; see
+        :meth:`.EnvironmentContext.begin_transaction`.
+
+        e.g.::
+
+            async with context.begin_transaction():
+                await context.run_migrations()
+
+        """
+        return self.get_async_context().begin_transaction()
+
+    async def get_current_heads(self) -> Tuple[str, ...]:
+        """Return the current 'head versions' of the target database; see
+        :meth:`.MigrationContext.get_current_heads`.
+
+        """
+        return await self.get_async_context().get_current_heads()
+
+    async def stamp(self, revision: str) -> None:
+        """Stamp the version table with a specific revision; see
+        :meth:`.MigrationContext.stamp`.
+
+        """
+        await self.get_async_context().stamp(self.script, revision)
+
+    def get_async_context(self) -> AsyncMigrationContext:
+        """Return the current :class:`.AsyncMigrationContext` object.
+
+        If :meth:`.AsyncEnvironmentContext.configure` has not been
+        called yet, raises an exception.
+
+        """
+        if self._async_migration_context is None:
+            raise Exception("No context has been configured yet.")
+        return self._async_migration_context
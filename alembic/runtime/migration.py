@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from contextlib import contextmanager
 from contextlib import nullcontext
+import json
 import logging
+import os
 import sys
+import threading
+import time
 from typing import Any
+from typing import AsyncIterator
 from typing import Callable
 from typing import cast
 from typing import Collection
@@ -13,18 +20,22 @@ from typing import Dict
 from typing import Iterable
 from typing import Iterator
 from typing import List
+from typing import Mapping
 from typing import Optional
 from typing import Set
 from typing import Tuple
 from typing import TYPE_CHECKING
+from typing import TypeVar
 from typing import Union
 
+from sqlalchemy import bindparam
 from sqlalchemy import Column
 from sqlalchemy import literal_column
 from sqlalchemy import MetaData
 from sqlalchemy import PrimaryKeyConstraint
 from sqlalchemy import String
 from sqlalchemy import Table
+from sqlalchemy import Text
 from sqlalchemy.engine import Engine
 from sqlalchemy.engine import url as sqla_url
 from sqlalchemy.engine.strategies import MockEngineStrategy
@@ -40,9 +51,12 @@ if TYPE_CHECKING:
     from sqlalchemy.engine.base import Connection
     from sqlalchemy.engine.base import Transaction
     from sqlalchemy.engine.mock import MockConnection
+    from sqlalchemy.ext.asyncio import AsyncConnection
     from sqlalchemy.sql.elements import ClauseElement
+    from sqlalchemy.sql.elements import ColumnElement
 
     from .environment import EnvironmentContext
+    from .plan import StepPlan
     from ..config import Config
     from ..script.base import Script
     from ..script.base import ScriptDirectory
@@ -52,6 +66,8 @@ if TYPE_CHECKING:
 
 log = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 
 class _ProxyTransaction:
     def __init__(self, migration_context: MigrationContext) -> None:
@@ -66,12 +82,14 @@ class _ProxyTransaction:
         assert t is not None
         t.rollback()
         self.migration_context._transaction = None
+        self.migration_context._schema_snapshot_pending = False
 
     def commit(self) -> None:
         t = self._proxied_transaction
         assert t is not None
         t.commit()
         self.migration_context._transaction = None
+        self.migration_context._after_commit()
 
     def __enter__(self) -> _ProxyTransaction:
         return self
@@ -80,6 +98,10 @@ class _ProxyTransaction:
         if self._proxied_transaction is not None:
             self._proxied_transaction.__exit__(type_, value, traceback)
             self.migration_context._transaction = None
+            if type_ is None:
+                self.migration_context._after_commit()
+            else:
+                self.migration_context._schema_snapshot_pending = False
 
 
 class MigrationContext:
@@ -148,7 +170,34 @@ class MigrationContext:
             "transaction_per_migration", False
         )
         self.on_version_apply_callbacks = opts.get("on_version_apply", ())
+        self._version_table_write_mode = opts.get(
+            "version_table_write_mode", "immediate"
+        )
+        if self._version_table_write_mode not in ("immediate", "deferred"):
+            raise util.CommandError(
+                "version_table_write_mode must be 'immediate' or "
+                "'deferred'; got %r" % (self._version_table_write_mode,)
+            )
+        elif (
+            self._version_table_write_mode == "deferred"
+            and self._transaction_per_migration
+        ):
+            raise util.CommandError(
+                "version_table_write_mode='deferred' can't be used "
+                "with transaction_per_migration"
+            )
+        self._branch_workers = opts.get("branch_workers", 1)
+        if self._branch_workers > 1 and (
+            self._version_table_write_mode == "deferred"
+        ):
+            raise util.CommandError(
+                "version_table_write_mode='deferred' can't be used "
+                "with branch_workers"
+            )
         self._transaction: Optional[Transaction] = None
+        self._schema_snapshot_path: Optional[str] = opts.get("schema_snapshot")
+        self._schema_snapshot: Optional[Dict[str, Any]] = None
+        self._schema_snapshot_pending = False
 
         if as_sql:
             self.connection = cast(
@@ -201,6 +250,42 @@ class MigrationContext:
                 )
             )
 
+        # statements which maintain the version table in online mode; these
+        # use bound parameters so that they're compiled once and then
+        # retrieved from the statement cache for each migration step
+        version_num = self._version.c.version_num
+        self._version_insert = self._version.insert()
+        self._version_update = (
+            self._version.update()
+            .values(version_num=bindparam("to_version"))
+            .where(version_num == bindparam("from_version"))
+        )
+        self._version_delete = self._version.delete().where(
+            version_num == bindparam("from_version")
+        )
+
+        checkpoint_table = opts.get(
+            "checkpoint_table", "%s_checkpoint" % version_table
+        )
+        self._checkpoint = Table(
+            checkpoint_table,
+            MetaData(),
+            Column("version_num", String(32), nullable=False),
+            Column("checkpoint_key", String(255), nullable=False),
+            Column("state", Text, nullable=False),
+            PrimaryKeyConstraint(
+                "version_num",
+                "checkpoint_key",
+                name="%s_pkc" % checkpoint_table,
+            ),
+            schema=version_table_schema,
+        )
+        # checkpoints of the migrations being run, by revision; loaded
+        # when a migration step first uses them
+        self._checkpoints: Optional[Dict[str, Dict[str, Any]]] = None
+        self._checkpoint_revision: Optional[str] = None
+        self._checkpoint_step: Optional[Union[RevisionStep, StampStep]] = None
+
         self._start_from_rev: Optional[str] = opts.get("starting_rev")
         self.impl = ddl.DefaultImpl.get_by_dialect(dialect)(
             dialect,
@@ -414,7 +499,11 @@ class MigrationContext:
 
         """
 
-        if self._in_external_transaction:
+        if self._in_external_transaction or (
+            self.connection is None and not self.as_sql
+        ):
+            # there's no connection when autogenerating from a schema
+            # snapshot
             return nullcontext()
 
         if self.impl.transactional_ddl:
@@ -532,6 +621,8 @@ class MigrationContext:
                     "Can't specify current_rev to context "
                     "when using a database connection"
                 )
+            if self.connection is None and self._schema_snapshot_path:
+                return tuple(self._load_schema_snapshot()["heads"])
             if not self._has_version_table():
                 return ()
         assert self.connection is not None
@@ -566,6 +657,7 @@ class MigrationContext:
         if not self.as_sql and not heads:
             self._ensure_version_table()
         head_maintainer = HeadMaintainer(self, heads)
+        heads = self._update_replaced_heads(heads, head_maintainer, stamp=True)
         for step in script_directory._stamp_revs(revision, heads):
             head_maintainer.update_to_step(step)
 
@@ -592,6 +684,16 @@ class MigrationContext:
         """
         self.impl.start_migrations()
 
+        plan = self.opts.get("plan")
+        if plan is not None:
+            self._plan_migrations(plan, kw)
+            return
+
+        if self._branch_workers > 1 and not self.as_sql and not self.purge:
+            applied = self._run_branches(kw)
+            self._schedule_schema_snapshot(applied)
+            return
+
         heads: Tuple[str, ...]
         if self.purge:
             if self.as_sql:
@@ -603,44 +705,553 @@ class MigrationContext:
 
             dont_mutate = self.opts.get("dont_mutate", False)
 
-            if not self.as_sql and not heads and not dont_mutate:
+            if (
+                not self.as_sql
+                and self.connection is not None
+                and not heads
+                and not dont_mutate
+            ):
                 self._ensure_version_table()
 
-        head_maintainer = HeadMaintainer(self, heads)
+        head_maintainer = HeadMaintainer(
+            self,
+            heads,
+            deferred=self._version_table_write_mode == "deferred",
+        )
+        heads = self._update_replaced_heads(
+            heads, head_maintainer, stamp=self.opts.get("stamp", False)
+        )
 
         assert self._migrations_fn is not None
-        for step in self._migrations_fn(heads, self):
-            with self.begin_transaction(_per_migration=True):
-                if self.as_sql and not head_maintainer.heads:
-                    # for offline mode, include a CREATE TABLE from
-                    # the base
-                    assert self.connection is not None
-                    self._version.create(self.connection)
-                log.info("Running %s", step)
-                if self.as_sql:
-                    self.impl.static_output(
-                        "-- Running %s" % (step.short_log,)
-                    )
-                step.migration_fn(**kw)
-
-                # previously, we wouldn't stamp per migration
-                # if we were in a transaction, however given the more
-                # complex model that involves any number of inserts
-                # and row-targeted updates and deletes, it's simpler for now
-                # just to run the operations on every version
-                head_maintainer.update_to_step(step)
-                for callback in self.on_version_apply_callbacks:
-                    callback(
-                        ctx=self,
-                        step=step.info,
-                        heads=set(head_maintainer.heads),
-                        run_args=kw,
+        applied = False
+        try:
+            for step in self._migrations_fn(heads, self):
+                applied = True
+                with self.begin_transaction(_per_migration=True):
+                    if self.as_sql and not head_maintainer.heads:
+                        # for offline mode, include a CREATE TABLE from
+                        # the base
+                        assert self.connection is not None
+                        self._version.create(self.connection)
+                    log.info("Running %s", step)
+                    if self.as_sql:
+                        self.impl.static_output(
+                            "-- Running %s" % (step.short_log,)
+                        )
+                    statistics = self._run_step(step, kw)
+
+                    # previously, we wouldn't stamp per migration
+                    # if we were in a transaction, however given the more
+                    # complex model that involves any number of inserts
+                    # and row-targeted updates and deletes, it's simpler for
+                    # now just to run the operations on every version
+                    head_maintainer.update_to_step(step)
+                    self._step_applied(
+                        step, statistics, head_maintainer.heads, kw
                     )
+        except BaseException:
+            if head_maintainer.deferred and not self.impl.transactional_ddl:
+                # the migrations which completed won't be rolled back;
+                # record them before propagating the error
+                with self.begin_transaction(_per_migration=True):
+                    head_maintainer.flush()
+            raise
+
+        if head_maintainer.deferred:
+            with self.begin_transaction(_per_migration=True):
+                head_maintainer.flush()
 
         if self.as_sql and not head_maintainer.heads:
             assert self.connection is not None
             self._version.drop(self.connection)
 
+        self._schedule_schema_snapshot(applied)
+
+    def _schedule_schema_snapshot(self, applied: bool) -> None:
+        """Write the schema snapshot configured by
+        :paramref:`.EnvironmentContext.configure.schema_snapshot`, if any,
+        once migrations have been run against the database, or if it
+        doesn't exist yet.
+
+        When the migrations run within the transaction begun by
+        :meth:`.MigrationContext.begin_transaction`, the snapshot is
+        written once that transaction is committed, so that it doesn't
+        record a schema which may yet be rolled back.  When they run
+        within a transaction begun outside of the migration context, its
+        outcome isn't known here, so the snapshot isn't written.
+
+        """
+
+        path = self._schema_snapshot_path
+        if (
+            path is None
+            or self.as_sql
+            or self.connection is None
+            or self.opts.get("dont_mutate", False)
+            or not (applied or not os.path.exists(path))
+        ):
+            return
+
+        if self._in_external_transaction:
+            util.warn(
+                "Schema snapshot %s not written, as migrations were run "
+                "within a transaction begun outside of "
+                "begin_transaction(); the snapshot is written only when "
+                "the migration context commits the transaction" % path
+            )
+        elif self._transaction is not None:
+            self._schema_snapshot_pending = True
+        else:
+            self._write_schema_snapshot()
+
+    def _after_commit(self) -> None:
+        if self._schema_snapshot_pending:
+            self._schema_snapshot_pending = False
+            self._write_schema_snapshot()
+
+    def _write_schema_snapshot(self) -> None:
+        from ..autogenerate.snapshot import write_snapshot
+
+        assert self._schema_snapshot_path is not None
+        assert self.connection is not None
+        write_snapshot(
+            self.connection,
+            self._schema_snapshot_path,
+            self.get_current_heads(),
+            include_schemas=self.opts.get("include_schemas", False),
+        )
+
+    def _load_schema_snapshot(self) -> Dict[str, Any]:
+        if self._schema_snapshot is None:
+            from ..autogenerate.snapshot import load_snapshot
+
+            assert self._schema_snapshot_path is not None
+            self._schema_snapshot = load_snapshot(self._schema_snapshot_path)
+        return self._schema_snapshot
+
+    def _plan_migrations(
+        self, plan: List[StepPlan], kw: Dict[str, Any]
+    ) -> None:
+        """Record the operations the migration steps would invoke into
+        the given list, without running them or writing to the version
+        table."""
+
+        from .plan import _UpgradePlanner
+
+        assert self._migrations_fn is not None
+        steps = self._migrations_fn(self.get_current_heads(), self)
+        plan.extend(_UpgradePlanner(self).plan(steps, kw))
+
+    def _run_step(
+        self, step: Union[RevisionStep, StampStep], kw: Dict[str, Any]
+    ) -> StepStatistics:
+        revision: Optional[str] = None
+        if isinstance(step, RevisionStep) and not self.as_sql:
+            revision = step.revision.revision
+
+        # statements are only timed and counted when the statistics
+        # are to be passed on
+        statistics = StepStatistics()
+        if self._collect_statistics:
+            self.impl.statistics = statistics
+        self._checkpoint_revision = revision
+        self._checkpoint_step = step
+        if self._checkpoints is not None:
+            # checkpoints loaded by an earlier step
+            self._log_resume()
+        start = time.perf_counter()
+        try:
+            step.migration_fn(**kw)
+        finally:
+            statistics.elapsed = time.perf_counter() - start
+            self.impl.statistics = None
+            self._checkpoint_revision = None
+            self._checkpoint_step = None
+
+        # the step is complete; its checkpoints are removed along with
+        # the update of the version table
+        if revision is not None and self._checkpoints:
+            if self._checkpoints.pop(revision, None):
+                self._clear_checkpoints(revision)
+        return statistics
+
+    def checkpoint(self, key: str, state: Any) -> None:
+        """Record the progress of the migration step being run, so that
+        if the step fails, it can resume from this point when it's run
+        again.
+
+        This is intended for data migrations which process a large table
+        in chunks; the ``upgrade()`` or ``downgrade()`` function retrieves
+        the state recorded for a key by an earlier, failed run using
+        :meth:`.MigrationContext.get_checkpoint`, skips the work it
+        represents, and records a new state after each chunk::
+
+            def upgrade():
+                context = op.get_context()
+                last_id = context.get_checkpoint("backfill", 0)
+                while True:
+                    ids = [
+                        row.id
+                        for row in op.get_bind().execute(
+                            sa.select(account.c.id)
+                            .where(account.c.id > last_id)
+                            .order_by(account.c.id)
+                            .limit(10000)
+                        )
+                    ]
+                    if not ids:
+                        break
+                    op.execute(
+                        account.update()
+                        .where(account.c.id.in_(ids))
+                        .values(status="active")
+                    )
+                    last_id = ids[-1]
+                    context.checkpoint("backfill", last_id)
+
+        The state is stored as JSON in a table alongside the version
+        table, named after it with the suffix ``_checkpoint`` unless
+        :paramref:`.EnvironmentContext.configure.checkpoint_table` is
+        given, which is created when first needed.  When the migration
+        runs within a transaction begun by
+        :meth:`.MigrationContext.begin_transaction`, **the transaction is
+        committed** along with the checkpoint and a new one begun, so that
+        the work preceding the checkpoint is kept should the step fail;
+        :paramref:`.EnvironmentContext.configure.transaction_per_migration`
+        should be used so that only the step itself is committed in part.
+        Once the step completes, its checkpoints are removed along with
+        the update of the version table.
+
+        Has no effect in "offline" mode.  Can't be used with
+        :paramref:`.EnvironmentContext.configure.version_table_write_mode`
+        of ``"deferred"``, where the version table wouldn't reflect the
+        steps committed before the checkpoint.
+
+        :param key: a string identifying the progress recorded, unique
+         within the migration step.
+        :param state: a JSON serializable value.
+
+        .. versionadded:: 1.12.0
+
+        """
+        if self.as_sql:
+            return
+        revision = self._checkpoint_revision
+        if revision is None:
+            raise util.CommandError(
+                "checkpoint() may only be called within a migration script"
+            )
+        if self._version_table_write_mode == "deferred":
+            raise util.CommandError(
+                "checkpoint() can't be used with "
+                "version_table_write_mode='deferred'"
+            )
+        assert self.connection is not None
+
+        loaded = self._load_checkpoints()
+        if not loaded:
+            with sqla_compat._ensure_scope_for_ddl(self.connection):
+                self._checkpoint.create(self.connection, checkfirst=True)
+
+        value = json.dumps(state)
+        checkpoints = loaded.setdefault(revision, {})
+        if key in checkpoints:
+            self.connection.execute(
+                self._checkpoint.update()
+                .where(self._checkpoint.c.version_num == revision)
+                .where(self._checkpoint.c.checkpoint_key == key)
+                .values(state=value)
+            )
+        else:
+            self.connection.execute(
+                self._checkpoint.insert().values(
+                    version_num=revision, checkpoint_key=key, state=value
+                )
+            )
+        checkpoints[key] = json.loads(value)
+
+        if self._transaction is not None:
+            self._transaction.commit()
+            self._transaction = sqla_compat._safe_begin_connection_transaction(
+                self.connection
+            )
+
+    def get_checkpoint(self, key: str, default: Any = None) -> Any:
+        """Return the state recorded by
+        :meth:`.MigrationContext.checkpoint` for the given key by the
+        migration step being run, during an earlier run which didn't
+        complete, or during this one.
+
+        :param key: a string identifying the progress recorded.
+        :param default: the value to return if no state is recorded.
+
+        .. versionadded:: 1.12.0
+
+        """
+        revision = self._checkpoint_revision
+        if revision is None:
+            return default
+        return self._load_checkpoints().get(revision, {}).get(key, default)
+
+    def _load_checkpoints(self) -> Dict[str, Dict[str, Any]]:
+        """Return the checkpoints of the migrations being run, loading
+        them when a migration step first uses them, so that upgrades
+        whose scripts don't use checkpoints don't query for them.
+
+        """
+        if self._checkpoints is None:
+            self._checkpoints = self.get_checkpoints()
+            self._log_resume()
+        return self._checkpoints
+
+    def _log_resume(self) -> None:
+        revision = self._checkpoint_revision
+        if (
+            revision is not None
+            and self._checkpoints
+            and self._checkpoints.get(revision)
+        ):
+            log.info(
+                "Resuming %s from checkpoints %s",
+                self._checkpoint_step,
+                ", ".join(sorted(self._checkpoints[revision])),
+            )
+
+    def get_checkpoints(self) -> Dict[str, Dict[str, Any]]:
+        """Return the checkpoints recorded by migration steps which have
+        yet to complete, as a dictionary of state by key, for each
+        revision.
+
+        These are the points from which those steps will resume when
+        they're next run.  Returns an empty dictionary in "offline" mode.
+
+        .. versionadded:: 1.12.0
+
+        """
+        checkpoints: Dict[str, Dict[str, Any]] = {}
+        if self.as_sql:
+            return checkpoints
+
+        assert self.connection is not None
+        if not sqla_compat._connectable_has_table(
+            self.connection,
+            self._checkpoint.name,
+            self._checkpoint.schema,
+        ):
+            return checkpoints
+
+        for row in self.connection.execute(self._checkpoint.select()):
+            checkpoints.setdefault(row.version_num, {})[
+                row.checkpoint_key
+            ] = json.loads(row.state)
+        return checkpoints
+
+    def _clear_checkpoints(self, revision: str) -> None:
+        assert self.connection is not None
+        self.connection.execute(
+            self._checkpoint.delete().where(
+                self._checkpoint.c.version_num == revision
+            )
+        )
+
+    @property
+    def _collect_statistics(self) -> bool:
+        return self.opts.get("step_infos") is not None or bool(
+            self.on_version_apply_callbacks
+        )
+
+    def _step_applied(
+        self,
+        step: Union[RevisionStep, StampStep],
+        statistics: StepStatistics,
+        heads: Set[str],
+        kw: Dict[str, Any],
+    ) -> None:
+        if not self._collect_statistics:
+            log.info("Ran %s in %.3fs", step.short_log, statistics.elapsed)
+            return
+
+        log.info(
+            "Ran %s in %.3fs; %d statements, %d rows",
+            step.short_log,
+            statistics.elapsed,
+            statistics.statements,
+            statistics.rows,
+        )
+        step_infos = self.opts.get("step_infos")
+
+        info = step.info
+        info.statistics = statistics
+        if step_infos is not None:
+            step_infos.append(info)
+        for callback in self.on_version_apply_callbacks:
+            callback(ctx=self, step=info, heads=set(heads), run_args=kw)
+
+    def _run_branches(self, kw: Dict[str, Any]) -> bool:
+        """Run the migration steps of independent branches concurrently,
+        each on its own connection from the engine of this context's
+        connection, as configured by
+        :paramref:`.EnvironmentContext.configure.branch_workers`.
+
+        Returns True if any steps were run.
+
+        """
+        from ..operations import Operations
+
+        assert self.connection is not None
+        assert self._migrations_fn is not None
+        engine = self.connection.engine
+
+        heads = self.get_current_heads()
+
+        # the version table is only written using connections of the
+        # engine, each of which commits as it goes, so that the writes
+        # are visible to the others and can't wait upon this context's
+        # connection
+        with engine.begin() as connection:
+            context = self._branch_context(connection)
+            if not heads and not self.opts.get("dont_mutate", False):
+                context._ensure_version_table()
+            heads = context._update_replaced_heads(
+                heads,
+                HeadMaintainer(context, heads),
+                stamp=self.opts.get("stamp", False),
+            )
+
+        steps = list(self._migrations_fn(heads, self))
+        branches = self._independent_branches(steps)
+
+        shared_heads = set(heads)
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def run_branch(steps: List[RevisionStep]) -> None:
+            with engine.connect() as connection:
+                context = self._branch_context(connection)
+                context.impl.start_migrations()
+                head_maintainer = HeadMaintainer(context, ())
+
+                # the heads are shared by all branches, and only
+                # changed while holding the lock
+                head_maintainer.heads = shared_heads
+
+                with Operations.context(context):
+                    for step in steps:
+                        if failed.is_set():
+                            return
+                        try:
+                            with context.begin_transaction(
+                                _per_migration=True
+                            ):
+                                log.info("Running %s", step)
+                                statistics = context._run_step(step, kw)
+                                with lock:
+                                    head_maintainer.update_to_step(step)
+                                    context._step_applied(
+                                        step, statistics, shared_heads, kw
+                                    )
+                        except BaseException:
+                            failed.set()
+                            raise
+
+        if len(branches) < 2:
+            for branch in branches:
+                run_branch(branch)
+            return bool(branches)
+
+        log.info("Running %d independent branches concurrently", len(branches))
+        with util.ModuleClsProxy._proxies_per_context():
+            with ThreadPoolExecutor(
+                min(self._branch_workers, len(branches))
+            ) as executor:
+                futures = [
+                    executor.submit(run_branch, branch) for branch in branches
+                ]
+        for future in futures:
+            future.result()
+        return True
+
+    def _branch_context(self, connection: Connection) -> MigrationContext:
+        return MigrationContext(
+            self.dialect,
+            connection,
+            dict(self.opts, transaction_per_migration=True, branch_workers=1),
+            self.environment_context,
+        )
+
+    @classmethod
+    def _independent_branches(
+        cls, steps: List[RevisionStep]
+    ) -> List[List[RevisionStep]]:
+        """Partition upgrade steps into groups which share no revisions,
+        whether as the revisions being upgraded, their down revisions or
+        their dependencies, keeping the order of the steps in each group.
+
+        """
+        if not all(
+            isinstance(step, RevisionStep) and step.is_upgrade
+            for step in steps
+        ):
+            return [steps] if steps else []
+
+        parents: Dict[str, str] = {}
+
+        def find(rev: str) -> str:
+            root = parents.setdefault(rev, rev)
+            while root != parents[root]:
+                root = parents[root]
+            parents[rev] = root
+            return root
+
+        for step in steps:
+            root = find(step.revision.revision)
+            for down in step.revision._all_down_revisions:
+                down_root = find(down)
+                if down_root != root:
+                    parents[down_root] = root
+
+        branches: Dict[str, List[RevisionStep]] = {}
+        for step in steps:
+            branches.setdefault(find(step.revision.revision), []).append(step)
+        return list(branches.values())
+
+    def _update_replaced_heads(
+        self,
+        heads: Tuple[str, ...],
+        head_maintainer: HeadMaintainer,
+        stamp: bool = False,
+    ) -> Tuple[str, ...]:
+        """Check for heads that refer to revisions which were squashed into
+        a baseline revision.
+
+        The baseline revision keeps the identifier of the last revision of
+        the squashed series, so only a database at that revision has the
+        schema the baseline creates.  A database at one of the other,
+        replaced revisions would skip the migrations between that revision
+        and the baseline, so it's refused, including by commands such as
+        ``current`` which don't write to the database, unless it's being
+        stamped, in which case its heads are moved onto the baseline
+        revision before the stamp is applied.
+
+        """
+        if self.script is None or not heads:
+            return heads
+        replaced = self.script.revision_map._replaced_revisions
+        if not replaced or replaced.keys().isdisjoint(heads):
+            return heads
+        elif not stamp:
+            head = next(head for head in heads if head in replaced)
+            raise util.CommandError(
+                "Database is at revision %s, which was squashed into "
+                "baseline revision %s; the database must be upgraded to %s "
+                "using the archived revision files, or stamped explicitly"
+                % (head, replaced[head], replaced[head])
+            )
+        else:
+            with self.begin_transaction(_per_migration=True):
+                head_maintainer.update_replaced_versions(replaced)
+            return tuple(head_maintainer.heads)
+
     def _in_connection_transaction(self) -> bool:
         try:
             meth = self.connection.in_transaction  # type:ignore[union-attr]
@@ -728,7 +1339,8 @@ class MigrationContext:
         metadata_column: Column[Any],
         rendered_metadata_default: Optional[str],
         rendered_column_default: Optional[str],
-    ) -> bool:
+        defer: bool = False,
+    ) -> Union[bool, ColumnElement[bool]]:
         if self._user_compare_server_default is False:
             return False
 
@@ -744,6 +1356,15 @@ class MigrationContext:
             if user_value is not None:
                 return user_value
 
+        if defer and self.impl._defers_server_default_comparison():
+            # the comparison may be returned as an expression to be
+            # evaluated on the server along with others
+            return self.impl._server_default_comparison(
+                inspector_column,
+                metadata_column,
+                rendered_metadata_default,
+                rendered_column_default,
+            )
         return self.impl.compare_server_default(
             inspector_column,
             metadata_column,
@@ -752,30 +1373,265 @@ class MigrationContext:
         )
 
 
+class AsyncMigrationContext:
+    """Provide awaitable versions of the methods of a
+    :class:`.MigrationContext` which make use of the database, for an
+    :class:`~sqlalchemy.ext.asyncio.AsyncConnection`.
+
+    Each method runs the corresponding method of the
+    :class:`.MigrationContext` within
+    :meth:`~sqlalchemy.ext.asyncio.AsyncConnection.run_sync`, so that
+    the event loop remains free to run other tasks while the database is
+    waited upon; the migrations of several databases may be run
+    concurrently with ``asyncio.gather()``, for example.  Each task
+    sees its own :class:`.Operations` object as ``alembic.op`` while its
+    migrations run.
+
+    E.g.::
+
+        from alembic.runtime.migration import AsyncMigrationContext
+
+        async with engine.connect() as connection:
+            context = AsyncMigrationContext.configure(
+                connection,
+                opts={
+                    "script": script,
+                    "fn": lambda rev, context: script._upgrade_revs(
+                        "head", rev
+                    ),
+                },
+            )
+            async with context.begin_transaction():
+                await context.run_migrations()
+
+    Within a migration run this way, :meth:`.Operations.run_async` may be
+    used to call upon async functions using the same
+    :class:`~sqlalchemy.ext.asyncio.AsyncConnection`.
+
+    .. versionadded:: 1.12.0
+
+    .. seealso::
+
+        :class:`.AsyncEnvironmentContext`
+
+    """
+
+    def __init__(
+        self,
+        migration_context: MigrationContext,
+        connection: Optional[AsyncConnection],
+    ) -> None:
+        self.migration_context = migration_context
+        self.connection = connection
+
+    @classmethod
+    def configure(
+        cls,
+        connection: Optional[AsyncConnection] = None,
+        url: Optional[Union[str, URL]] = None,
+        dialect_name: Optional[str] = None,
+        dialect: Optional[Dialect] = None,
+        environment_context: Optional[EnvironmentContext] = None,
+        dialect_opts: Optional[Dict[str, str]] = None,
+        opts: Optional[Any] = None,
+    ) -> AsyncMigrationContext:
+        """Create a new :class:`.AsyncMigrationContext`.
+
+        The arguments are those of :meth:`.MigrationContext.configure`,
+        except that ``connection`` is an
+        :class:`~sqlalchemy.ext.asyncio.AsyncConnection`.
+
+        """
+        return cls(
+            MigrationContext.configure(
+                connection=connection.sync_connection
+                if connection is not None
+                else None,
+                url=url,
+                dialect_name=dialect_name,
+                dialect=dialect,
+                environment_context=environment_context,
+                dialect_opts=dialect_opts,
+                opts=opts,
+            ),
+            connection,
+        )
+
+    async def _run(self, fn: Callable[[], _T]) -> _T:
+        if self.connection is None:
+            # "offline" mode; no database is waited upon
+            return fn()
+        return await self.connection.run_sync(lambda conn: fn())
+
+    @asynccontextmanager
+    async def begin_transaction(
+        self, _per_migration: bool = False
+    ) -> AsyncIterator[None]:
+        """Begin a logical transaction for migration operations.
+
+        This is the async version of
+        :meth:`.MigrationContext.begin_transaction`, for use with
+        ``async with``.
+
+        """
+        transaction = self.migration_context.begin_transaction(
+            _per_migration=_per_migration
+        )
+        await self._run(transaction.__enter__)
+        try:
+            yield
+        except BaseException:
+            exc_info = sys.exc_info()
+            if not await self._run(lambda: transaction.__exit__(*exc_info)):
+                raise
+        else:
+            await self._run(lambda: transaction.__exit__(None, None, None))
+
+    async def get_current_revision(self) -> Optional[str]:
+        """Return the current revision; see
+        :meth:`.MigrationContext.get_current_revision`.
+
+        """
+        return await self._run(self.migration_context.get_current_revision)
+
+    async def get_current_heads(self) -> Tuple[str, ...]:
+        """Return a tuple of the current 'head versions'; see
+        :meth:`.MigrationContext.get_current_heads`.
+
+        """
+        return await self._run(self.migration_context.get_current_heads)
+
+    async def stamp(
+        self, script_directory: ScriptDirectory, revision: str
+    ) -> None:
+        """Stamp the version table with a specific revision; see
+        :meth:`.MigrationContext.stamp`.
+
+        """
+        await self._run(
+            lambda: self.migration_context.stamp(script_directory, revision)
+        )
+
+    async def execute(
+        self,
+        sql: Union[ClauseElement, str],
+        execution_options: Optional[dict] = None,
+    ) -> None:
+        """Execute a SQL construct or string statement; see
+        :meth:`.MigrationContext.execute`.
+
+        """
+        await self._run(
+            lambda: self.migration_context.execute(
+                sql, execution_options=execution_options
+            )
+        )
+
+    async def run_migrations(self, **kw: Any) -> None:
+        """Run the migration scripts established for this
+        :class:`.AsyncMigrationContext`, if any; see
+        :meth:`.MigrationContext.run_migrations`.
+
+        The migration scripts themselves are run as usual, with an
+        :class:`.Operations` object established as ``alembic.op``.
+
+        """
+        from ..operations import Operations
+
+        def run() -> None:
+            with Operations.context(self.migration_context):
+                self.migration_context.run_migrations(**kw)
+
+        with util.ModuleClsProxy._proxies_per_context():
+            await self._run(run)
+
+
 class HeadMaintainer:
-    def __init__(self, context: MigrationContext, heads: Any) -> None:
+    def __init__(
+        self, context: MigrationContext, heads: Any, deferred: bool = False
+    ) -> None:
         self.context = context
         self.heads = set(heads)
+        self.deferred = deferred
+
+        # the heads as present in the version table, when writes
+        # are deferred
+        self._written_heads = set(heads)
 
     def _insert_version(self, version: str) -> None:
         assert version not in self.heads
         self.heads.add(version)
 
-        self.context.impl._exec(
-            self.context._version.insert().values(
-                version_num=literal_column("'%s'" % version)
-            )
-        )
+        if not self.deferred:
+            self._write_insert(version)
 
     def _delete_version(self, version: str) -> None:
         self.heads.remove(version)
 
-        ret = self.context.impl._exec(
-            self.context._version.delete().where(
-                self.context._version.c.version_num
-                == literal_column("'%s'" % version)
-            )
+        if not self.deferred:
+            self._write_delete(version)
+
+    def _update_version(self, from_: str, to_: str) -> None:
+        assert to_ not in self.heads
+        self.heads.remove(from_)
+        self.heads.add(to_)
+
+        if not self.deferred:
+            self._write_update(from_, to_)
+
+    def flush(self) -> None:
+        """Write the difference between the heads as present in the
+        version table and the current heads, when writes are deferred.
+
+        Each head that's replaced by another is written as a single
+        UPDATE; remaining heads are written with INSERT or DELETE.
+
+        """
+        if not self.deferred:
+            return
+
+        deleted = sorted(self._written_heads.difference(self.heads))
+        inserted = sorted(self.heads.difference(self._written_heads))
+        self._written_heads = set(self.heads)
+
+        log.debug(
+            "write deferred versions, delete %s, insert %s",
+            deleted,
+            inserted,
         )
+        for from_, to_ in zip(deleted, inserted):
+            self._write_update(from_, to_)
+        for version in deleted[len(inserted) :]:
+            self._write_delete(version)
+        for version in inserted[len(deleted) :]:
+            self._write_insert(version)
+
+    def _write_insert(self, version: str) -> None:
+        if self.context.as_sql:
+            self.context.impl._exec(
+                self.context._version.insert().values(
+                    version_num=literal_column("'%s'" % version)
+                )
+            )
+        else:
+            self.context.impl._exec(
+                self.context._version_insert,
+                params={"version_num": version},
+            )
+
+    def _write_delete(self, version: str) -> None:
+        if self.context.as_sql:
+            ret = self.context.impl._exec(
+                self.context._version.delete().where(
+                    self.context._version.c.version_num
+                    == literal_column("'%s'" % version)
+                )
+            )
+        else:
+            ret = self.context.impl._exec(
+                self.context._version_delete,
+                params={"from_version": version},
+            )
 
         if (
             not self.context.as_sql
@@ -790,19 +1646,21 @@ class HeadMaintainer:
                 % (version, self.context.version_table, ret.rowcount)
             )
 
-    def _update_version(self, from_: str, to_: str) -> None:
-        assert to_ not in self.heads
-        self.heads.remove(from_)
-        self.heads.add(to_)
-
-        ret = self.context.impl._exec(
-            self.context._version.update()
-            .values(version_num=literal_column("'%s'" % to_))
-            .where(
-                self.context._version.c.version_num
-                == literal_column("'%s'" % from_)
+    def _write_update(self, from_: str, to_: str) -> None:
+        if self.context.as_sql:
+            ret = self.context.impl._exec(
+                self.context._version.update()
+                .values(version_num=literal_column("'%s'" % to_))
+                .where(
+                    self.context._version.c.version_num
+                    == literal_column("'%s'" % from_)
+                )
+            )
+        else:
+            ret = self.context.impl._exec(
+                self.context._version_update,
+                params={"from_version": from_, "to_version": to_},
             )
-        )
 
         if (
             not self.context.as_sql
@@ -817,6 +1675,13 @@ class HeadMaintainer:
                 % (from_, to_, self.context.version_table, ret.rowcount)
             )
 
+    def update_replaced_versions(self, replaced: Mapping[str, str]) -> None:
+        for version in [head for head in self.heads if head in replaced]:
+            if replaced[version] in self.heads:
+                self._delete_version(version)
+            else:
+                self._update_version(version, replaced[version])
+
     def update_to_step(self, step: Union[RevisionStep, StampStep]) -> None:
         if step.should_delete_branch(self.heads):
             vers = step.delete_version_num
@@ -863,6 +1728,87 @@ class HeadMaintainer:
             self._update_version(from_, to_)
 
 
+class StepStatistics:
+    """Timing and statement counts for a single migration step.
+
+    Available as :attr:`.MigrationInfo.statistics`.  Only statements
+    emitted by way of the :class:`.Operations` API, such as
+    :meth:`.Operations.create_table` and :meth:`.Operations.execute`, are
+    counted; statements executed directly upon the connection returned by
+    :meth:`.Operations.get_bind` are not, though the time they take is
+    included in :attr:`.StepStatistics.elapsed`.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    elapsed: float
+    """Wall time in seconds taken by the ``upgrade()`` or ``downgrade()``
+    function of the step, not including the update of the version
+    table."""
+
+    statements: int
+    """The number of statements executed."""
+
+    ddl_statements: int
+    """The number of statements executed which were DDL, such as
+    ``CREATE TABLE`` or ``ALTER TABLE``."""
+
+    rows: int
+    """The total number of rows affected by the DML statements executed,
+    as reported by the DBAPI."""
+
+    ddl_elapsed: float
+    """Time in seconds spent executing DDL statements."""
+
+    dml_elapsed: float
+    """Time in seconds spent executing statements other than DDL."""
+
+    def __init__(self) -> None:
+        self.elapsed = 0.0
+        self.statements = 0
+        self.ddl_statements = 0
+        self.rows = 0
+        self.ddl_elapsed = 0.0
+        self.dml_elapsed = 0.0
+
+    def _add_ddl(self, elapsed: float) -> None:
+        self.statements += 1
+        self.ddl_statements += 1
+        self.ddl_elapsed += elapsed
+
+    def _add_dml(self, elapsed: float, rowcount: int) -> None:
+        self.statements += 1
+        self.dml_elapsed += elapsed
+        if rowcount > 0:
+            self.rows += rowcount
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a dictionary."""
+        return {
+            "elapsed": self.elapsed,
+            "statements": self.statements,
+            "ddl_statements": self.ddl_statements,
+            "rows": self.rows,
+            "ddl_elapsed": self.ddl_elapsed,
+            "dml_elapsed": self.dml_elapsed,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            "StepStatistics(elapsed=%.3f, statements=%d, ddl_statements=%d, "
+            "rows=%d, ddl_elapsed=%.3f, dml_elapsed=%.3f)"
+            % (
+                self.elapsed,
+                self.statements,
+                self.ddl_statements,
+                self.rows,
+                self.ddl_elapsed,
+                self.dml_elapsed,
+            )
+        )
+
+
 class MigrationInfo:
     """Exposes information about a migration step to a callback listener.
 
@@ -916,6 +1862,14 @@ class MigrationInfo:
     revision_map: RevisionMap
     """The revision map inside of which this operation occurs."""
 
+    statistics: Optional[StepStatistics]
+    """A :class:`.StepStatistics` with the time taken and statements
+    executed by the step, once it's been run.
+
+    .. versionadded:: 1.12.0
+
+    """
+
     def __init__(
         self,
         revision_map: RevisionMap,
@@ -923,8 +1877,10 @@ class MigrationInfo:
         is_stamp: bool,
         up_revisions: Union[str, Tuple[str, ...]],
         down_revisions: Union[str, Tuple[str, ...]],
+        statistics: Optional[StepStatistics] = None,
     ) -> None:
         self.revision_map = revision_map
+        self.statistics = statistics
         self.is_upgrade = is_upgrade
         self.is_stamp = is_stamp
         self.up_revision_ids = util.to_tuple(up_revisions, default=())
@@ -1140,8 +2096,8 @@ class RevisionStep(MigrationStep):
         if other_heads:
             ancestors = {
                 r.revision
-                for r in self.revision_map._get_ancestor_nodes(
-                    self.revision_map.get_revisions(other_heads), check=False
+                for r in self.revision_map._get_ancestor_set(
+                    self.revision_map.get_revisions(other_heads)
                 )
             }
             from_revisions = list(
@@ -1162,8 +2118,8 @@ class RevisionStep(MigrationStep):
         if other_heads:
             ancestors = {
                 r.revision
-                for r in self.revision_map._get_ancestor_nodes(
-                    self.revision_map.get_revisions(other_heads), check=False
+                for r in self.revision_map._get_ancestor_set(
+                    self.revision_map.get_revisions(other_heads)
                 )
             }
             return tuple(set(self.to_revisions).difference(ancestors))
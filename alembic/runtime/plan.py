@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import logging
+import re
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from .. import util
+from ..operations import batch
+from ..operations import ops
+from ..operations.base import BatchOperations
+from ..operations.base import Operations
+from ..util import sqla_compat
+
+if TYPE_CHECKING:
+    from typing import Literal
+
+    from sqlalchemy import Table
+    from sqlalchemy.engine import Connection
+    from sqlalchemy.engine import Transaction
+
+    from .migration import MigrationContext
+    from .migration import MigrationInfo
+    from .migration import RevisionStep
+
+log = logging.getLogger(__name__)
+
+LARGE_TABLE_ROWS = 100000
+"""The number of rows at which a table is considered large by
+:attr:`.PlannedOperation.locks_large_table`."""
+
+LARGE_TABLE_SIZE = 100 * 1024 * 1024
+"""The size in bytes at which a table is considered large by
+:attr:`.PlannedOperation.locks_large_table`."""
+
+_effects = util.Dispatcher()
+
+
+class PlannedOperation:
+    """An operation recorded by planning an upgrade, along with its
+    estimated effect upon the table it applies to.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    operation: ops.MigrateOperation
+    """The :class:`.MigrateOperation` which would be invoked."""
+
+    table_name: Optional[str]
+    """The name of the table the operation applies to, if any."""
+
+    schema: Optional[str]
+    """The schema of the table the operation applies to, if any."""
+
+    effect: Optional[str]
+    """The estimated effect of the operation upon the table:
+    ``"rewrite"`` if the table is copied or rebuilt in full, such as the
+    "move and copy" of a batch operation on SQLite, a MySQL
+    ``MODIFY COLUMN`` or a PostgreSQL type change; ``"scan"`` if the table
+    is read in full while locked, such as to create an index or to
+    validate a new ``NOT NULL`` or foreign key constraint; otherwise
+    ``None``."""
+
+    recreate: bool
+    """True if the operation is part of a batch operation which
+    recreates the table."""
+
+    rows: Optional[int]
+    """The number of rows in the table, estimated from database statistics
+    where the backend provides them; ``None`` if not known."""
+
+    size: Optional[int]
+    """The size of the table in bytes, including indexes, where the
+    backend provides it; ``None`` if not known."""
+
+    def __init__(
+        self,
+        operation: ops.MigrateOperation,
+        table_name: Optional[str],
+        schema: Optional[str],
+        effect: Optional[str],
+        recreate: bool = False,
+        rows: Optional[int] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        self.operation = operation
+        self.table_name = table_name
+        self.schema = schema
+        self.effect = effect
+        self.recreate = recreate
+        self.rows = rows
+        self.size = size
+
+    @property
+    def name(self) -> str:
+        """The name of the operation, such as ``"alter_column"``."""
+        name = type(self.operation).__name__
+        if name.endswith("Op"):
+            name = name[:-2]
+        return re.sub(
+            r"(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])", "_", name
+        ).lower()
+
+    @property
+    def locks_large_table(self) -> bool:
+        """True if the operation rewrites or scans a table having at least
+        :data:`.LARGE_TABLE_ROWS` rows or :data:`.LARGE_TABLE_SIZE` bytes.
+        """
+        return self.effect is not None and (
+            (self.rows is not None and self.rows >= LARGE_TABLE_ROWS)
+            or (self.size is not None and self.size >= LARGE_TABLE_SIZE)
+        )
+
+    def __repr__(self) -> str:
+        return "<%s %s %s effect=%r>" % (
+            self.__class__.__name__,
+            self.name,
+            self.table_name,
+            self.effect,
+        )
+
+
+class StepPlan:
+    """The operations a migration step would invoke, as recorded by
+    planning an upgrade with :func:`.command.upgrade` using ``plan=True``.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    info: MigrationInfo
+    """The :class:`.MigrationInfo` describing the step."""
+
+    operations: List[PlannedOperation]
+    """The operations the step would invoke, in order."""
+
+    def __init__(
+        self, info: MigrationInfo, operations: List[PlannedOperation]
+    ) -> None:
+        self.info = info
+        self.operations = operations
+
+    @property
+    def locks_large_table(self) -> bool:
+        """True if any operation of the step rewrites or scans a large
+        table."""
+        return any(
+            operation.locks_large_table for operation in self.operations
+        )
+
+    @property
+    def rewritten_tables(self) -> List[Tuple[Optional[str], str]]:
+        """The ``(schema, table_name)`` of each table which the step
+        rewrites in full."""
+        return util.unique_list(
+            (operation.schema, operation.table_name)
+            for operation in self.operations
+            if operation.effect == "rewrite"
+            and operation.table_name is not None
+        )
+
+
+class _RefusingBind:
+    """Stands in for the connection returned by ``op.get_bind()`` while
+    planning upon a backend without transactional DDL, where a statement
+    may commit implicitly and so couldn't be rolled back."""
+
+    _refused = (
+        "execute",
+        "exec_driver_sql",
+        "scalar",
+        "scalars",
+        "_run_ddl_visitor",
+    )
+
+    def __init__(self, connection: Connection) -> None:
+        self._connection = connection
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self._refused:
+            raise util.CommandError(
+                "Can't execute statements using op.get_bind() while "
+                "planning an upgrade with --plan on a backend without "
+                "transactional DDL"
+            )
+        return getattr(self._connection, name)
+
+
+class _RecordingOperations(Operations):
+    """An :class:`.Operations` which records the operations invoked
+    upon it rather than running them."""
+
+    def __init__(
+        self,
+        migration_context: MigrationContext,
+        recorded: List[Tuple[ops.MigrateOperation, bool]],
+    ) -> None:
+        super().__init__(migration_context)
+        self.recorded = recorded
+
+    def invoke(self, operation: ops.MigrateOperation) -> Any:
+        self.recorded.append((operation, False))
+        return None
+
+    def get_bind(self) -> Connection:
+        bind = super().get_bind()
+        if (
+            bind is not None
+            and not self.migration_context.impl.transactional_ddl
+        ):
+            return _RefusingBind(bind)  # type: ignore[return-value]
+        return bind
+
+    @contextmanager
+    def batch_alter_table(
+        self,
+        table_name: str,
+        schema: Optional[str] = None,
+        recreate: Literal["auto", "always", "never"] = "auto",
+        partial_reordering: Optional[tuple] = None,
+        copy_from: Optional[Table] = None,
+        table_args: Tuple[Any, ...] = (),
+        table_kwargs: Mapping[str, Any] = util.immutabledict(),
+        reflect_args: Tuple[Any, ...] = (),
+        reflect_kwargs: Mapping[str, Any] = util.immutabledict(),
+        naming_convention: Optional[Dict[str, str]] = None,
+    ) -> Iterator[BatchOperations]:
+        impl = batch.BatchOperationsImpl(
+            self,
+            table_name,
+            schema,
+            recreate,
+            copy_from,
+            table_args,
+            table_kwargs,
+            reflect_args,
+            reflect_kwargs,
+            naming_convention,
+            partial_reordering,
+        )
+        batch_op = _RecordingBatchOperations(self.migration_context, impl)
+        yield batch_op
+
+        # the batch is never flushed; only whether it would recreate the
+        # table is determined
+        should_recreate = impl._should_recreate()
+        self.recorded.extend(
+            (operation, should_recreate) for operation in batch_op.recorded
+        )
+
+
+class _RecordingBatchOperations(BatchOperations):
+    def __init__(
+        self,
+        migration_context: MigrationContext,
+        impl: batch.BatchOperationsImpl,
+    ) -> None:
+        super().__init__(migration_context, impl=impl)
+        self.recorded: List[ops.MigrateOperation] = []
+
+    def invoke(self, operation: ops.MigrateOperation) -> Any:
+        # the batch implementation only collects the operation
+        self.recorded.append(operation)
+        return super().invoke(operation)
+
+
+class _UpgradePlanner:
+    """Records the operations of each migration step and estimates the
+    cost of each upon the tables present in the database."""
+
+    def __init__(self, migration_context: MigrationContext) -> None:
+        self.migration_context = migration_context
+        self.impl = migration_context.impl
+        self._table_statistics: Dict[
+            Tuple[Optional[str], str], Tuple[Optional[int], Optional[int]]
+        ] = {}
+
+    def plan(
+        self, steps: Iterable[RevisionStep], kw: Dict[str, Any]
+    ) -> List[StepPlan]:
+        """Plan the given steps, within a transaction which is rolled back
+        afterwards, so that any statements the migration scripts run
+        using the connection directly are undone."""
+
+        connection = self.migration_context.connection
+        if connection is None:
+            return list(self._plan_steps(steps, kw))
+
+        transaction: Transaction
+        if connection.in_transaction():
+            transaction = connection.begin_nested()
+        else:
+            transaction = connection.begin()
+        try:
+            return list(self._plan_steps(steps, kw))
+        finally:
+            transaction.rollback()
+
+    def _plan_steps(
+        self, steps: Iterable[RevisionStep], kw: Dict[str, Any]
+    ) -> Iterator[StepPlan]:
+        for step in steps:
+            log.info("Planning %s", step)
+            recorded: List[Tuple[ops.MigrateOperation, bool]] = []
+            operations = _RecordingOperations(self.migration_context, recorded)
+            with operations._proxy_installed():
+                step.migration_fn(**kw)
+            yield StepPlan(
+                step.info,
+                [
+                    self._plan_operation(operation, recreate)
+                    for operation, recreate in recorded
+                ],
+            )
+
+    def _plan_operation(
+        self, operation: ops.MigrateOperation, recreate: bool
+    ) -> PlannedOperation:
+        table_name, schema = _table_of(operation)
+        if recreate:
+            effect: Optional[str] = "rewrite"
+        else:
+            effect = _effects.dispatch(operation, self.impl.__dialect__)(
+                operation
+            )
+
+        planned = PlannedOperation(
+            operation, table_name, schema, effect, recreate=recreate
+        )
+        if table_name is not None:
+            planned.rows, planned.size = self._statistics(table_name, schema)
+
+        if isinstance(operation, ops.CreateTableOp):
+            # tables created by earlier steps are empty for the steps
+            # which follow
+            self._table_statistics[(schema, operation.table_name)] = (0, 0)
+        elif isinstance(operation, ops.RenameTableOp):
+            self._table_statistics[
+                (schema, operation.new_table_name)
+            ] = self._statistics(operation.table_name, schema)
+        return planned
+
+    def _statistics(
+        self, table_name: str, schema: Optional[str]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        key = (schema, table_name)
+        if key not in self._table_statistics:
+            connection = self.migration_context.connection
+            if connection is None or not sqla_compat._connectable_has_table(
+                connection, table_name, schema
+            ):
+                self._table_statistics[key] = (None, None)
+            else:
+                self._table_statistics[key] = self.impl._table_statistics(
+                    table_name, schema
+                )
+        return self._table_statistics[key]
+
+
+def _table_of(
+    operation: ops.MigrateOperation,
+) -> Tuple[Optional[str], Optional[str]]:
+    if isinstance(operation, ops.CreateForeignKeyOp):
+        return operation.source_table, operation.kw.get("source_schema")
+    elif isinstance(operation, ops.BulkInsertOp):
+        return operation.table.name, operation.table.schema
+    else:
+        return (
+            getattr(operation, "table_name", None),
+            getattr(operation, "schema", None),
+        )
+
+
+@_effects.dispatch_for(ops.MigrateOperation)
+def _no_effect(operation: ops.MigrateOperation) -> Optional[str]:
+    return None
+
+
+@_effects.dispatch_for(ops.AlterColumnOp)
+def _alter_column(operation: ops.AlterColumnOp) -> Optional[str]:
+    if operation.modify_type is not None:
+        return "rewrite"
+    elif operation.modify_nullable is False:
+        return "scan"
+    else:
+        return None
+
+
+@_effects.dispatch_for(ops.CreateIndexOp)
+@_effects.dispatch_for(ops.AddConstraintOp)
+def _scan(operation: ops.MigrateOperation) -> Optional[str]:
+    return "scan"
+
+
+@_effects.dispatch_for(ops.CreateIndexOp, "postgresql")
+def _postgresql_create_index(operation: ops.CreateIndexOp) -> Optional[str]:
+    # CREATE INDEX CONCURRENTLY doesn't block writes
+    if operation.kw.get("postgresql_concurrently"):
+        return None
+    else:
+        return "scan"
+
+
+@_effects.dispatch_for(ops.AlterColumnOp, "mysql")
+@_effects.dispatch_for(ops.AlterColumnOp, "mariadb")
+def _mysql_alter_column(operation: ops.AlterColumnOp) -> Optional[str]:
+    # MODIFY COLUMN / CHANGE COLUMN rebuild the table unless only the
+    # name or the default changes
+    if (
+        operation.modify_type is not None
+        or operation.modify_nullable is not None
+    ):
+        return "rewrite"
+    else:
+        return None
+
+
+@_effects.dispatch_for(ops.DropColumnOp, "mysql")
+@_effects.dispatch_for(ops.DropColumnOp, "mariadb")
+@_effects.dispatch_for(ops.CreatePrimaryKeyOp, "mysql")
+@_effects.dispatch_for(ops.CreatePrimaryKeyOp, "mariadb")
+@_effects.dispatch_for(ops.CreateForeignKeyOp, "mysql")
+@_effects.dispatch_for(ops.CreateForeignKeyOp, "mariadb")
+def _mysql_rebuild(operation: ops.MigrateOperation) -> Optional[str]:
+    return "rewrite"
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+from .. import util
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine.interfaces import Dialect
+    from sqlalchemy.sql.elements import ClauseElement
+
+log = logging.getLogger(__name__)
+
+
+class TracedStatement:
+    """Describes a single statement emitted by a migration operation, as
+    passed to the methods of a :class:`.StatementTracer`.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    construct: ClauseElement
+    """The SQL expression construct being executed; a string passed to
+    :meth:`.Operations.execute` is present as a
+    :func:`~sqlalchemy.sql.expression.text` construct."""
+
+    parameters: Sequence[Any]
+    """The parameter sets passed along with the statement, if any."""
+
+    is_ddl: bool
+    """True if the statement is DDL, such as ``CREATE TABLE`` or
+    ``ALTER TABLE``."""
+
+    plan: Optional[List[str]]
+    """The lines of output of ``EXPLAIN`` for the statement, when
+    :paramref:`.EnvironmentContext.configure.explain_dml` is in use and
+    the statement is DML emitted by :meth:`.Operations.execute`;
+    otherwise ``None``."""
+
+    duration: Optional[float]
+    """The time in seconds taken to execute the statement; ``None`` until
+    the statement has been executed or has failed."""
+
+    rowcount: Optional[int]
+    """The number of rows affected by a DML statement, as reported by
+    the DBAPI, once it's been executed; ``None`` for DDL and for
+    statements which return rows."""
+
+    def __init__(
+        self,
+        construct: ClauseElement,
+        dialect: Dialect,
+        parameters: Sequence[Any],
+        is_ddl: bool,
+        plan: Optional[List[str]] = None,
+    ) -> None:
+        self.construct = construct
+        self._dialect = dialect
+        self.parameters = parameters
+        self.is_ddl = is_ddl
+        self.plan = plan
+        self.duration = None
+        self.rowcount = None
+
+    @util.memoized_property
+    def sql(self) -> str:
+        """The SQL string compiled from :attr:`.TracedStatement.construct`
+        for the dialect in use; compiled when first accessed."""
+        return str(self.construct.compile(dialect=self._dialect))
+
+    def __repr__(self) -> str:
+        return "<%s %r>" % (self.__class__.__name__, self.sql)
+
+
+class StatementTracer:
+    """Receive events for each statement emitted by migration operations.
+
+    Subclasses override any of the methods below, and are passed to
+    :paramref:`.EnvironmentContext.configure.statement_tracers`.  The
+    methods are invoked for every statement the
+    :class:`.Operations` API emits, online or in ``--sql`` mode, within
+    the thread running the migration; statements executed directly upon
+    the connection returned by :meth:`.Operations.get_bind` are not
+    traced.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    def before_execute(self, statement: TracedStatement) -> None:
+        """Receive a statement before it's executed."""
+
+    def after_execute(self, statement: TracedStatement) -> None:
+        """Receive a statement after it's been executed successfully,
+        with :attr:`.TracedStatement.duration` and
+        :attr:`.TracedStatement.rowcount` set."""
+
+    def handle_error(
+        self, statement: TracedStatement, exception: BaseException
+    ) -> None:
+        """Receive a statement which raised an exception, with
+        :attr:`.TracedStatement.duration` set.
+
+        The exception is re-raised once each tracer has been invoked.
+
+        """
+
+
+class SlowStatementLog(StatementTracer):
+    """A :class:`.StatementTracer` that logs each statement taking at
+    least ``threshold`` seconds, including those which fail, as a warning
+    on the ``alembic.runtime.tracing`` logger.
+
+    Established by
+    :paramref:`.EnvironmentContext.configure.slow_statement_threshold`.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    def __init__(
+        self, threshold: float, logger: Optional[logging.Logger] = None
+    ) -> None:
+        self.threshold = threshold
+        self.logger = logger or log
+
+    def after_execute(self, statement: TracedStatement) -> None:
+        assert statement.duration is not None
+        if statement.duration >= self.threshold:
+            self.logger.warning(
+                "Slow %s statement took %.3fs: %s",
+                "DDL" if statement.is_ddl else "DML",
+                statement.duration,
+                statement.sql,
+            )
+
+    def handle_error(
+        self, statement: TracedStatement, exception: BaseException
+    ) -> None:
+        assert statement.duration is not None
+        if statement.duration >= self.threshold:
+            self.logger.warning(
+                "Slow %s statement failed after %.3fs: %s",
+                "DDL" if statement.is_ddl else "DML",
+                statement.duration,
+                statement.sql,
+            )
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import ast
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 import datetime
 import os
 import re
 import shutil
 import sys
+import threading
+from types import CodeType
 from types import ModuleType
 from typing import Any
 from typing import cast
+from typing import Dict
 from typing import Iterator
 from typing import List
 from typing import Mapping
@@ -21,6 +26,8 @@ from typing import Union
 
 from . import revision
 from . import write_hooks
+from .cache import RevisionBundle
+from .cache import RevisionCache
 from .. import util
 from ..runtime import migration
 from ..util import not_none
@@ -47,6 +54,16 @@ _split_on_space_comma = re.compile(r", *|(?: +)")
 
 _split_on_space_comma_colon = re.compile(r", *|(?: +)|\:")
 
+_header_names = frozenset(
+    ["revision", "down_revision", "branch_labels", "depends_on", "replaces"]
+)
+
+_depends_on_line = re.compile(r"^depends_on\b")
+
+# serializes the loading of revision modules which are loaded lazily, as
+# migrations may be run from several threads at once
+_module_load_lock = threading.RLock()
+
 
 class ScriptDirectory:
 
@@ -83,6 +100,13 @@ class ScriptDirectory:
         messaging_opts: MessagingOptions = cast(
             "MessagingOptions", util.EMPTY_DICT
         ),
+        revision_cache: bool = False,
+        revision_cache_path: Optional[str] = None,
+        lazy_load_revisions: bool = False,
+        revision_load_workers: Optional[int] = None,
+        revision_bundle: bool = False,
+        revision_bundle_path: Optional[str] = None,
+        revision_reachability_index: bool = False,
     ) -> None:
         self.dir = dir
         self.file_template = file_template
@@ -90,11 +114,27 @@ class ScriptDirectory:
         self.truncate_slug_length = truncate_slug_length or 40
         self.sourceless = sourceless
         self.output_encoding = output_encoding
-        self.revision_map = revision.RevisionMap(self._load_revisions)
+        self.revision_reachability_index = revision_reachability_index
+        self.revision_map = revision.RevisionMap(
+            self._load_revisions,
+            reachability_index=revision_reachability_index,
+        )
         self.timezone = timezone
         self.hook_config = hook_config
         self.recursive_version_locations = recursive_version_locations
         self.messaging_opts = messaging_opts
+        self.revision_cache = revision_cache or revision_cache_path is not None
+        self.revision_cache_path = revision_cache_path or os.path.join(
+            dir, "__pycache__", "alembic_revisions.json"
+        )
+        self.lazy_load_revisions = lazy_load_revisions
+        self.revision_load_workers = revision_load_workers
+        self.revision_bundle = (
+            revision_bundle or revision_bundle_path is not None
+        )
+        self.revision_bundle_path = revision_bundle_path or os.path.join(
+            dir, "__pycache__", "alembic_versions.bundle"
+        )
 
         if not os.access(dir, os.F_OK):
             raise util.CommandError(
@@ -121,7 +161,7 @@ class ScriptDirectory:
         else:
             return (os.path.abspath(os.path.join(self.dir, "versions")),)
 
-    def _load_revisions(self) -> Iterator[Script]:
+    def _revision_files(self) -> List[Tuple[str, str]]:
         if self.version_locations:
             paths = [
                 vers
@@ -131,6 +171,7 @@ class ScriptDirectory:
         else:
             paths = [self.versions]
 
+        files = []
         dupes = set()
         for vers in paths:
             for file_path in Script._list_py_dir(self, vers):
@@ -142,13 +183,61 @@ class ScriptDirectory:
                     )
                     continue
                 dupes.add(real_path)
+                files.append(
+                    (os.path.dirname(real_path), os.path.basename(real_path))
+                )
+        return files
 
-                filename = os.path.basename(real_path)
-                dir_name = os.path.dirname(real_path)
-                script = Script._from_filename(self, dir_name, filename)
-                if script is None:
-                    continue
-                yield script
+    def _load_revisions(self) -> Iterator[Script]:
+        files = self._revision_files()
+
+        if self.revision_cache:
+            cache: Optional[RevisionCache] = RevisionCache(
+                self.revision_cache_path
+            )
+        else:
+            cache = None
+
+        if self.revision_bundle:
+            bundle: Optional[RevisionBundle] = RevisionBundle(
+                self.revision_bundle_path
+            )
+        else:
+            bundle = None
+
+        def load(file_: Tuple[str, str]) -> Optional[Script]:
+            dir_name, filename = file_
+            return Script._from_filename(
+                self, dir_name, filename, cache=cache, bundle=bundle
+            )
+
+        if self.revision_load_workers and self.revision_load_workers > 1:
+            # files are read and parsed concurrently, however map() returns
+            # results in the order of the listing, so that the order of
+            # revisions is the same as when they are loaded serially
+            with ThreadPoolExecutor(self.revision_load_workers) as executor:
+                for script in executor.map(load, files):
+                    if script is not None:
+                        yield script
+        else:
+            for file_ in files:
+                script = load(file_)
+                if script is not None:
+                    yield script
+
+        if cache is not None:
+            cache.save()
+
+    def _write_revision_bundle(self) -> int:
+        headers = {}
+        for dir_name, filename in self._revision_files():
+            if not filename.endswith(".py"):
+                continue
+            script = Script._from_filename(self, dir_name, filename)
+            if script is not None:
+                headers[script.path] = script._header
+        RevisionBundle.write(self.revision_bundle_path, headers)
+        return len(headers)
 
     @classmethod
     def from_config(cls, config: Config) -> ScriptDirectory:
@@ -216,6 +305,9 @@ class ScriptDirectory:
             )
 
         rvl = config.get_main_option("recursive_version_locations") == "true"
+        revision_cache_path = config.get_main_option("revision_cache_path")
+        rlw = config.get_main_option("revision_load_workers")
+        revision_load_workers = int(rlw) if rlw else None
         return ScriptDirectory(
             util.coerce_resource_to_filename(script_location),
             file_template=config.get_main_option(
@@ -229,6 +321,20 @@ class ScriptDirectory:
             hook_config=config.get_section("post_write_hooks", {}),
             recursive_version_locations=rvl,
             messaging_opts=config.messaging_opts,
+            revision_cache=config.get_main_option("revision_cache") == "true",
+            revision_cache_path=revision_cache_path,
+            lazy_load_revisions=config.get_main_option("lazy_load_revisions")
+            == "true",
+            revision_load_workers=revision_load_workers,
+            revision_bundle=config.get_main_option("revision_bundle")
+            == "true",
+            revision_bundle_path=config.get_main_option(
+                "revision_bundle_path"
+            ),
+            revision_reachability_index=config.get_main_option(
+                "revision_reachability_index"
+            )
+            == "true",
         )
 
     @contextmanager
@@ -523,10 +629,8 @@ class ScriptDirectory:
 
                 # figure out if the dest is a descendant or an
                 # ancestor of the selected nodes
-                descendants = set(
-                    self.revision_map._get_descendant_nodes([dest])
-                )
-                ancestors = set(self.revision_map._get_ancestor_nodes([dest]))
+                descendants = self.revision_map._get_descendant_set([dest])
+                ancestors = self.revision_map._get_ancestor_set([dest])
 
                 if descendants.intersection(filtered_heads):
                     # heads are above the target, so this is a downgrade.
@@ -636,6 +740,7 @@ class ScriptDirectory:
         branch_labels: Optional[_RevIdType] = None,
         version_path: Optional[str] = None,
         depends_on: Optional[_RevIdType] = None,
+        replaces: Optional[_RevIdType] = None,
         **kw: Any,
     ) -> Optional[Script]:
         """Generate a new revision file.
@@ -654,6 +759,12 @@ class ScriptDirectory:
          actual head; otherwise, the selected head must be a head
          (e.g. endpoint) revision.
         :param refresh: deprecated.
+        :param replaces: revision identifiers which the new revision
+         replaces, as when a series of revisions is squashed into a
+         baseline revision; these are written to the file as its
+         ``replaces`` identifier.
+
+         .. versionadded:: 1.12.0
 
         """
         if head is None:
@@ -752,6 +863,9 @@ class ScriptDirectory:
             **kw,
         )
 
+        if replaces:
+            self._write_replaces(path, util.to_tuple(replaces))
+
         post_write_hooks = self.hook_config
         if post_write_hooks:
             write_hooks._run_hooks(path, post_write_hooks)
@@ -770,9 +884,36 @@ class ScriptDirectory:
                 "'branch_labels' section?"
                 % (script.revision, branch_labels, script.path)
             )
-        self.revision_map.add_revision(script)
+        if replaces:
+            # the revisions which were replaced are no longer present,
+            # so the map is rebuilt rather than added to
+            self.revision_map = revision.RevisionMap(
+                self._load_revisions,
+                reachability_index=self.revision_reachability_index,
+            )
+        else:
+            self.revision_map.add_revision(script)
         return script
 
+    def _write_replaces(self, path: str, replaces: Tuple[str, ...]) -> None:
+        with open(path, encoding=self.output_encoding) as file_:
+            lines = file_.read().splitlines(True)
+
+        replaces_lines = (
+            ["replaces = (\n"]
+            + ["    %r,\n" % rev for rev in replaces]
+            + [")\n"]
+        )
+        for idx, line in enumerate(lines):
+            if _depends_on_line.match(line):
+                lines[idx + 1 : idx + 1] = replaces_lines
+                break
+        else:
+            lines.extend(["\n"] + replaces_lines)
+
+        with open(path, "w", encoding=self.output_encoding) as file_:
+            file_.write("".join(lines))
+
     def _rev_path(
         self,
         path: str,
@@ -810,27 +951,72 @@ class Script(revision.Revision):
 
     """
 
-    def __init__(self, module: ModuleType, rev_id: str, path: str):
-        self.module = module
+    __slots__ = ("_module", "_code", "_doc", "path", "_db_current_indicator")
+
+    def __init__(
+        self,
+        module: Optional[ModuleType],
+        rev_id: str,
+        path: str,
+        header: Optional[Mapping[str, Any]] = None,
+        code: Optional[CodeType] = None,
+    ):
+        if header is None:
+            assert module is not None
+            header = _module_header(module, rev_id)
+        self._module = module
+        self._code = code
+        self._doc = header["doc"]
         self.path = path
+        self._db_current_indicator = None
         super().__init__(
             rev_id,
-            module.down_revision,  # type: ignore[attr-defined]
-            branch_labels=util.to_tuple(
-                getattr(module, "branch_labels", None), default=()
-            ),
-            dependencies=util.to_tuple(
-                getattr(module, "depends_on", None), default=()
-            ),
+            header["down_revision"],
+            branch_labels=util.to_tuple(header["branch_labels"], default=()),
+            dependencies=util.to_tuple(header["depends_on"], default=()),
+            replaces=util.to_tuple(header["replaces"], default=()),
         )
 
-    module: ModuleType
-    """The Python module representing the actual script itself."""
+    @property
+    def module(self) -> ModuleType:
+        """The Python module representing the actual script itself.
+
+        When the :class:`.Script` was produced from a revision cache
+        or bundle, the module is loaded when this attribute is first
+        accessed.
+
+        """
+        if self._module is None:
+            with _module_load_lock:
+                if self._module is None:
+                    self._load_module()
+        return not_none(self._module)
+
+    def _load_module(self) -> None:
+        dir_, filename = os.path.split(self.path)
+        if self._code is not None:
+            self._module = util.load_module_code(
+                re.sub(r"\W", "_", filename), self.path, self._code
+            )
+            self._code = None
+        else:
+            self._module = util.load_python_file(dir_, filename)
+
+    @property
+    def _header(self) -> Dict[str, Any]:
+        return {
+            "revision": self.revision,
+            "down_revision": self.down_revision,
+            "branch_labels": list(self._orig_branch_labels),
+            "depends_on": list(util.to_tuple(self.dependencies, default=())),
+            "replaces": list(self.replaces),
+            "doc": self.longdoc,
+        }
 
     path: str
     """Filesystem path of the script."""
 
-    _db_current_indicator: Optional[bool] = None
+    _db_current_indicator: Optional[bool]
     """Utility variable which when set will cause string output to indicate
     this is a "current" version in some database"""
 
@@ -844,15 +1030,10 @@ class Script(revision.Revision):
     def longdoc(self) -> str:
         """Return the docstring given in the script."""
 
-        doc = self.module.__doc__
-        if doc:
-            if hasattr(self.module, "_alembic_source_encoding"):
-                doc = doc.decode(  # type: ignore[attr-defined]
-                    self.module._alembic_source_encoding  # type: ignore[attr-defined] # noqa
-                )
-            return doc.strip()  # type: ignore[union-attr]
+        if self._module is None:
+            return self._doc
         else:
-            return ""
+            return _module_doc(self._module)
 
     @property
     def log_entry(self) -> str:
@@ -1005,7 +1186,12 @@ class Script(revision.Revision):
 
     @classmethod
     def _from_filename(
-        cls, scriptdir: ScriptDirectory, dir_: str, filename: str
+        cls,
+        scriptdir: ScriptDirectory,
+        dir_: str,
+        filename: str,
+        cache: Optional[RevisionCache] = None,
+        bundle: Optional[RevisionBundle] = None,
     ) -> Optional[Script]:
         if scriptdir.sourceless:
             py_match = _sourceless_rev_file.match(filename)
@@ -1033,6 +1219,35 @@ class Script(revision.Revision):
             if py_exists or is_o and pyc_exists:
                 return None
 
+        path = os.path.join(dir_, filename)
+        if bundle is not None:
+            bundled = bundle.get(path)
+            if bundled is not None:
+                bundled_header, code = bundled
+                return Script(
+                    None,
+                    bundled_header["revision"],
+                    path,
+                    bundled_header,
+                    code,
+                )
+
+        if cache is not None:
+            cached_header = cache.get(path)
+            if cached_header is not None:
+                return Script(
+                    None, cached_header["revision"], path, cached_header
+                )
+
+        if scriptdir.lazy_load_revisions and not (is_c or is_o):
+            parsed_header = _parse_module_header(path)
+            if parsed_header is not None:
+                if cache is not None:
+                    cache.put(path, parsed_header)
+                return Script(
+                    None, parsed_header["revision"], path, parsed_header
+                )
+
         module = util.load_python_file(dir_, filename)
 
         if not hasattr(module, "revision"):
@@ -1051,4 +1266,127 @@ class Script(revision.Revision):
                 revision = m.group(1)
         else:
             revision = module.revision
-        return Script(module, revision, os.path.join(dir_, filename))
+
+        header = _module_header(module, revision)
+        if cache is not None:
+            cache.put(path, header)
+        return Script(module, revision, path, header)
+
+
+def _module_doc(module: ModuleType) -> str:
+    doc = module.__doc__
+    if doc:
+        if hasattr(module, "_alembic_source_encoding"):
+            doc = doc.decode(  # type: ignore[attr-defined]
+                module._alembic_source_encoding  # type: ignore[attr-defined]
+            )
+        return doc.strip()  # type: ignore[union-attr]
+    else:
+        return ""
+
+
+def _module_header(module: ModuleType, rev_id: str) -> Dict[str, Any]:
+    """Return the identifiers declared within a revision module, in the
+    form that's stored by :class:`.RevisionCache`.
+
+    """
+    return {
+        "revision": rev_id,
+        "down_revision": revision.tuple_rev_as_scalar(
+            util.to_tuple(
+                module.down_revision,  # type: ignore[attr-defined]
+                default=None,
+            )
+        ),
+        "branch_labels": list(
+            util.to_tuple(getattr(module, "branch_labels", None), default=())
+        ),
+        "depends_on": list(
+            util.to_tuple(getattr(module, "depends_on", None), default=())
+        ),
+        "replaces": list(
+            util.to_tuple(getattr(module, "replaces", None), default=())
+        ),
+        "doc": _module_doc(module),
+    }
+
+
+def _parse_module_header(path: str) -> Optional[Dict[str, Any]]:
+    """Return the identifiers declared within a revision file by
+    statically parsing its module-level assignments, without executing it.
+
+    Returns ``None`` if the identifiers can't be determined this way, such
+    as when one of them is not a literal value or is assigned within a
+    conditional block, in which case the module needs to be executed.
+
+    """
+    with open(path, "rb") as file_:
+        source = file_.read()
+    try:
+        tree = ast.parse(source, path)
+    except SyntaxError:
+        return None
+
+    values: Dict[str, Any] = {}
+    for node in tree.body:
+        if isinstance(
+            node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+        ):
+            if node.name in _header_names:
+                return None
+            continue
+
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            if _assigns_header_name(node):
+                return None
+            continue
+
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in _header_names:
+                try:
+                    values[target.id] = ast.literal_eval(
+                        node.value  # type: ignore[arg-type]
+                    )
+                except ValueError:
+                    return None
+            elif _assigns_header_name(target):
+                return None
+
+    if "revision" not in values or "down_revision" not in values:
+        return None
+
+    doc = ast.get_docstring(tree, clean=False)
+    return {
+        "revision": values["revision"],
+        "down_revision": revision.tuple_rev_as_scalar(
+            util.to_tuple(values["down_revision"], default=None)
+        ),
+        "branch_labels": list(
+            util.to_tuple(values.get("branch_labels"), default=())
+        ),
+        "depends_on": list(
+            util.to_tuple(values.get("depends_on"), default=())
+        ),
+        "replaces": list(util.to_tuple(values.get("replaces"), default=())),
+        "doc": doc.strip() if doc else "",
+    }
+
+
+def _assigns_header_name(node: ast.AST) -> bool:
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Name):
+            if sub.id in _header_names and not isinstance(sub.ctx, ast.Load):
+                return True
+        elif isinstance(sub, ast.alias):
+            if (sub.asname or sub.name) in _header_names:
+                return True
+        elif isinstance(
+            sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+        ):
+            if sub.name in _header_names:
+                return True
+    return False
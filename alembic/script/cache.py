@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import marshal
+import os
+import tempfile
+from types import CodeType
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+_CACHE_FORMAT = 2
+
+_BUNDLE_FORMAT = 1
+
+
+def _signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _header_from_stored(stored: Mapping[str, Any]) -> Dict[str, Any]:
+    header = dict(stored)
+    if isinstance(header["down_revision"], list):
+        header["down_revision"] = tuple(header["down_revision"])
+    return header
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    dirname = os.path.dirname(path)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file_:
+            file_.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class RevisionCache:
+    """A persistent index of the identifiers present in revision files.
+
+    For each revision file, the ``revision``, ``down_revision``,
+    ``branch_labels``, ``depends_on`` and ``replaces`` identifiers are
+    stored along with the docstring of the file, keyed on the path of the
+    file and tagged with its modification time and size.   When a
+    :class:`.ScriptDirectory` loads its revisions, files which have not
+    changed since the index was written are not executed; only files that
+    are new or have changed are loaded as Python modules.
+
+    The index is stored as a JSON file.  Failure to read the file, such as
+    when it doesn't exist or is corrupted, results in an empty index;
+    failure to write it, such as within a read-only filesystem, is
+    silently ignored.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._entries = self._read()
+        self._seen: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, List[int]] = {}
+        self._changed = False
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, encoding="utf-8") as file_:
+                data = json.load(file_)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("format") != _CACHE_FORMAT:
+            return {}
+        return data.get("files", {})
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Return the header stored for the given file, or ``None`` if
+        the file isn't present in the index or has changed since it
+        was stored.
+
+        """
+        signature = _signature(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry["signature"] == signature:
+            self._seen[path] = entry
+            return _header_from_stored(entry["header"])
+        else:
+            self._pending[path] = signature
+            return None
+
+    def put(self, path: str, header: Mapping[str, Any]) -> None:
+        """Store the header for the given file."""
+
+        signature = self._pending.pop(path, None)
+        if signature is None:
+            signature = _signature(path)
+        self._seen[path] = {"signature": signature, "header": dict(header)}
+        self._changed = True
+
+    def save(self) -> None:
+        """Write the index, including only those files which were
+        consulted since it was read.
+
+        """
+        if not self._changed and set(self._seen) == set(self._entries):
+            return
+
+        data = json.dumps({"format": _CACHE_FORMAT, "files": self._seen})
+        try:
+            _write_atomic(self.path, data.encode("utf-8"))
+        except OSError:
+            pass
+
+
+class RevisionBundle:
+    """A single file containing the compiled code of each revision file,
+    along with the identifiers declared within it.
+
+    The bundle is written by the ``compile_versions`` command.   When a
+    :class:`.ScriptDirectory` loads its revisions, the bundle is read
+    with a single read and unmarshalled; files whose modification time
+    and size match those stored in the bundle are neither read nor
+    compiled, and their module is created from the stored code when it's
+    first accessed.   Files which aren't present in the bundle or have
+    changed since it was written are loaded normally.
+
+    The bundle is specific to the Python version which wrote it; a bundle
+    written by a different Python version, or one that can't be read, is
+    ignored.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._entries = self._read()
+
+    def _read(self) -> Dict[str, Tuple[List[int], Dict[str, Any], CodeType]]:
+        try:
+            with open(self.path, "rb") as file_:
+                data = marshal.loads(file_.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return {}
+        if (
+            not isinstance(data, tuple)
+            or len(data) != 3
+            or data[0] != _BUNDLE_FORMAT
+            or data[1] != importlib.util.MAGIC_NUMBER
+        ):
+            return {}
+        return data[2]
+
+    def get(self, path: str) -> Optional[Tuple[Dict[str, Any], CodeType]]:
+        """Return the header and code object stored for the given file, or
+        ``None`` if the file isn't present in the bundle or has changed
+        since the bundle was written.
+
+        """
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        signature, header, code = entry
+        if _signature(path) != signature:
+            return None
+        return _header_from_stored(header), code
+
+    @classmethod
+    def write(
+        cls, path: str, headers: Mapping[str, Mapping[str, Any]]
+    ) -> None:
+        """Compile the given source files and write them to a bundle,
+        along with the given headers.
+
+        """
+        entries = {}
+        for file_path, header in headers.items():
+            signature = _signature(file_path)
+            with open(file_path, "rb") as file_:
+                source = file_.read()
+            code = compile(source, file_path, "exec", dont_inherit=True)
+            entries[file_path] = (signature, dict(header), code)
+
+        _write_atomic(
+            path,
+            marshal.dumps(
+                (_BUNDLE_FORMAT, importlib.util.MAGIC_NUMBER, entries)
+            ),
+        )
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import bisect
 import collections
 import re
+import sys
 from typing import Any
 from typing import Callable
 from typing import cast
@@ -114,15 +116,29 @@ class RevisionMap:
 
     """
 
-    def __init__(self, generator: Callable[[], Iterable[Revision]]) -> None:
+    def __init__(
+        self,
+        generator: Callable[[], Iterable[Revision]],
+        reachability_index: bool = False,
+    ) -> None:
         """Construct a new :class:`.RevisionMap`.
 
         :param generator: a zero-arg callable that will generate an iterable
          of :class:`.Revision` instances to be used.   These are typically
          :class:`.Script` subclasses within regular Alembic use.
 
+        :param reachability_index: when True, the ancestors and descendants
+         of every revision are computed once and stored as bitsets, so that
+         determining the revisions to be upgraded or downgraded, and which
+         revisions share a lineage, doesn't traverse the revision graph each
+         time.   Memory use grows with the square of the number of
+         revisions.
+
+         .. versionadded:: 1.12.0
+
         """
         self._generator = generator
+        self.reachability_index = reachability_index
 
     @util.memoized_property
     def heads(self) -> Tuple[str, ...]:
@@ -170,6 +186,84 @@ class RevisionMap:
         self._revision_map
         return self._real_bases
 
+    @util.memoized_property
+    def _replaced_revisions(self) -> Dict[str, str]:
+        """Revision numbers which were squashed into a baseline revision,
+        mapped to the revision number of the baseline.
+
+        """
+        self._revision_map
+        return self._replaced_revisions
+
+    @util.memoized_property
+    def _labeled_revisions(self) -> Set[str]:
+        """Revision numbers of revisions which declare branch labels."""
+        self._revision_map
+        return self._labeled_revisions
+
+    @util.memoized_property
+    def _branch_label_nodes(self) -> Set[str]:
+        """Revision numbers of revisions to which branch labels have
+        been applied from other revisions.
+
+        """
+        self._revision_map
+        return self._branch_label_nodes
+
+    @util.memoized_property
+    def _revision_prefix_index(self) -> Tuple[List[str], Dict[str, int]]:
+        """The identifiers in the revision map which may be matched by
+        a partial identifier, in sorted order, along with the position of
+        each identifier within the map.
+
+        """
+        positions = {
+            key: pos
+            for pos, key in enumerate(self._revision_map)
+            if isinstance(key, str) and len(key) > 3
+        }
+        # identifiers added later are positioned after all others, including
+        # those since removed, so that positions are never reused
+        self._prefix_counter = len(self._revision_map)
+        return sorted(positions), positions
+
+    def _add_to_prefix_index(self, keys: Iterable[str]) -> None:
+        if "_revision_prefix_index" not in self.__dict__:
+            return
+        sorted_keys, positions = self._revision_prefix_index
+        for key in keys:
+            if len(key) > 3 and key not in positions:
+                positions[key] = self._prefix_counter
+                self._prefix_counter += 1
+                bisect.insort(sorted_keys, key)
+
+    def _remove_from_prefix_index(self, keys: Iterable[str]) -> None:
+        if "_revision_prefix_index" not in self.__dict__:
+            return
+        sorted_keys, positions = self._revision_prefix_index
+        for key in keys:
+            if key in positions:
+                del positions[key]
+                del sorted_keys[bisect.bisect_left(sorted_keys, key)]
+
+    def _revisions_with_prefix(self, prefix: str) -> List[str]:
+        """Return the identifiers that start with the given prefix, in the
+        order in which they are present in the revision map.
+
+        """
+        sorted_keys, positions = self._revision_prefix_index
+        revs = []
+        idx = bisect.bisect_left(sorted_keys, prefix)
+        while idx < len(sorted_keys) and sorted_keys[idx].startswith(prefix):
+            revs.append(sorted_keys[idx])
+            idx += 1
+        revs.sort(key=positions.__getitem__)
+        return revs
+
+    @util.memoized_property
+    def _reachability_index(self) -> _ReachabilityIndex:
+        return _ReachabilityIndex(self._revision_map)
+
     @util.memoized_property
     def _revision_map(self) -> _RevisionMapType:
         """memoized attribute, initializes the revision map from the
@@ -180,13 +274,16 @@ class RevisionMap:
         # general)
         map_: _InterimRevisionMapType = sqlautil.OrderedDict()
 
-        heads: Set[Revision] = sqlautil.OrderedSet()
-        _real_heads: Set[Revision] = sqlautil.OrderedSet()
+        # dictionaries are used as ordered sets, as revisions are discarded
+        # from the heads at random positions
+        heads: Dict[Revision, None] = {}
+        _real_heads: Dict[Revision, None] = {}
         bases: Tuple[Revision, ...] = ()
         _real_bases: Tuple[Revision, ...] = ()
 
         has_branch_labels = set()
         all_revisions = set()
+        replaced: Dict[str, str] = {}
 
         for revision in self._generator():
             all_revisions.add(revision)
@@ -199,12 +296,22 @@ class RevisionMap:
             if revision.branch_labels:
                 has_branch_labels.add(revision)
 
-            heads.add(revision)
-            _real_heads.add(revision)
+            heads[revision] = None
+            _real_heads[revision] = None
             if revision.is_base:
                 bases += (revision,)
             if revision._is_real_base:
                 _real_bases += (revision,)
+            for replaced_rev in revision.replaces:
+                replaced[replaced_rev] = revision.revision
+
+        for replaced_rev in replaced:
+            if replaced_rev in map_:
+                util.warn(
+                    "Revision %s is replaced by revision %s, "
+                    "however it is still present"
+                    % (replaced_rev, replaced[replaced_rev])
+                )
 
         # add the branch_labels to the map_.  We'll need these
         # to resolve the dependencies.
@@ -227,14 +334,18 @@ class RevisionMap:
                 down_revision = map_[downrev]
                 down_revision.add_nextrev(rev)
                 if downrev in rev._versioned_down_revisions:
-                    heads.discard(down_revision)
-                _real_heads.discard(down_revision)
+                    heads.pop(down_revision, None)
+                _real_heads.pop(down_revision, None)
 
         # once the map has downrevisions populated, the dependencies
         # can be further refined to include only those which are not
         # already ancestors
-        self._normalize_depends_on(all_revisions, cast(_RevisionMapType, map_))
-        self._detect_cycles(rev_map, heads, bases, _real_heads, _real_bases)
+        self._normalize_all_depends_on(
+            all_revisions, cast(_RevisionMapType, map_)
+        )
+        self._detect_cycles(
+            rev_map, list(heads), bases, list(_real_heads), _real_bases
+        )
 
         revision_map: _RevisionMapType = dict(map_.items())
         revision_map[None] = revision_map[()] = None
@@ -242,20 +353,29 @@ class RevisionMap:
         self._real_heads = tuple(rev.revision for rev in _real_heads)
         self.bases = tuple(rev.revision for rev in bases)
         self._real_bases = tuple(rev.revision for rev in _real_bases)
+        self._replaced_revisions = replaced
 
-        self._add_branches(has_branch_labels, revision_map)
+        self._labeled_revisions = {rev.revision for rev in has_branch_labels}
+        self._branch_label_nodes = self._add_branches(
+            has_branch_labels, revision_map
+        )
         return revision_map
 
     def _detect_cycles(
         self,
         rev_map: _InterimRevisionMapType,
-        heads: Set[Revision],
+        heads: Collection[Revision],
         bases: Tuple[Revision, ...],
-        _real_heads: Set[Revision],
+        _real_heads: Collection[Revision],
         _real_bases: Tuple[Revision, ...],
     ) -> None:
         if not rev_map:
             return
+        if self._is_acyclic(rev_map, bases, _real_bases):
+            return
+
+        # there's a cycle somewhere; determine which revisions are
+        # involved, as well as those which are cut off by the cycle
         if not heads or not bases:
             raise CycleDetected(list(rev_map))
         total_space = {
@@ -298,6 +418,51 @@ class RevisionMap:
         if deleted_revs:
             raise DependencyCycleDetected(sorted(deleted_revs))
 
+    def _is_acyclic(
+        self,
+        rev_map: _InterimRevisionMapType,
+        bases: Tuple[Revision, ...],
+        _real_bases: Tuple[Revision, ...],
+    ) -> bool:
+        """Return True if there are no cycles among the revisions in the
+        map, including those formed by dependencies, and each revision
+        without down revisions is among the given bases.
+
+        Revisions are removed starting from those without down revisions,
+        each revision being removed once all of its down revisions have
+        been; every revision and every link between revisions is visited
+        only once.   If all revisions are removed, there's no cycle.
+
+        """
+        base_ids = {rev.revision for rev in bases}
+        real_base_ids = {rev.revision for rev in _real_bases}
+
+        pending: Dict[str, int] = {}
+        todo: List[Revision] = []
+        for revision in rev_map.values():
+            if (
+                not revision._versioned_down_revisions
+                and revision.revision not in base_ids
+            ):
+                return False
+            all_down_revisions = revision._all_down_revisions
+            if all_down_revisions:
+                pending[revision.revision] = len(all_down_revisions)
+            elif revision.revision not in real_base_ids:
+                return False
+            else:
+                todo.append(revision)
+
+        removed = len(todo)
+        while todo:
+            revision = todo.pop()
+            for rev_id in revision._all_nextrev:
+                pending[rev_id] -= 1
+                if not pending[rev_id]:
+                    todo.append(rev_map[rev_id])
+                    removed += 1
+        return removed == len(rev_map)
+
     def _map_branch_labels(
         self, revisions: Collection[Revision], map_: _RevisionMapType
     ) -> None:
@@ -321,7 +486,15 @@ class RevisionMap:
 
     def _add_branches(
         self, revisions: Collection[Revision], map_: _RevisionMapType
-    ) -> None:
+    ) -> Set[str]:
+        """Apply the branch labels of the given revisions to their
+        descendants, and to ancestors up until a branch point.
+
+        Returns the revision numbers of each revision the labels were
+        applied to.
+
+        """
+        labeled_nodes = set()
         for revision in revisions:
             if revision.branch_labels:
                 revision.branch_labels.update(revision.branch_labels)
@@ -329,6 +502,7 @@ class RevisionMap:
                     [revision], map_, include_dependencies=False
                 ):
                     node.branch_labels.update(revision.branch_labels)
+                    labeled_nodes.add(node.revision)
 
                 parent = node
                 while (
@@ -337,10 +511,132 @@ class RevisionMap:
                     and not parent.is_merge_point
                 ):
                     parent.branch_labels.update(revision.branch_labels)
+                    labeled_nodes.add(parent.revision)
                     if parent.down_revision:
                         parent = map_[parent.down_revision]
                     else:
                         break
+        return labeled_nodes
+
+    def _update_branches(self, map_: _RevisionMapType) -> None:
+        """Re-apply branch labels after revisions have been added to or
+        removed from the map, visiting only those revisions which have
+        or will have branch labels applied to them.
+
+        """
+        if not self._labeled_revisions and not self._branch_label_nodes:
+            return
+        for rev_id in self._branch_label_nodes:
+            rev = map_.get(rev_id)
+            if rev is not None and rev.revision == rev_id:
+                rev.branch_labels = set(rev._orig_branch_labels)
+        self._branch_label_nodes = self._add_branches(
+            [not_none(map_[rev_id]) for rev_id in self._labeled_revisions],
+            map_,
+        )
+
+    def _relabel_line(
+        self, revision: Revision, added: Revision, map_: _RevisionMapType
+    ) -> None:
+        """Re-apply branch labels along the unbranched line of revisions
+        through the given revision, which the ``added`` revision has just
+        made into a branch point or merged.
+
+        The revisions on either end of the line are branch points, merge
+        points, bases or heads, none of which have labels applied from
+        the revisions above them, so the labels of the line can be
+        computed from the revisions below it alone.
+
+        """
+
+        def previous_nextrev(rev: Revision) -> FrozenSet[str]:
+            return rev._all_nextrev.difference([added.revision])
+
+        line = [revision]
+        rev = revision
+        while not rev.is_merge_point and rev._versioned_down_revisions:
+            rev = not_none(map_[rev._versioned_down_revisions[0]])
+            if rev.is_merge_point or len(previous_nextrev(rev)) != 1:
+                break
+            line.insert(0, rev)
+        rev = revision
+        while True:
+            nextrev = previous_nextrev(rev)
+            if (
+                len(nextrev) != 1
+                or rev.nextrev.difference([added.revision]) != nextrev
+            ):
+                break
+            rev = not_none(map_[next(iter(nextrev))])
+            if rev.is_merge_point:
+                break
+            line.append(rev)
+
+        for rev in line:
+            rev.branch_labels = set(rev._orig_branch_labels)
+            for downrev in rev._versioned_down_revisions:
+                rev.branch_labels.update(not_none(map_[downrev]).branch_labels)
+
+        # as in _add_branches(), the labels of a labeled revision are
+        # applied to the revisions below it when there is no branch point
+        # or merge point between it and a head, which may be the added
+        # revision
+        walked = []
+        if not line[-1].nextrev.difference([added.revision]) and not (
+            added.revision in line[-1].nextrev and added.is_merge_point
+        ):
+            for rev in reversed(line):
+                if rev._is_real_branch_point or rev.is_merge_point:
+                    break
+                walked.append(rev)
+        labels = set().union(
+            *(rev.branch_labels for rev in walked if rev._orig_branch_labels)
+        )
+        for rev in walked:
+            rev.branch_labels.update(labels)
+        self._branch_label_nodes.update(
+            rev.revision for rev in line if rev.branch_labels
+        )
+
+    def _update_heads_and_bases(
+        self, map_: _RevisionMapType, revisions: Collection[Revision]
+    ) -> None:
+        """Update the heads and bases of the map after the given
+        revisions have been replaced, removed, or had their next
+        revisions change, keeping each collection in map order.
+
+        """
+        affected = {}
+        for rev in revisions:
+            current = map_.get(rev.revision)
+            affected[rev.revision] = (
+                current
+                if current is not None and current.revision == rev.revision
+                else None
+            )
+        positions: Dict[Any, int] = {}
+
+        def update(
+            existing: Tuple[str, ...], include: Callable[[Revision], bool]
+        ) -> Tuple[str, ...]:
+            members = [rev_id for rev_id in existing if rev_id not in affected]
+            members.extend(
+                rev_id
+                for rev_id, rev in affected.items()
+                if rev is not None and include(rev)
+            )
+            if not positions:
+                positions.update((key, idx) for idx, key in enumerate(map_))
+            return tuple(sorted(members, key=positions.__getitem__))
+
+        self.heads = update(self.heads, lambda rev: rev.is_head)
+        self._real_heads = update(
+            self._real_heads, lambda rev: rev._is_real_head
+        )
+        self.bases = update(self.bases, lambda rev: rev.is_base)
+        self._real_bases = update(
+            self._real_bases, lambda rev: rev._is_real_base
+        )
 
     def _add_depends_on(
         self, revisions: Collection[Revision], map_: _RevisionMapType
@@ -405,12 +701,94 @@ class RevisionMap:
             else:
                 revision._normalized_resolved_dependencies = ()
 
+    def _normalize_all_depends_on(
+        self, revisions: Collection[Revision], map_: _RevisionMapType
+    ) -> None:
+        """Create the normalized "dependencies" collection for every
+        revision in a fully populated revision map.
+
+        The result is the same as that of _normalize_depends_on(), however
+        rather than iterating the ancestors of each revision that has
+        dependencies, the revisions are visited once, parents before
+        children, carrying along for each revision the dependencies of all
+        of its ancestors as a bitmask.   The bitmask of a revision is
+        discarded once all of its children have been visited.
+
+        If the revisions can't be ordered, such as when there is a cycle,
+        _normalize_depends_on() is used instead.
+
+        """
+        dep_bits: Dict[str, int] = {}
+        for revision in revisions:
+            for dep in revision._resolved_dependencies:
+                if dep not in dep_bits:
+                    dep_bits[dep] = 1 << len(dep_bits)
+
+        if not dep_bits:
+            for revision in revisions:
+                revision._normalized_resolved_dependencies = ()
+            return
+
+        pending: Dict[str, int] = {}
+        todo: List[Revision] = []
+        for revision in revisions:
+            if map_.get(revision.revision) is not revision:
+                # a revision that's present more than once
+                self._normalize_depends_on(revisions, map_)
+                return
+            if revision._versioned_down_revisions:
+                pending[revision.revision] = len(
+                    revision._versioned_down_revisions
+                )
+            else:
+                todo.append(revision)
+
+        # for each revision whose children haven't all been visited, the
+        # dependencies of the revision and its ancestors
+        inherited: Dict[str, int] = {}
+        children_left: Dict[str, int] = {}
+        visited = 0
+        while todo:
+            revision = todo.pop()
+            visited += 1
+
+            ancestor_bits = 0
+            for downrev in revision._versioned_down_revisions:
+                ancestor_bits |= inherited[downrev]
+                children_left[downrev] -= 1
+                if not children_left[downrev]:
+                    del inherited[downrev]
+
+            revision._normalized_resolved_dependencies = tuple(
+                dep
+                for dep in util.dedupe_tuple(revision._resolved_dependencies)
+                if not ancestor_bits & dep_bits[dep]
+            )
+
+            if revision.nextrev:
+                for dep in revision._resolved_dependencies:
+                    ancestor_bits |= dep_bits[dep]
+                inherited[revision.revision] = ancestor_bits
+                children_left[revision.revision] = len(revision.nextrev)
+
+            for rev_id in revision.nextrev:
+                pending[rev_id] -= 1
+                if not pending[rev_id]:
+                    todo.append(not_none(map_[rev_id]))
+
+        if visited != len(revisions):
+            self._normalize_depends_on(revisions, map_)
+
     def add_revision(self, revision: Revision, _replace: bool = False) -> None:
         """add a single revision to an existing map.
 
         This method is for single-revision use cases, it's not
         appropriate for fully populating an entire revision map.
 
+        Heads, bases, branch labels and dependencies are updated only for
+        the revisions affected by the new revision, so that adding many
+        revisions one at a time doesn't traverse the whole map each time.
+
         """
         map_ = self._revision_map
         if not _replace and revision.revision in map_:
@@ -420,17 +798,35 @@ class RevisionMap:
         elif _replace and revision.revision not in map_:
             raise Exception("revision %s not in map" % revision.revision)
 
+        if _replace:
+            self._replace_revision(revision, map_)
+            return
+
         map_[revision.revision] = revision
+        self.__dict__.pop("_reachability_index", None)
 
         revisions = [revision]
-        self._add_branches(revisions, map_)
         self._map_branch_labels(revisions, map_)
         self._add_depends_on(revisions, map_)
+        self._add_to_prefix_index(
+            (revision.revision,) + revision._orig_branch_labels
+        )
 
         if revision.is_base:
             self.bases += (revision.revision,)
         if revision._is_real_base:
             self._real_bases += (revision.revision,)
+        for replaced_rev in revision.replaces:
+            self._replaced_revisions[replaced_rev] = revision.revision
+
+        # a revision which continues a single line of revisions from its
+        # head doesn't change the branch labels of any other revision
+        extends_head = not revision._resolved_dependencies and all(
+            downrev in map_ and not not_none(map_[downrev])._all_nextrev
+            for downrev in revision._versioned_down_revisions
+        )
+        if len(revision._versioned_down_revisions) > 1:
+            extends_head = False
 
         for downrev in revision._all_down_revisions:
             if downrev not in map_:
@@ -443,24 +839,184 @@ class RevisionMap:
         self._normalize_depends_on(revisions, map_)
 
         if revision._is_real_head:
+            all_down_revisions = set(revision._all_down_revisions)
             self._real_heads = tuple(
                 head
                 for head in self._real_heads
-                if head
-                not in set(revision._all_down_revisions).union(
-                    [revision.revision]
-                )
+                if head not in all_down_revisions and head != revision.revision
             ) + (revision.revision,)
         if revision.is_head:
+            versioned_down_revisions = set(revision._versioned_down_revisions)
             self.heads = tuple(
                 head
                 for head in self.heads
-                if head
-                not in set(revision._versioned_down_revisions).union(
-                    [revision.revision]
-                )
+                if head not in versioned_down_revisions
+                and head != revision.revision
             ) + (revision.revision,)
 
+        if revision._orig_branch_labels:
+            self._labeled_revisions.add(revision.revision)
+        if not extends_head:
+            # labels of the revisions above a down revision or dependency
+            # which is now a branch point, or which is now merged, no
+            # longer apply to the revisions below it
+            for downrev in revision._all_down_revisions:
+                down = not_none(map_[downrev])
+                previous = down._all_nextrev.difference([revision.revision])
+                if len(previous) == 1 or (
+                    not previous
+                    and revision.is_merge_point
+                    and downrev in revision._versioned_down_revisions
+                ):
+                    self._relabel_line(down, revision, map_)
+
+        for downrev in revision._versioned_down_revisions:
+            down_labels = not_none(map_[downrev]).branch_labels
+            if down_labels:
+                revision.branch_labels.update(down_labels)
+                self._branch_label_nodes.add(revision.revision)
+        if revision._orig_branch_labels:
+            self._branch_label_nodes.update(
+                self._add_branches(revisions, map_)
+            )
+
+    def _replace_revision(
+        self, revision: Revision, map_: _RevisionMapType
+    ) -> None:
+        existing = not_none(map_[revision.revision])
+
+        self._add_depends_on([revision], map_)
+        if existing._all_down_revisions != revision._all_down_revisions:
+            # the revisions which are now below this one can't also be
+            # above it
+            descendants = {
+                rev.revision
+                for rev in self._get_descendant_nodes([existing], map_)
+            }
+            cycle = descendants.intersection(revision._all_down_revisions)
+            if cycle:
+                if cycle.intersection(revision._versioned_down_revisions):
+                    raise CycleDetected(sorted(cycle | {revision.revision}))
+                else:
+                    raise DependencyCycleDetected(
+                        sorted(cycle | {revision.revision})
+                    )
+        else:
+            descendants = set()
+
+        for branch_label in existing._orig_branch_labels:
+            if map_.get(branch_label) is existing:
+                del map_[branch_label]
+        try:
+            self._map_branch_labels([revision], map_)
+        except RevisionError:
+            for branch_label in revision._orig_branch_labels:
+                if map_.get(branch_label) is revision:
+                    del map_[branch_label]
+            self._map_branch_labels([existing], map_)
+            raise
+        self._remove_from_prefix_index(existing._orig_branch_labels)
+        self._add_to_prefix_index(revision._orig_branch_labels)
+
+        map_[revision.revision] = revision
+        self.__dict__.pop("_reachability_index", None)
+
+        for replaced_rev in existing.replaces:
+            if self._replaced_revisions.get(replaced_rev) == revision.revision:
+                del self._replaced_revisions[replaced_rev]
+        for replaced_rev in revision.replaces:
+            self._replaced_revisions[replaced_rev] = revision.revision
+
+        # revisions above this one still refer to it
+        revision.nextrev = existing.nextrev
+        revision._all_nextrev = existing._all_nextrev
+
+        old_down_revisions = [
+            not_none(map_[downrev]) for downrev in existing._all_down_revisions
+        ]
+        for down_revision in old_down_revisions:
+            down_revision._remove_nextrev(existing)
+        for downrev in revision._all_down_revisions:
+            not_none(map_[downrev]).add_nextrev(revision)
+
+        self._normalize_depends_on([revision], map_)
+        if descendants:
+            # the ancestors of the revisions above this one have changed
+            self._normalize_depends_on(
+                [
+                    rev
+                    for rev in (
+                        not_none(map_[rev_id]) for rev_id in descendants
+                    )
+                    if rev._resolved_dependencies
+                ],
+                map_,
+            )
+
+        self._update_heads_and_bases(
+            map_,
+            [revision]
+            + old_down_revisions
+            + [
+                not_none(map_[downrev])
+                for downrev in revision._all_down_revisions
+            ],
+        )
+
+        self._labeled_revisions.discard(revision.revision)
+        if revision._orig_branch_labels:
+            self._labeled_revisions.add(revision.revision)
+        self._update_branches(map_)
+
+    def remove_revision(self, revision: _RevisionOrStr) -> None:
+        """remove a single revision from an existing map.
+
+        The revision may only be removed if no other revision refers to it,
+        either as a ``down_revision`` or as a dependency.   As with
+        :meth:`.RevisionMap.add_revision`, only the revisions affected by
+        the removal are updated.
+
+        .. versionadded:: 1.12.0
+
+        """
+        map_ = self._revision_map
+        rev_id = (
+            revision.revision if isinstance(revision, Revision) else revision
+        )
+        existing = map_.get(rev_id)
+        if existing is None or existing.revision != rev_id:
+            raise RevisionError("Revision %s is not present" % rev_id)
+        if existing._all_nextrev:
+            raise RevisionError(
+                "Revision %s can't be removed, as it's referred to by "
+                "revision(s) %s"
+                % (rev_id, ", ".join(sorted(existing._all_nextrev)))
+            )
+
+        del map_[rev_id]
+        for branch_label in existing._orig_branch_labels:
+            if map_.get(branch_label) is existing:
+                del map_[branch_label]
+        self.__dict__.pop("_reachability_index", None)
+        self._remove_from_prefix_index(
+            (rev_id,) + existing._orig_branch_labels
+        )
+
+        for replaced_rev in existing.replaces:
+            if self._replaced_revisions.get(replaced_rev) == rev_id:
+                del self._replaced_revisions[replaced_rev]
+
+        down_revisions = [
+            not_none(map_[downrev]) for downrev in existing._all_down_revisions
+        ]
+        for down_revision in down_revisions:
+            down_revision._remove_nextrev(existing)
+
+        self._update_heads_and_bases(map_, [existing] + down_revisions)
+
+        self._labeled_revisions.discard(rev_id)
+        self._update_branches(map_)
+
     def get_current_head(
         self, branch_label: Optional[str] = None
     ) -> Optional[str]:
@@ -605,15 +1161,20 @@ class RevisionMap:
         except KeyError:
             # break out to avoid misleading py3k stack traces
             revision = False
+        if revision is False and resolved_id in self._replaced_revisions:
+            # a revision that was squashed into a baseline revision; it's
+            # not the baseline, whose schema it doesn't have
+            assert isinstance(resolved_id, str)
+            raise ResolutionError(
+                "Revision %s was squashed into baseline revision %s"
+                % (resolved_id, self._replaced_revisions[resolved_id]),
+                resolved_id,
+            )
         revs: Sequence[str]
         if revision is False:
             assert resolved_id
             # do a partial lookup
-            revs = [
-                x
-                for x in self._revision_map
-                if x and len(x) > 3 and x.startswith(resolved_id)
-            ]
+            revs = self._revisions_with_prefix(resolved_id)
 
             if branch_rev:
                 revs = self.filter_for_lineage(revs, check_branch)
@@ -711,6 +1272,13 @@ class RevisionMap:
             )
         ]
 
+        if self.reachability_index:
+            return self._reachability_index.shares_lineage(
+                resolved_target,
+                resolved_test_against_revs,
+                include_dependencies=include_dependencies,
+            )
+
         return bool(
             set(
                 self._get_descendant_nodes(
@@ -855,6 +1423,56 @@ class RevisionMap:
             fn, targets, map_=map_, check=check
         )
 
+    def _get_descendant_set(
+        self,
+        targets: Collection[Optional[_RevisionOrBase]],
+        check: bool = False,
+        include_dependencies: bool = True,
+    ) -> Set[Revision]:
+        """Return the given revisions along with all of their descendants,
+        using the reachability index if enabled.
+
+        """
+        if self.reachability_index:
+            return self._reachability_index.related(
+                targets,
+                False,
+                include_dependencies=include_dependencies,
+                check=check,
+            )
+        return set(
+            self._get_descendant_nodes(
+                targets,
+                check=check,
+                include_dependencies=include_dependencies,
+            )
+        )
+
+    def _get_ancestor_set(
+        self,
+        targets: Collection[Optional[_RevisionOrBase]],
+        check: bool = False,
+        include_dependencies: bool = True,
+    ) -> Set[Revision]:
+        """Return the given revisions along with all of their ancestors,
+        using the reachability index if enabled.
+
+        """
+        if self.reachability_index:
+            return self._reachability_index.related(
+                targets,
+                True,
+                include_dependencies=include_dependencies,
+                check=check,
+            )
+        return set(
+            self._get_ancestor_nodes(
+                targets,
+                check=check,
+                include_dependencies=include_dependencies,
+            )
+        )
+
     def _iterate_related_revisions(
         self,
         fn: Callable,
@@ -915,28 +1533,120 @@ class RevisionMap:
         down_revisions and dependencies). Uses the order of keys in
         _revision_map to sort.
 
+        The revisions are traversed from the given heads downwards, in the
+        style of Kahn's algorithm; each revision keeps a count of its
+        nearest descendants within the collection which haven't yet been
+        emitted, and is only emitted once that count reaches zero.
+
         """
 
         id_to_rev = self._revision_map
 
-        def get_ancestors(rev_id):
-            return {
-                r.revision
-                for r in self._get_ancestor_nodes([id_to_rev[rev_id]])
-            }
-
         todo = {d.revision for d in revisions}
 
+        down_revisions: Dict[str, Tuple[str, ...]] = {}
+
+        def get_down_revisions(rev_id: str) -> Tuple[str, ...]:
+            try:
+                return down_revisions[rev_id]
+            except KeyError:
+                rev = id_to_rev[rev_id]
+                assert rev is not None
+                if rev.revision != rev_id:
+                    raise RevisionError(
+                        "Dependency resolution failed; broken map"
+                    )
+                result = rev._normalized_down_revisions
+                down_revisions[rev_id] = result
+                return result
+
+        # for each revision, the revisions within the collection that are
+        # reachable from its down revisions without passing through another
+        # revision of the collection.  Computed depth first without
+        # recursion, as revision chains may be very long.
+        reachable: Dict[str, FrozenSet[str]] = {}
+
+        def get_nearest_ancestors(rev_id: str) -> FrozenSet[str]:
+            stack = [rev_id]
+            while stack:
+                current = stack[-1]
+                if current in reachable:
+                    stack.pop()
+                    continue
+                unresolved = [
+                    down
+                    for down in get_down_revisions(current)
+                    if down not in todo and down not in reachable
+                ]
+                if unresolved:
+                    stack.extend(unresolved)
+                    continue
+                stack.pop()
+                nearest: Set[str] = set()
+                for down in get_down_revisions(current):
+                    if down in todo:
+                        nearest.add(down)
+                    else:
+                        nearest.update(reachable[down])
+                reachable[current] = frozenset(nearest)
+            return reachable[rev_id]
+
+        nearest_ancestors = {
+            rev_id: get_nearest_ancestors(rev_id) for rev_id in todo
+        }
+        nearest_descendants: Dict[str, List[str]] = {
+            rev_id: [] for rev_id in todo
+        }
+        for rev_id, ancestors in nearest_ancestors.items():
+            for ancestor in ancestors:
+                nearest_descendants[ancestor].append(rev_id)
+
+        # the number of nearest descendants not yet emitted; a revision
+        # with any remaining is an ancestor of some other current head
+        pending = {
+            rev_id: len(descendants)
+            for rev_id, descendants in nearest_descendants.items()
+        }
+
+        # the revisions not yet emitted that are dependent on a given
+        # revision.  As revisions are only ever removed from consideration,
+        # this remains valid for the purpose of locating heads once it's
+        # been computed.
+        descendants_by_rev: Dict[str, Set[str]] = {}
+
+        def get_descendant_head_index(candidate: str) -> Optional[int]:
+            # locate the first head, in order, that is dependent on the
+            # candidate, by walking up through the revisions not yet emitted
+            try:
+                descendants = descendants_by_rev[candidate]
+            except KeyError:
+                descendants = descendants_by_rev[candidate] = set()
+                stack = [candidate]
+                while stack:
+                    for rev_id in nearest_descendants[stack.pop()]:
+                        if rev_id in todo and rev_id not in descendants:
+                            descendants.add(rev_id)
+                            stack.append(rev_id)
+            dependent_heads = descendants.intersection(head_order)
+            if not dependent_heads:
+                return None
+            return current_heads.index(
+                min(dependent_heads, key=head_order.__getitem__)
+            )
+
         # Use revision map (ordered dict) key order to pre-sort.
-        inserted_order = list(self._revision_map)
+        inserted_order = {key: idx for idx, key in enumerate(id_to_rev)}
 
         current_heads = list(
             sorted(
                 {d.revision for d in heads if d.revision in todo},
-                key=inserted_order.index,
+                key=inserted_order.__getitem__,
             )
         )
-        ancestors_by_idx = [get_ancestors(rev_id) for rev_id in current_heads]
+        # heads in current_heads, mapped to a key that's ascending in the
+        # same order as the list
+        head_order = {rev_id: idx for idx, rev_id in enumerate(current_heads)}
+        next_head_order = len(current_heads)
 
         output = []
 
@@ -944,67 +1654,43 @@ class RevisionMap:
         while current_heads:
             candidate = current_heads[current_candidate_idx]
 
-            for check_head_index, ancestors in enumerate(ancestors_by_idx):
-                # scan all the heads.  see if we can continue walking
-                # down the current branch indicated by current_candidate_idx.
-                if (
-                    check_head_index != current_candidate_idx
-                    and candidate in ancestors
-                ):
+            if pending[candidate]:
+                # see if we can continue walking down the current branch
+                # indicated by current_candidate_idx.
+                check_head_index = get_descendant_head_index(candidate)
+                if check_head_index is not None:
                     current_candidate_idx = check_head_index
                     # nope, another head is dependent on us, they have
                     # to be traversed first
-                    break
-            else:
-                # yup, we can emit
-                if candidate in todo:
-                    output.append(candidate)
-                    todo.remove(candidate)
-
-                # now update the heads with our ancestors.
+                    continue
 
-                candidate_rev = id_to_rev[candidate]
-                assert candidate_rev is not None
+            # yup, we can emit
+            if candidate in todo:
+                output.append(candidate)
+                todo.remove(candidate)
+                for ancestor in nearest_ancestors[candidate]:
+                    pending[ancestor] -= 1
 
-                heads_to_add = [
-                    r
-                    for r in candidate_rev._normalized_down_revisions
-                    if r in todo and r not in current_heads
-                ]
+            # now update the heads with our ancestors.
 
-                if not heads_to_add:
-                    # no ancestors, so remove this head from the list
-                    del current_heads[current_candidate_idx]
-                    del ancestors_by_idx[current_candidate_idx]
-                    current_candidate_idx = max(current_candidate_idx - 1, 0)
-                else:
-                    if (
-                        not candidate_rev._normalized_resolved_dependencies
-                        and len(candidate_rev._versioned_down_revisions) == 1
-                    ):
-                        current_heads[current_candidate_idx] = heads_to_add[0]
-
-                        # for plain movement down a revision line without
-                        # any mergepoints, branchpoints, or deps, we
-                        # can update the ancestors collection directly
-                        # by popping out the candidate we just emitted
-                        ancestors_by_idx[current_candidate_idx].discard(
-                            candidate
-                        )
+            heads_to_add = [
+                r
+                for r in get_down_revisions(candidate)
+                if r in todo and r not in head_order
+            ]
 
-                    else:
-                        # otherwise recalculate it again, things get
-                        # complicated otherwise.  This can possibly be
-                        # improved to not run the whole ancestor thing
-                        # each time but it was getting complicated
-                        current_heads[current_candidate_idx] = heads_to_add[0]
-                        current_heads.extend(heads_to_add[1:])
-                        ancestors_by_idx[
-                            current_candidate_idx
-                        ] = get_ancestors(heads_to_add[0])
-                        ancestors_by_idx.extend(
-                            get_ancestors(head) for head in heads_to_add[1:]
-                        )
+            if not heads_to_add:
+                # no ancestors, so remove this head from the list
+                del current_heads[current_candidate_idx]
+                del head_order[candidate]
+                current_candidate_idx = max(current_candidate_idx - 1, 0)
+            else:
+                current_heads[current_candidate_idx] = heads_to_add[0]
+                current_heads.extend(heads_to_add[1:])
+                head_order[heads_to_add[0]] = head_order.pop(candidate)
+                for head in heads_to_add[1:]:
+                    head_order[head] = next_head_order
+                    next_head_order += 1
 
         assert not todo
         return output
@@ -1341,7 +2027,7 @@ class RevisionMap:
             # Need to filter roots.
             ancestors = {
                 rev.revision
-                for rev in self._get_ancestor_nodes(
+                for rev in self._get_ancestor_set(
                     [self._resolve_branch(branch_label)],
                     include_dependencies=False,
                 )
@@ -1365,15 +2051,11 @@ class RevisionMap:
 
         # Aim is to drop :branch_revision; to do so we also need to drop its
         # descendents and anything dependent on it.
-        downgrade_revisions = set(
-            self._get_descendant_nodes(
-                roots,
-                include_dependencies=True,
-                omit_immediate_dependencies=False,
-            )
+        downgrade_revisions = self._get_descendant_set(
+            roots, include_dependencies=True
         )
-        active_revisions = set(
-            self._get_ancestor_nodes(heads, include_dependencies=True)
+        active_revisions = self._get_ancestor_set(
+            heads, include_dependencies=True
         )
 
         # Emit revisions to drop in reverse topological sorted order.
@@ -1382,7 +2064,7 @@ class RevisionMap:
         if implicit_base:
             # Wind other branches back to base.
             downgrade_revisions.update(
-                active_revisions.difference(self._get_ancestor_nodes(roots))
+                active_revisions.difference(self._get_ancestor_set(roots))
             )
 
         if (
@@ -1439,10 +2121,8 @@ class RevisionMap:
                 need for need in targets if branch in need.branch_labels
             }
 
-        required_node_set = set(
-            self._get_ancestor_nodes(
-                targets, check=True, include_dependencies=True
-            )
+        required_node_set = self._get_ancestor_set(
+            targets, check=True, include_dependencies=True
         ).union(targets)
 
         current_revisions = self.get_revisions(lower)
@@ -1472,10 +2152,8 @@ class RevisionMap:
                 current_revisions = (rev,)
                 lower = rev.revision
 
-        current_node_set = set(
-            self._get_ancestor_nodes(
-                current_revisions, check=True, include_dependencies=True
-            )
+        current_node_set = self._get_ancestor_set(
+            current_revisions, check=True, include_dependencies=True
         ).union(current_revisions)
 
         needs = required_node_set.difference(current_node_set)
@@ -1488,7 +2166,7 @@ class RevisionMap:
         # implicit_base=False -> only return direct downstreams of
         # current_revisions
         if current_revisions and not implicit_base:
-            lower_descendents = self._get_descendant_nodes(
+            lower_descendents = self._get_descendant_set(
                 [is_revision(rev) for rev in current_revisions],
                 check=True,
                 include_dependencies=False,
@@ -1503,11 +2181,179 @@ class RevisionMap:
         top_revs: Set[Optional[_RevisionOrBase]]
         top_revs = set(self.get_revisions(id_))
         top_revs.update(
-            self._get_ancestor_nodes(list(top_revs), include_dependencies=True)
+            self._get_ancestor_set(list(top_revs), include_dependencies=True)
         )
         return self._filter_into_branch_heads(top_revs)
 
 
+class _ReachabilityIndex:
+    """The ancestors and descendants of each revision within a
+    :class:`.RevisionMap`, stored as integer bitsets.
+
+    Revisions are numbered in topological order, so that the ancestors of
+    a revision may be computed from those of its down revisions and the
+    descendants from those of its next revisions, each in a single pass.
+    Each kind of closure is computed when first used, and collecting the
+    ancestors or descendants of any number of revisions is then a matter
+    of combining their bitsets.
+
+    Memory use is proportional to the square of the number of revisions,
+    so the index is only used when requested, typically by long-running
+    processes which traverse the same revision map many times.
+
+    """
+
+    def __init__(self, revision_map: _RevisionMapType) -> None:
+        map_ = {
+            key: rev
+            for key, rev in revision_map.items()
+            if rev is not None and rev.revision == key
+        }
+
+        revisions: List[Revision] = []
+        positions: Dict[str, int] = {}
+        # depth-first, emitting each revision after all of its down
+        # revisions and dependencies; without recursion as revision
+        # chains may be very long.
+        for rev_id in map_:
+            if rev_id in positions:
+                continue
+            stack = [rev_id]
+            while stack:
+                current = stack[-1]
+                if current in positions:
+                    stack.pop()
+                    continue
+                unresolved = [
+                    down
+                    for down in map_[current]._all_down_revisions
+                    if down not in positions
+                ]
+                if unresolved:
+                    for down in unresolved:
+                        if down not in map_:
+                            raise RevisionError(
+                                "Dependency resolution failed; broken map"
+                            )
+                    stack.extend(unresolved)
+                    continue
+                stack.pop()
+                positions[current] = len(revisions)
+                revisions.append(map_[current])
+
+        self._revisions = revisions
+        self._positions = positions
+        self._closures: Dict[Tuple[bool, bool], List[int]] = {}
+
+    def _closure(
+        self, ancestors: bool, include_dependencies: bool
+    ) -> List[int]:
+        try:
+            return self._closures[(ancestors, include_dependencies)]
+        except KeyError:
+            pass
+
+        # ancestors are built up from the base revisions, which are
+        # numbered first, descendants from the heads
+        if ancestors:
+            order: Iterable[int] = range(len(self._revisions))
+            attrname = (
+                "_normalized_down_revisions"
+                if include_dependencies
+                else "_versioned_down_revisions"
+            )
+        else:
+            order = reversed(range(len(self._revisions)))
+            attrname = "_all_nextrev" if include_dependencies else "nextrev"
+
+        positions = self._positions
+        closure = [0] * len(self._revisions)
+        for idx in order:
+            bits = 1 << idx
+            for rev_id in getattr(self._revisions[idx], attrname):
+                bits |= closure[positions[rev_id]]
+            closure[idx] = bits
+
+        self._closures[(ancestors, include_dependencies)] = closure
+        return closure
+
+    def _revisions_for(self, bits: int) -> Set[Revision]:
+        revisions = self._revisions
+        # binary digits, least significant first
+        digits = bin(bits)[:1:-1]
+        result = set()
+        idx = digits.find("1")
+        while idx != -1:
+            result.add(revisions[idx])
+            idx = digits.find("1", idx + 1)
+        return result
+
+    def related(
+        self,
+        targets: Collection[Optional[_RevisionOrBase]],
+        ancestors: bool,
+        include_dependencies: bool = True,
+        check: bool = False,
+    ) -> Set[Revision]:
+        """Return the given revisions along with all of their ancestors
+        or descendants.
+
+        """
+        closure = self._closure(ancestors, include_dependencies)
+        target_positions = [
+            (target, self._positions[target.revision])
+            for target in (is_revision(target_for) for target_for in targets)
+        ]
+
+        if check:
+            target_bits = 0
+            for _, pos in target_positions:
+                target_bits |= 1 << pos
+            for target, pos in target_positions:
+                overlaps = closure[pos] & target_bits & ~(1 << pos)
+                if overlaps:
+                    raise RevisionError(
+                        "Requested revision %s overlaps with "
+                        "other requested revisions %s"
+                        % (
+                            target.revision,
+                            ", ".join(
+                                r.revision
+                                for r in self._revisions_for(overlaps)
+                            ),
+                        )
+                    )
+
+        bits = 0
+        for _, pos in target_positions:
+            bits |= closure[pos]
+        return self._revisions_for(bits)
+
+    def shares_lineage(
+        self,
+        target: Revision,
+        test_against_revs: Iterable[Optional[Revision]],
+        include_dependencies: bool = False,
+    ) -> bool:
+        """Return True if any of the given revisions is the target, or
+        an ancestor or descendant of it.
+
+        """
+        test_bits = 0
+        for rev in test_against_revs:
+            if rev is not None:
+                test_bits |= 1 << self._positions[rev.revision]
+
+        pos = self._positions[target.revision]
+        return bool(
+            (
+                self._closure(True, include_dependencies)[pos]
+                | self._closure(False, include_dependencies)[pos]
+            )
+            & test_bits
+        )
+
+
 class Revision:
     """Base class for revisioned objects.
 
@@ -1519,15 +2365,28 @@ class Revision:
 
     """
 
-    nextrev: FrozenSet[str] = frozenset()
+    __slots__ = (
+        "nextrev",
+        "_all_nextrev",
+        "revision",
+        "down_revision",
+        "dependencies",
+        "branch_labels",
+        "replaces",
+        "_orig_branch_labels",
+        "_resolved_dependencies",
+        "_normalized_resolved_dependencies",
+    )
+
+    nextrev: FrozenSet[str]
     """following revisions, based on down_revision only."""
 
-    _all_nextrev: FrozenSet[str] = frozenset()
+    _all_nextrev: FrozenSet[str]
 
-    revision: str = None  # type: ignore[assignment]
+    revision: str
     """The string revision number."""
 
-    down_revision: Optional[_RevIdType] = None
+    down_revision: Optional[_RevIdType]
     """The ``down_revision`` identifier(s) within the migration script.
 
     Note that the total set of "down" revisions is
@@ -1535,7 +2394,7 @@ class Revision:
 
     """
 
-    dependencies: Optional[_RevIdType] = None
+    dependencies: Optional[_RevIdType]
     """Additional revisions which this revision is dependent on.
 
     From a migration standpoint, these dependencies are added to the
@@ -1545,10 +2404,21 @@ class Revision:
 
     """
 
-    branch_labels: Set[str] = None  # type: ignore[assignment]
+    branch_labels: Set[str]
     """Optional string/tuple of symbolic names to apply to this
     revision's branch"""
 
+    replaces: Tuple[str, ...]
+    """Revision numbers which were squashed into this revision.
+
+    A database whose version table refers to one of these revisions
+    is considered to be at this revision.
+
+    .. versionadded:: 1.12.0
+
+    """
+
+    _orig_branch_labels: Tuple[str, ...]
     _resolved_dependencies: Tuple[str, ...]
     _normalized_resolved_dependencies: Tuple[str, ...]
 
@@ -1567,6 +2437,7 @@ class Revision:
         down_revision: Optional[Union[str, Tuple[str, ...]]],
         dependencies: Optional[Union[str, Tuple[str, ...]]] = None,
         branch_labels: Optional[Union[str, Tuple[str, ...]]] = None,
+        replaces: Optional[Union[str, Tuple[str, ...]]] = None,
     ) -> None:
         if down_revision and revision in util.to_tuple(down_revision):
             raise LoopDetected(revision)
@@ -1576,11 +2447,15 @@ class Revision:
             raise DependencyLoopDetected(revision)
 
         self.verify_rev_id(revision)
-        self.revision = revision
-        self.down_revision = tuple_rev_as_scalar(down_revision)
-        self.dependencies = tuple_rev_as_scalar(dependencies)
+        # identifiers are interned, as each is also referred to by the
+        # revision map and by neighboring revisions
+        self.revision = _intern_rev_id(revision)
+        self.down_revision = tuple_rev_as_scalar(_intern_rev_id(down_revision))
+        self.dependencies = tuple_rev_as_scalar(_intern_rev_id(dependencies))
         self._orig_branch_labels = util.to_tuple(branch_labels, default=())
         self.branch_labels = set(self._orig_branch_labels)
+        self.replaces = util.to_tuple(replaces, default=())
+        self.nextrev = self._all_nextrev = _empty_nextrev
 
     def __repr__(self) -> str:
         args = [repr(self.revision), repr(self.down_revision)]
@@ -1591,10 +2466,25 @@ class Revision:
         return "%s(%s)" % (self.__class__.__name__, ", ".join(args))
 
     def add_nextrev(self, revision: Revision) -> None:
-        self._all_nextrev = self._all_nextrev.union([revision.revision])
+        _all_nextrev = self._all_nextrev.union([revision.revision])
         if self.revision in revision._versioned_down_revisions:
             self.nextrev = self.nextrev.union([revision.revision])
 
+        # the two collections are usually the same; share a single one
+        # in that case
+        if _all_nextrev == self.nextrev:
+            self._all_nextrev = self.nextrev
+        else:
+            self._all_nextrev = _all_nextrev
+
+    def _remove_nextrev(self, revision: Revision) -> None:
+        _all_nextrev = self._all_nextrev.difference([revision.revision])
+        self.nextrev = self.nextrev.difference([revision.revision])
+        if _all_nextrev == self.nextrev:
+            self._all_nextrev = self.nextrev
+        else:
+            self._all_nextrev = _all_nextrev
+
     @property
     def _all_down_revisions(self) -> Tuple[str, ...]:
         return util.dedupe_tuple(
@@ -1675,6 +2565,37 @@ class Revision:
         return len(self._versioned_down_revisions) > 1
 
 
+_empty_nextrev: FrozenSet[str] = frozenset()
+
+
+@overload
+def _intern_rev_id(rev: None) -> None:
+    ...
+
+
+@overload
+def _intern_rev_id(rev: str) -> str:
+    ...
+
+
+@overload
+def _intern_rev_id(
+    rev: Union[str, Tuple[str, ...]]
+) -> Union[str, Tuple[str, ...]]:
+    ...
+
+
+def _intern_rev_id(rev):
+    if type(rev) is str:
+        return sys.intern(rev)
+    elif type(rev) is tuple:
+        return tuple(
+            sys.intern(elem) if type(elem) is str else elem for elem in rev
+        )
+    else:
+        return rev
+
+
 @overload
 def tuple_rev_as_scalar(
     rev: Optional[Sequence[str]],
@@ -60,6 +60,34 @@ version_path_separator = os  # Use os.pathsep. Default configuration used for ne
 # are written from script.py.mako
 # output_encoding = utf-8
 
+# set to 'true' to store the identifiers of each revision file
+# in a persistent index, so that unchanged revision files aren't
+# executed when building the revision graph.  The index is written
+# to revision_cache_path, which defaults to
+# ${script_location}/__pycache__/alembic_revisions.json
+# revision_cache = false
+# revision_cache_path = %(here)s/.alembic_revisions.json
+
+# set to 'true' to read the identifiers of each revision file by
+# parsing its source, executing the revision module only when its
+# upgrade() or downgrade() function is run
+# lazy_load_revisions = false
+
+# number of threads used to read and parse revision files
+# revision_load_workers = 4
+
+# set to 'true' to build the revision map from a bundle of compiled
+# revision files written by the 'compile_versions' command, such as
+# within read-only deployments.  The bundle is written to
+# revision_bundle_path, which defaults to
+# ${script_location}/__pycache__/alembic_versions.bundle
+# revision_bundle = false
+# revision_bundle_path = %(here)s/alembic_versions.bundle
+
+# set to 'true' to compute the ancestors and descendants of every revision
+# once, for long-running processes that upgrade or downgrade many times
+# revision_reachability_index = false
+
 databases = engine1, engine2
 
 [engine1]
@@ -1,6 +1,7 @@
 from .editor import open_in_editor
 from .exc import AutogenerateDiffsDetected
 from .exc import CommandError
+from .exc import MultipleTargetsFailed
 from .langhelpers import _with_legacy_names
 from .langhelpers import asbool
 from .langhelpers import dedupe_tuple
@@ -22,6 +23,7 @@ from .messaging import status
 from .messaging import warn
 from .messaging import write_outstream
 from .pyfiles import coerce_resource_to_filename
+from .pyfiles import load_module_code
 from .pyfiles import load_python_file
 from .pyfiles import pyc_file_from_path
 from .pyfiles import template_to_file
@@ -1,6 +1,16 @@
+from typing import Any
+from typing import List
+
+
 class CommandError(Exception):
     pass
 
 
 class AutogenerateDiffsDetected(CommandError):
     pass
+
+
+class MultipleTargetsFailed(CommandError):
+    def __init__(self, message: str, results: List[Any]) -> None:
+        super().__init__(message)
+        self.results = results
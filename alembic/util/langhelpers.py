@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import collections
 from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
 import textwrap
+import threading
 from typing import Any
 from typing import Callable
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Mapping
 from typing import Optional
@@ -36,6 +40,32 @@ class _ModuleClsMeta(type):
         cls._update_module_proxies(key)  # type: ignore
 
 
+class _ContextLocalProxy:
+    """Stands in for the proxied object of a module, dispatching to
+    the object installed for the current thread or asyncio task.
+
+    """
+
+    def __init__(self, cls: type, default: Any) -> None:
+        self._cls = cls
+        self._var: ContextVar[Any] = ContextVar(
+            "alembic_%s_proxy" % cls.__name__, default=default
+        )
+
+    def _current(self) -> Any:
+        proxy = self._var.get()
+        if proxy is None:
+            raise NameError(
+                "The proxy object has not yet been established for the "
+                "Alembic '%s' class in this thread or task."
+                % self._cls.__name__
+            )
+        return proxy
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._current(), name)
+
+
 class ModuleClsProxy(metaclass=_ModuleClsMeta):
     """Create module level proxy functions for the
     methods on a given class.
@@ -49,26 +79,142 @@ class ModuleClsProxy(metaclass=_ModuleClsMeta):
         lambda: (set(), [])
     )
 
+    _context_local_proxies: Dict[type, _ContextLocalProxy] = {}
+    _context_local_count = 0
+    _context_local_lock = threading.Lock()
+    _context_local_saved: List[Tuple[Dict[str, Any], List[str], Dict]] = []
+
     @classmethod
     def _update_module_proxies(cls, name: str) -> None:
         attr_names, modules = cls._setups[cls]
         for globals_, locals_ in modules:
             cls._add_proxied_attribute(name, globals_, locals_, attr_names)
 
+    @classmethod
+    def _module_proxy_cls(cls) -> type:
+        # a subclass is installed into the modules set up for the
+        # nearest class which has them
+        for proxy_cls in cls.__mro__:
+            if proxy_cls in cls._setups and cls._setups[proxy_cls][1]:
+                return proxy_cls
+        return cls
+
     def _install_proxy(self) -> None:
-        attr_names, modules = self._setups[self.__class__]
+        proxy_cls = self._module_proxy_cls()
+        local_proxy = self._context_local_proxies.get(proxy_cls)
+        if local_proxy is not None:
+            local_proxy._var.set(self)
+            return
+
+        attr_names, modules = self._setups[proxy_cls]
         for globals_, locals_ in modules:
             globals_["_proxy"] = self
             for attr_name in attr_names:
                 globals_[attr_name] = getattr(self, attr_name)
 
     def _remove_proxy(self) -> None:
-        attr_names, modules = self._setups[self.__class__]
+        proxy_cls = self._module_proxy_cls()
+        local_proxy = self._context_local_proxies.get(proxy_cls)
+        if local_proxy is not None:
+            local_proxy._var.set(None)
+            return
+
+        attr_names, modules = self._setups[proxy_cls]
         for globals_, locals_ in modules:
             globals_["_proxy"] = None
             for attr_name in attr_names:
                 del globals_[attr_name]
 
+    @contextmanager
+    def _proxy_installed(self) -> Iterator[None]:
+        """Within the block, install this object as the proxied object,
+        restoring the object installed beforehand, if any, afterwards.
+
+        """
+        proxy_cls = self._module_proxy_cls()
+        local_proxy = self._context_local_proxies.get(proxy_cls)
+        if local_proxy is not None:
+            token = local_proxy._var.set(self)
+            try:
+                yield
+            finally:
+                local_proxy._var.reset(token)
+            return
+
+        attr_names, modules = self._setups[proxy_cls]
+        previous = modules[0][0].get("_proxy") if modules else None
+        self._install_proxy()
+        try:
+            yield
+        finally:
+            if previous is not None:
+                previous._install_proxy()
+            else:
+                self._remove_proxy()
+
+    @classmethod
+    @contextmanager
+    def _proxies_per_context(cls) -> Iterator[None]:
+        """Within the block, install the proxied objects of all classes
+        for the current thread or asyncio task only.
+
+        This allows separate threads or tasks to each run with their
+        own object, such as their own :class:`.EnvironmentContext` as
+        ``alembic.context``.  Attributes which are proxied as module
+        attributes, such as ``context.config``, are looked up through
+        a module level ``__getattr__()`` function within the block.
+        An object which was already installed for the module when the
+        first block begins remains in place for threads and tasks that
+        don't install their own.  Blocks may overlap; the module level
+        proxies are restored once the last block exits.
+
+        """
+        with cls._context_local_lock:
+            if not cls._context_local_count:
+                cls._establish_context_local_proxies()
+            cls._context_local_count += 1
+        try:
+            yield
+        finally:
+            with cls._context_local_lock:
+                cls._context_local_count -= 1
+                if not cls._context_local_count:
+                    cls._restore_module_proxies()
+
+    @classmethod
+    def _establish_context_local_proxies(cls) -> None:
+        for proxy_cls, (attr_names, modules) in list(cls._setups.items()):
+            if not modules:
+                continue
+            local_proxy = _ContextLocalProxy(
+                proxy_cls, modules[0][0].get("_proxy")
+            )
+            cls._context_local_proxies[proxy_cls] = local_proxy
+            names = ["_proxy", "__getattr__"] + list(attr_names)
+            for globals_, locals_ in modules:
+                cls._context_local_saved.append(
+                    (
+                        globals_,
+                        names,
+                        {n: globals_[n] for n in names if n in globals_},
+                    )
+                )
+                for name in names:
+                    globals_.pop(name, None)
+                globals_["_proxy"] = local_proxy
+                globals_["__getattr__"] = _module_getattr(
+                    globals_["__name__"], local_proxy, attr_names
+                )
+
+    @classmethod
+    def _restore_module_proxies(cls) -> None:
+        cls._context_local_proxies.clear()
+        for globals_, names, values in cls._context_local_saved:
+            for name in names:
+                globals_.pop(name, None)
+            globals_.update(values)
+        cls._context_local_saved.clear()
+
     @classmethod
     def create_module_class_proxy(cls, globals_, locals_):
         attr_names, modules = cls._setups[cls]
@@ -182,6 +328,19 @@ class ModuleClsProxy(metaclass=_ModuleClsMeta):
         return lcl[name]
 
 
+def _module_getattr(
+    module_name: str, local_proxy: _ContextLocalProxy, attr_names: set
+) -> Callable[[str], Any]:
+    def __getattr__(name: str) -> Any:
+        if name in attr_names:
+            return getattr(local_proxy, name)
+        raise AttributeError(
+            "module %r has no attribute %r" % (module_name, name)
+        )
+
+    return __getattr__
+
+
 def _with_legacy_names(translations):
     def decorate(fn):
         fn._legacy_translations = translations
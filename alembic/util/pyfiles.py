@@ -8,6 +8,8 @@ import importlib.util
 import os
 import re
 import tempfile
+from types import CodeType
+from types import ModuleType
 from typing import Optional
 
 from mako import exceptions
@@ -108,3 +110,13 @@ def load_module_py(module_id: str, path: str):
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)  # type: ignore
     return module
+
+
+def load_module_code(module_id: str, path: str, code: CodeType) -> ModuleType:
+    """Create a Python module from a code object compiled from the given
+    path."""
+
+    module = ModuleType(module_id)
+    module.__file__ = path
+    exec(code, module.__dict__)
+    return module
@@ -3,10 +3,14 @@ from __future__ import annotations
 import contextlib
 import re
 from typing import Any
+from typing import Collection
+from typing import Dict
 from typing import Iterable
 from typing import Iterator
+from typing import List
 from typing import Mapping
 from typing import Optional
+from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import TypeVar
 from typing import Union
@@ -65,6 +69,11 @@ sqla_14 = _vers >= (1, 4)
 sqla_14_18 = _vers >= (1, 4, 18)
 sqla_14_26 = _vers >= (1, 4, 26)
 sqla_2 = _vers >= (2,)
+# Inspector._get_reflection_info() and the _reflect_info argument of
+# Inspector.reflect_table(), used to reflect many tables at once, are
+# private to SQLAlchemy; they're only used with the releases known to
+# provide them as called here
+sqla_bulk_reflection = sqla_2 and _vers < (2, 2)
 sqlalchemy_version = __version__
 
 try:
@@ -303,7 +312,19 @@ def _columns_for_constraint(constraint):
         return list(constraint.columns)
 
 
-def _reflect_table(inspector: Inspector, table: Table) -> None:
+def _reflect_table(
+    inspector: Inspector, table: Table, reflection_info: Any = None
+) -> None:
+    if reflection_info is not None:
+        # the _reflect_info argument is private to SQLAlchemy; see
+        # _get_reflection_info()
+        try:
+            return inspector.reflect_table(
+                table, None, _reflect_info=reflection_info
+            )
+        except TypeError:
+            pass
+
     if sqla_14:
         return inspector.reflect_table(table, None)
     else:
@@ -312,6 +333,71 @@ def _reflect_table(inspector: Inspector, table: Table) -> None:
         )
 
 
+def _get_reflection_info(
+    inspector: Inspector,
+    schema: Optional[str],
+    table_names: Collection[str],
+    available: Collection[str],
+) -> Optional[Any]:
+    """Reflect the given tables of a schema all at once, using the
+    ``get_multi_*()`` methods of the inspector, for use by
+    :func:`._reflect_table`.
+
+    Returns ``None`` if the version of SQLAlchemy in use reflects
+    tables one at a time.
+
+    """
+    # Inspector._get_reflection_info() is private to SQLAlchemy, being
+    # what MetaData.reflect() uses to reflect many tables at once; there's
+    # no public equivalent which reflects Table objects, so it's only used
+    # with the releases known to provide it, and should its signature
+    # differ, tables are reflected one at a time
+    if not sqla_bulk_reflection or not hasattr(
+        inspector, "_get_reflection_info"
+    ):
+        return None
+
+    from sqlalchemy.engine.reflection import ObjectKind
+    from sqlalchemy.engine.reflection import ObjectScope
+
+    try:
+        return inspector._get_reflection_info(
+            schema,
+            filter_names=list(table_names),
+            available=available,
+            kind=ObjectKind.ANY,
+            scope=ObjectScope.ANY,
+        )
+    except TypeError:
+        return None
+
+
+def _get_multi_reflected(
+    inspector: Inspector,
+    kind: str,
+    schema: Optional[str],
+    table_names: Collection[str],
+) -> Optional[Dict[Tuple[Optional[str], str], List[Dict[str, Any]]]]:
+    """Return the inspector records of the given kind, such as
+    ``"indexes"``, for the given tables of a schema all at once, keyed on
+    ``(schema, table_name)``, using the corresponding ``get_multi_*()``
+    method of the inspector.
+
+    Returns ``None`` if the version of SQLAlchemy in use or the dialect
+    reflects them one table at a time.
+
+    """
+    if not sqla_2:
+        return None
+
+    try:
+        return getattr(inspector, "get_multi_%s" % kind)(
+            schema=schema, filter_names=list(table_names)
+        )
+    except NotImplementedError:
+        return None
+
+
 def _resolve_for_variant(type_, dialect):
     if _type_has_variants(type_):
         base_type, mapping = _get_variant_mapping(type_)
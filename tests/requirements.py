@@ -421,6 +421,26 @@ class DefaultRequirements(SuiteRequirements):
 
         return imports + version + sqlalchemy
 
+    @property
+    def aiosqlite(self):
+        def requirements():
+            try:
+                import aiosqlite  # noqa
+                import greenlet  # noqa
+
+                return False
+            except ImportError:
+                return True
+
+        imports = exclusions.skip_if(
+            requirements, "aiosqlite and greenlet are required for this test"
+        )
+        sqlalchemy = exclusions.only_if(
+            lambda _: sqla_compat.sqla_14_18, "sqlalchemy 1.4.18 is required"
+        )
+
+        return imports + sqlalchemy
+
     @property
     def reflect_indexes_with_expressions(self):
         sqlalchemy = exclusions.only_if(
@@ -0,0 +1,238 @@
+import asyncio
+import io
+import os
+
+from sqlalchemy import text
+
+from alembic import util
+from alembic.runtime.environment import AsyncEnvironmentContext
+from alembic.runtime.migration import AsyncMigrationContext
+from alembic.script import ScriptDirectory
+from alembic.testing import assert_raises
+from alembic.testing import eq_
+from alembic.testing import expect_raises_message
+from alembic.testing.env import _get_staging_directory
+from alembic.testing.env import _sqlite_testing_config
+from alembic.testing.env import clear_staging_env
+from alembic.testing.env import staging_env
+from alembic.testing.env import write_script
+from alembic.testing.fixtures import TestBase
+
+
+class _AsyncFixture:
+    __requires__ = ("aiosqlite",)
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.script = script = ScriptDirectory.from_config(self.cfg)
+        self.a = a = util.rev_id()
+        self.b = b = util.rev_id()
+        script.generate_revision(a, None, refresh=True)
+        write_script(
+            script,
+            a,
+            """
+import sqlalchemy as sa
+from alembic import context
+from alembic import op
+
+revision = '%s'
+down_revision = None
+
+
+def upgrade():
+    op.create_table("t1", sa.Column("id", sa.Integer, primary_key=True))
+
+    # each task sees its own context
+    if op.get_context().environment_context is not None:
+        tenant = context.config.attributes.get("tenant")
+        if tenant is not None:
+            op.execute("insert into t1 (id) values (%%d)" %% tenant)
+
+
+def downgrade():
+    op.drop_table("t1")
+"""
+            % a,
+        )
+        script.generate_revision(b, None, refresh=True)
+        write_script(
+            script,
+            b,
+            """
+from sqlalchemy import text
+from alembic import op
+
+revision = '%s'
+down_revision = '%s'
+
+
+async def create_t2(connection):
+    await connection.execute(text("create table t2 (id integer)"))
+
+
+def upgrade():
+    op.run_async(create_t2)
+
+
+def downgrade():
+    op.execute("drop table t2")
+"""
+            % (b, a),
+        )
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _url(self, name="foo.db"):
+        return "sqlite+aiosqlite:///%s" % os.path.join(
+            _get_staging_directory(), "scripts", name
+        )
+
+    def _upgrade_fn(self, destination):
+        def upgrade(rev, context):
+            return self.script._upgrade_revs(destination, rev)
+
+        return upgrade
+
+    def _run(self, coro_fn, url=None):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async def go():
+            engine = create_async_engine(url or self._url())
+            try:
+                async with engine.connect() as connection:
+                    return await coro_fn(connection)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(go())
+
+
+class AsyncMigrationContextTest(_AsyncFixture, TestBase):
+    def test_stamp_and_get_current_heads(self):
+        async def go(connection):
+            context = AsyncMigrationContext.configure(connection)
+            eq_(await context.get_current_heads(), ())
+            eq_(await context.get_current_revision(), None)
+
+            async with context.begin_transaction():
+                await context.stamp(self.script, self.a)
+            eq_(await context.get_current_heads(), (self.a,))
+            eq_(await context.get_current_revision(), self.a)
+
+        self._run(go)
+
+    def test_run_migrations(self):
+        async def go(connection):
+            context = AsyncMigrationContext.configure(
+                connection,
+                opts={"script": self.script, "fn": self._upgrade_fn("head")},
+            )
+            async with context.begin_transaction():
+                await context.run_migrations()
+
+            eq_(await context.get_current_heads(), (self.b,))
+            await context.execute(text("insert into t2 (id) values (5)"))
+            result = await connection.execute(text("select id from t2"))
+            eq_(result.scalars().all(), [5])
+
+        self._run(go)
+
+    def test_transaction_rolled_back(self):
+        async def go(connection):
+            await connection.execute(text("create table t3 (id integer)"))
+            await connection.commit()
+
+            context = AsyncMigrationContext.configure(
+                connection, opts={"transactional_ddl": True}
+            )
+            with expect_raises_message(Exception, "some error"):
+                async with context.begin_transaction():
+                    await context.execute("insert into t3 (id) values (1)")
+                    raise Exception("some error")
+            result = await connection.execute(text("select id from t3"))
+            eq_(result.scalars().all(), [])
+
+        self._run(go)
+
+    def test_offline(self):
+        buf = io.StringIO()
+
+        async def go():
+            context = AsyncMigrationContext.configure(
+                dialect_name="sqlite",
+                opts={
+                    "as_sql": True,
+                    "output_buffer": buf,
+                    "transactional_ddl": True,
+                },
+            )
+            async with context.begin_transaction():
+                await context.execute("select 1")
+
+        asyncio.run(go())
+        eq_(buf.getvalue(), "BEGIN;\n\nselect 1;\n\nCOMMIT;\n\n")
+
+
+class AsyncEnvironmentContextTest(_AsyncFixture, TestBase):
+    def test_run_migrations(self):
+        async def go(connection):
+            async with AsyncEnvironmentContext(
+                self.cfg,
+                self.script,
+                fn=self._upgrade_fn(self.a),
+                destination_rev=self.a,
+            ) as context:
+                context.configure(connection=connection)
+                async with context.begin_transaction():
+                    await context.run_migrations()
+                eq_(await context.get_current_heads(), (self.a,))
+
+                await context.stamp(self.b)
+                eq_(await context.get_current_heads(), (self.b,))
+
+        self._run(go)
+
+    def test_not_configured(self):
+        context = AsyncEnvironmentContext(self.cfg, self.script)
+        assert_raises(Exception, context.get_async_context)
+
+    def test_concurrent_tasks(self):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        urls = [self._url("tenant_%d.db" % i) for i in range(4)]
+
+        async def upgrade(tenant, url):
+            cfg = _sqlite_testing_config()
+            cfg.attributes["tenant"] = tenant
+
+            engine = create_async_engine(url)
+            async with engine.connect() as connection:
+                async with AsyncEnvironmentContext(
+                    cfg, self.script, fn=self._upgrade_fn("head")
+                ) as context:
+                    context.configure(connection=connection)
+                    async with context.begin_transaction():
+                        await context.run_migrations()
+                    heads = await context.get_current_heads()
+                result = await connection.execute(text("select id from t1"))
+                ids = result.scalars().all()
+            await engine.dispose()
+            return heads, ids
+
+        async def go():
+            return await asyncio.gather(
+                *[upgrade(tenant, url) for tenant, url in enumerate(urls)]
+            )
+
+        eq_(
+            asyncio.run(go()),
+            [((self.b,), [tenant]) for tenant in range(len(urls))],
+        )
+
+        # the module level proxies are restored
+        from alembic import context
+
+        assert_raises(AttributeError, getattr, context, "config")
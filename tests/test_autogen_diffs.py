@@ -1,13 +1,18 @@
+import os
+import threading
+
 from sqlalchemy import BIGINT
 from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
 from sqlalchemy import CHAR
 from sqlalchemy import CheckConstraint
 from sqlalchemy import Column
+from sqlalchemy import create_engine
 from sqlalchemy import DATE
 from sqlalchemy import DateTime
 from sqlalchemy import DECIMAL
 from sqlalchemy import Enum
+from sqlalchemy import event
 from sqlalchemy import FLOAT
 from sqlalchemy import ForeignKey
 from sqlalchemy import ForeignKeyConstraint
@@ -18,8 +23,10 @@ from sqlalchemy import INTEGER
 from sqlalchemy import Integer
 from sqlalchemy import JSON
 from sqlalchemy import LargeBinary
+from sqlalchemy import literal_column
 from sqlalchemy import MetaData
 from sqlalchemy import Numeric
+from sqlalchemy import pool
 from sqlalchemy import PrimaryKeyConstraint
 from sqlalchemy import SmallInteger
 from sqlalchemy import String
@@ -39,16 +46,21 @@ from sqlalchemy.types import VARBINARY
 from alembic import autogenerate
 from alembic import testing
 from alembic.autogenerate import api
+from alembic.ddl.postgresql import PostgresqlImpl
 from alembic.migration import MigrationContext
 from alembic.operations import ops
 from alembic.testing import assert_raises_message
 from alembic.testing import config
 from alembic.testing import eq_
 from alembic.testing import is_
+from alembic.testing import is_false
 from alembic.testing import is_not_
+from alembic.testing import is_true
 from alembic.testing import mock
 from alembic.testing import schemacompare
 from alembic.testing import TestBase
+from alembic.testing import util
+from alembic.testing.env import _get_staging_directory
 from alembic.testing.env import clear_staging_env
 from alembic.testing.env import staging_env
 from alembic.testing.suite._autogen_fixtures import _default_name_filters
@@ -56,6 +68,7 @@ from alembic.testing.suite._autogen_fixtures import _default_object_filters
 from alembic.testing.suite._autogen_fixtures import AutogenFixtureTest
 from alembic.testing.suite._autogen_fixtures import AutogenTest
 from alembic.util import CommandError
+from alembic.util import sqla_compat
 
 # TODO: we should make an adaptation of CompareMetadataToInspectorTest that is
 #       more well suited towards generic backends (2021-06-10)
@@ -315,6 +328,275 @@ class AutogenDefaultSchemaIsNoneTest(AutogenFixtureTest, TestBase):
         eq_(len(diffs), 0)
 
 
+class AutogenBulkReflectionTest(AutogenFixtureTest, TestBase):
+    __requires__ = ("sqlalchemy_2",)
+
+    def _metadata_fixture(self):
+        m1 = MetaData()
+        m2 = MetaData()
+
+        Table("a", m1, Column("id", Integer, primary_key=True))
+        Table(
+            "b",
+            m1,
+            Column("id", Integer, primary_key=True),
+            Column("a_id", Integer, ForeignKey("a.id")),
+            Column("x", String(50)),
+        )
+        Table("c", m1, Column("id", Integer, primary_key=True))
+
+        Table("a", m2, Column("id", Integer, primary_key=True))
+        Table(
+            "b",
+            m2,
+            Column("id", Integer, primary_key=True),
+            Column("a_id", Integer),
+            Column("x", String(50), index=True),
+        )
+        return m1, m2
+
+    def _assert_diffs(self, diffs):
+        eq_(
+            sorted(diff[0] for diff in diffs),
+            ["add_index", "remove_fk", "remove_table"],
+        )
+
+    def test_tables_reflected_at_once(self):
+        m1, m2 = self._metadata_fixture()
+
+        from sqlalchemy.engine.reflection import Inspector
+
+        calls = []
+        depth = [0]
+
+        def record(name):
+            meth = getattr(Inspector, name)
+
+            def go(inspector, schema=None, filter_names=None, **kw):
+                # the get_multi_*() methods are also called from within
+                # _get_reflection_info(); record the outermost calls only
+                if not depth[0]:
+                    calls.append((name, schema, sorted(filter_names)))
+                depth[0] += 1
+                try:
+                    return meth(
+                        inspector, schema, filter_names=filter_names, **kw
+                    )
+                finally:
+                    depth[0] -= 1
+
+            return mock.patch.object(Inspector, name, go)
+
+        with record("_get_reflection_info"), record(
+            "get_multi_indexes"
+        ), record("get_multi_unique_constraints"), record(
+            "get_multi_foreign_keys"
+        ), mock.patch.object(
+            Inspector, "get_indexes", side_effect=AssertionError
+        ), mock.patch.object(
+            Inspector, "get_unique_constraints", side_effect=AssertionError
+        ), mock.patch.object(
+            Inspector, "get_foreign_keys", side_effect=AssertionError
+        ):
+            diffs = self._fixture(m1, m2)
+
+        self._assert_diffs(diffs)
+        eq_(
+            calls,
+            [
+                (name, None, ["a", "b", "c"])
+                for name in (
+                    "_get_reflection_info",
+                    "get_multi_indexes",
+                    "get_multi_unique_constraints",
+                    "get_multi_foreign_keys",
+                )
+            ],
+        )
+
+    def test_per_table_fallback(self):
+        m1, m2 = self._metadata_fixture()
+
+        with mock.patch(
+            "alembic.util.sqla_compat._get_reflection_info",
+            return_value=None,
+        ), mock.patch(
+            "alembic.util.sqla_compat._get_multi_reflected",
+            return_value=None,
+        ):
+            diffs = self._fixture(m1, m2)
+
+        self._assert_diffs(diffs)
+
+    def test_private_reflection_info_signature_changed(self):
+        # a release of SQLAlchemy whose private _get_reflection_info() or
+        # reflect_table(_reflect_info) differ falls back to reflecting
+        # tables one at a time
+        m1, m2 = self._metadata_fixture()
+
+        from sqlalchemy.engine.reflection import Inspector
+
+        reflect_table = Inspector.reflect_table
+        calls = []
+
+        def go(inspector, table, *arg, **kw):
+            # SQLAlchemy passes _reflect_info itself when reflecting
+            # referred tables; fail the calls made by alembic only
+            if "_reflect_info" in kw and len(arg) == 1:
+                calls.append(table.name)
+                raise TypeError("unexpected keyword argument")
+            return reflect_table(inspector, table, *arg, **kw)
+
+        with mock.patch.object(Inspector, "reflect_table", go):
+            diffs = self._fixture(m1, m2)
+        self._assert_diffs(diffs)
+        assert calls
+
+        get_reflection_info = Inspector._get_reflection_info
+
+        def get(inspector, schema, **kw):
+            # called by alembic with the tables available, and by
+            # reflect_table() without
+            if "available" in kw:
+                raise TypeError("unexpected keyword argument 'available'")
+            return get_reflection_info(inspector, schema, **kw)
+
+        with mock.patch.object(Inspector, "_get_reflection_info", get):
+            diffs = self._fixture(m1, m2)
+        self._assert_diffs(diffs)
+
+    def test_private_reflection_info_version(self):
+        inspector = mock.Mock()
+        with mock.patch.object(sqla_compat, "sqla_bulk_reflection", False):
+            is_(
+                sqla_compat._get_reflection_info(
+                    inspector, None, ["a"], ["a"]
+                ),
+                None,
+            )
+        eq_(inspector.mock_calls, [])
+
+    def test_private_reflection_info_not_present(self):
+        # Inspector._get_reflection_info() is private to SQLAlchemy; tables
+        # are reflected one at a time without it
+        inspector = mock.Mock(spec=["get_multi_indexes"])
+        is_(
+            sqla_compat._get_reflection_info(inspector, None, ["a"], ["a"]),
+            None,
+        )
+
+
+class AutogenCompareWorkersTest(AutogenFixtureTest, TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        staging_env()
+        self.bind = util.testing_engine(
+            url="sqlite:///%s"
+            % os.path.join(_get_staging_directory(), "compare.db")
+        )
+
+    def tearDown(self):
+        super().tearDown()
+        self.bind.dispose()
+
+    def _metadata_fixture(self):
+        m1 = MetaData()
+        m2 = MetaData()
+
+        for i in range(6):
+            Table(
+                "t%d" % i,
+                m1,
+                Column("id", Integer, primary_key=True),
+                Column("x", String(50)),
+            )
+            Table(
+                "t%d" % i,
+                m2,
+                Column("id", Integer, primary_key=True),
+                Column("x", String(50 + i % 2)),
+                Column("y%d" % i, Integer),
+            )
+        return m1, m2
+
+    def test_same_diffs_as_serial(self):
+        m1, m2 = self._metadata_fixture()
+        serial = self._fixture(m1, m2)
+
+        threads = set()
+
+        def include_object(object_, name, type_, reflected, compare_to):
+            if type_ == "table":
+                threads.add(threading.current_thread())
+            return True
+
+        concurrent = self._fixture(
+            m1,
+            m2,
+            opts={"compare_workers": 3},
+            object_filters=include_object,
+        )
+
+        eq_(len(serial), 9)
+        eq_(repr(concurrent), repr(serial))
+        assert threads
+        assert threading.current_thread() not in threads
+
+    def _assert_compared_serially(self, bind, configure):
+        m1, m2 = self._metadata_fixture()
+        m1.create_all(bind)
+        with bind.connect() as conn:
+            configure(conn)
+            context = MigrationContext.configure(
+                connection=conn,
+                opts={"compare_type": True, "compare_workers": 3},
+            )
+            with mock.patch(
+                "alembic.autogenerate.compare._compare_tables_concurrently"
+            ) as concurrently:
+                diffs = autogenerate.compare_metadata(context, m2)
+        eq_(concurrently.mock_calls, [])
+        eq_(len(diffs), 9)
+
+    def test_serial_in_external_transaction(self):
+        self._assert_compared_serially(self.bind, lambda conn: conn.begin())
+
+    def test_serial_with_execution_options(self):
+        self._assert_compared_serially(
+            self.bind,
+            lambda conn: conn.execution_options(
+                schema_translate_map={None: None}
+            ),
+        )
+
+    @testing.combinations(pool.StaticPool, pool.SingletonThreadPool)
+    def test_serial_with_shared_connection_pool(self, poolclass):
+        bind = create_engine("sqlite://", poolclass=poolclass)
+        try:
+            self._assert_compared_serially(bind, lambda conn: None)
+        finally:
+            bind.dispose()
+
+    def test_error_raised(self):
+        m1, m2 = self._metadata_fixture()
+
+        def include_object(object_, name, type_, reflected, compare_to):
+            if name == "t4":
+                raise Exception("t4 failed")
+            return True
+
+        assert_raises_message(
+            Exception,
+            "t4 failed",
+            self._fixture,
+            m1,
+            m2,
+            opts={"compare_workers": 3},
+            object_filters=include_object,
+        )
+
+
 class ModelOne:
     __requires__ = ("unique_constraint_reflection",)
 
@@ -968,6 +1250,148 @@ class CompareServerDefaultTest(TestBase):
         assert not diff
 
 
+class DeferredServerDefaultCompareTest(TestBase):
+    """Server default comparisons which are made by the server, as on
+    PostgreSQL, are evaluated together once all tables are compared."""
+
+    __only_on__ = "sqlite"
+
+    @testing.fixture()
+    def connection(self):
+        with config.db.begin() as conn:
+            yield conn
+
+    @testing.fixture()
+    def metadata(self, connection):
+        m = MetaData()
+        yield m
+        m.drop_all(connection)
+
+    def _server_default_comparison(
+        self,
+        inspector_column,
+        metadata_column,
+        rendered_metadata_default,
+        rendered_inspector_default,
+    ):
+        if rendered_inspector_default == rendered_metadata_default:
+            return False
+        return literal_column(rendered_inspector_default) == literal_column(
+            rendered_metadata_default
+        )
+
+    def test_evaluated_in_one_select(self, connection, metadata):
+        for name in ("t1", "t2", "t3"):
+            Table(
+                name,
+                metadata,
+                Column("x", Integer, server_default=text("1 + 1")),
+                Column("y", Integer, server_default=text("3")),
+            )
+        metadata.create_all(connection)
+
+        new_metadata = MetaData()
+        for name in ("t1", "t2", "t3"):
+            Table(
+                name,
+                new_metadata,
+                Column("x", Integer, server_default=text("2")),
+                Column(
+                    "y",
+                    Integer,
+                    server_default=text("4" if name == "t2" else "3"),
+                ),
+            )
+
+        statements = []
+
+        @event.listens_for(connection, "before_cursor_execute")
+        def before_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            if "sqlite_" not in statement and "PRAGMA" not in statement:
+                statements.append(statement)
+
+        mc = MigrationContext.configure(
+            connection, opts={"compare_server_default": True}
+        )
+        with mock.patch.object(
+            type(mc.impl),
+            "_server_default_comparison",
+            lambda impl, *arg: self._server_default_comparison(*arg),
+        ):
+            diffs = api.compare_metadata(mc, new_metadata)
+
+        eq_(len(diffs), 1)
+        eq_(diffs[0][0][0], "modify_default")
+        eq_(diffs[0][0][2:4], ("t2", "y"))
+
+        # the distinct comparisons "1 + 1 = 2" and "3 = 4" are made by a
+        # single SELECT
+        eq_(len(statements), 1)
+        eq_(statements[0].count("="), 2)
+
+    def test_compare_server_default_not_deferred(self, connection, metadata):
+        t1 = Table(
+            "t1", metadata, Column("x", Integer, server_default=text("1 + 1"))
+        )
+        t1.create(connection)
+
+        mc = MigrationContext.configure(
+            connection, opts={"compare_server_default": True}
+        )
+        insp_col = Column("x", Integer, server_default=text("1 + 1"))
+        metadata_col = Column("x", Integer, server_default=text("2"))
+
+        # outside of a comparison of tables, the defaults are compared
+        # immediately using compare_server_default()
+        with mock.patch.object(
+            type(mc.impl),
+            "_server_default_comparison",
+            lambda impl, *arg: self._server_default_comparison(*arg),
+        ):
+            op = ops.AlterColumnOp("t1", "x")
+            autogenerate.compare._compare_server_default(
+                api.AutogenContext(mc),
+                op,
+                None,
+                "t1",
+                "x",
+                insp_col,
+                metadata_col,
+            )
+        is_(op.modify_server_default, metadata_col.server_default)
+
+    def test_subclass_compare_server_default_not_deferred(self):
+        compared = []
+
+        class MyImpl(PostgresqlImpl):
+            def compare_server_default(self, *arg):
+                compared.append(arg[2:])
+                return False
+
+        mc = MigrationContext.configure(
+            dialect_name="postgresql",
+            opts={"compare_server_default": True},
+        )
+        is_true(mc.impl._defers_server_default_comparison())
+
+        # an impl overriding compare_server_default() is always asked to
+        # compare the defaults itself
+        mc.impl = MyImpl(mc.dialect, None, False, True, None, {})
+        is_false(mc.impl._defers_server_default_comparison())
+        is_false(
+            mc._compare_server_default(
+                Column("x", Integer, server_default=text("1 + 1")),
+                Column("x", Integer, server_default=text("2")),
+                "2",
+                "1 + 1",
+                defer=True,
+            )
+        )
+        eq_(compared, [("2", "1 + 1")])
+
+
 class CompareMetadataToInspectorTest(TestBase):
     __backend__ = True
 
@@ -0,0 +1,258 @@
+import json
+import os
+import textwrap
+
+from sqlalchemy import Column
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import String
+from sqlalchemy import Table
+
+from alembic import autogenerate
+from alembic import command
+from alembic.autogenerate.fingerprint import fingerprints_path
+from alembic.autogenerate.fingerprint import load_fingerprints
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from alembic.testing import eq_
+from alembic.testing import ne_
+from alembic.testing import TestBase
+from alembic.testing.env import _get_staging_directory
+from alembic.testing.env import _sqlite_file_db
+from alembic.testing.env import _sqlite_testing_config
+from alembic.testing.env import clear_staging_env
+from alembic.testing.env import env_file_fixture
+from alembic.testing.env import staging_env
+
+
+def _user_table(metadata, name_length=50, index=False):
+    return Table(
+        "user",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", String(name_length)),
+        *([Index("ix_user_name", "name")] if index else []),
+    )
+
+
+class TableFingerprintsTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        staging_env()
+        self.bind = _sqlite_file_db()
+
+    def tearDown(self):
+        self.bind.dispose()
+        clear_staging_env()
+
+    def _fingerprints(self, metadata):
+        context = MigrationContext.configure(dialect_name="sqlite")
+        return autogenerate.table_fingerprints(context, metadata)
+
+    def test_fingerprint_stable(self):
+        m1 = MetaData()
+        m2 = MetaData()
+        _user_table(m1)
+        _user_table(m2)
+
+        fingerprints = self._fingerprints(m1)
+        eq_(list(fingerprints), ["user"])
+        eq_(fingerprints, self._fingerprints(m2))
+
+    def test_fingerprint_changes(self):
+        m1 = MetaData()
+        m2 = MetaData()
+        m3 = MetaData()
+        _user_table(m1)
+        _user_table(m2, name_length=60)
+        _user_table(m3, index=True)
+
+        ne_(self._fingerprints(m1), self._fingerprints(m2))
+        ne_(self._fingerprints(m1), self._fingerprints(m3))
+
+    def test_schema_key(self):
+        m1 = MetaData()
+        Table("t", m1, Column("id", Integer), schema="s1")
+        eq_(list(self._fingerprints(m1)), ["s1.t"])
+
+    def test_unchanged_tables_skipped(self):
+        m1 = MetaData()
+        _user_table(m1, name_length=60)
+        Table(
+            "address",
+            m1,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer, ForeignKey("user.id")),
+        )
+        Table("extra", m1, Column("x", Integer))
+        m1.create_all(self.bind)
+
+        m2 = MetaData()
+        _user_table(m2)
+        Table(
+            "address",
+            m2,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer, ForeignKey("user.id")),
+            Column("email", String(50)),
+        )
+        Table("item", m2, Column("id", Integer, primary_key=True))
+        fingerprints = self._fingerprints(m2)
+
+        with self.bind.connect() as conn:
+            context = MigrationContext.configure(
+                connection=conn, opts={"compare_type": True}
+            )
+            eq_(
+                sorted(
+                    diff[0][0] if isinstance(diff, list) else diff[0]
+                    for diff in autogenerate.compare_metadata(context, m2)
+                ),
+                ["add_column", "add_table", "modify_type", "remove_table"],
+            )
+
+            # the "user" table differs from the database, however its
+            # fingerprint is unchanged, so it isn't compared; "address"
+            # changed, "item" and "extra" are present on one side only
+            del fingerprints["address"]
+            eq_(
+                sorted(
+                    diff[0][0] if isinstance(diff, list) else diff[0]
+                    for diff in autogenerate.compare_metadata(
+                        context, m2, fingerprints=fingerprints
+                    )
+                ),
+                ["add_column", "add_table", "remove_table"],
+            )
+
+
+class FingerprintsCommandTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.bind = _sqlite_file_db()
+        self.compared = self.cfg.attributes["compared"] = []
+
+        env_file_fixture(
+            textwrap.dedent(
+                """\
+            import sqlalchemy as sa
+            from alembic import context
+            from sqlalchemy import engine_from_config
+
+            config = context.config
+
+            target_metadata = sa.MetaData()
+            for name in ("a", "b", "c"):
+                sa.Table(
+                    name,
+                    target_metadata,
+                    sa.Column("id", sa.Integer, primary_key=True),
+                )
+            if config.attributes.get("add_column"):
+                target_metadata.tables["b"].append_column(
+                    sa.Column("data", sa.String(50))
+                )
+
+            def include_object(object_, name, type_, reflected, compare_to):
+                if type_ == "table" and compare_to is not None:
+                    config.attributes["compared"].append(name)
+                return True
+
+            connectable = engine_from_config(
+                config.get_section(config.config_ini_section),
+                prefix="sqlalchemy.",
+            )
+            with connectable.connect() as connection:
+                context.configure(
+                    connection=connection,
+                    target_metadata=target_metadata,
+                    include_object=include_object,
+                    table_fingerprints=True,
+                )
+                with context.begin_transaction():
+                    context.run_migrations()
+            connectable.dispose()
+            """
+            )
+        )
+
+    def tearDown(self):
+        self.bind.dispose()
+        clear_staging_env()
+
+    def test_fingerprints_written(self):
+        script = command.revision(self.cfg, "initial", autogenerate=True)
+
+        path = fingerprints_path(script.path)
+        with open(path) as file_:
+            document = json.load(file_)
+        eq_(document["version"], 1)
+        eq_(sorted(document["fingerprints"]["upgrades"]), ["a", "b", "c"])
+        eq_(
+            os.path.dirname(path),
+            os.path.dirname(os.path.abspath(script.path)),
+        )
+
+        # the fingerprints file isn't taken as a revision
+        eq_(
+            [
+                rev.revision
+                for rev in ScriptDirectory.from_config(
+                    self.cfg
+                ).walk_revisions()
+            ],
+            [script.revision],
+        )
+
+    def test_only_changed_tables_compared(self):
+        command.revision(self.cfg, "initial", autogenerate=True)
+        command.upgrade(self.cfg, "head")
+
+        self.cfg.attributes["add_column"] = True
+        script = command.revision(self.cfg, "add column", autogenerate=True)
+        eq_(self.compared, ["b"])
+        with open(script.path) as file_:
+            assert "op.add_column('b'" in file_.read()
+
+        command.upgrade(self.cfg, "head")
+        del self.compared[:]
+        command.revision(self.cfg, "no changes", autogenerate=True)
+        eq_(self.compared, [])
+
+    def test_all_tables_compared_without_fingerprints(self):
+        script = command.revision(self.cfg, "initial", autogenerate=True)
+        command.upgrade(self.cfg, "head")
+        os.remove(fingerprints_path(script.path))
+
+        command.revision(self.cfg, "no changes", autogenerate=True)
+        eq_(sorted(self.compared), ["a", "b", "c"])
+
+    def test_load_fingerprints_merges_heads(self):
+        staging = _get_staging_directory()
+        p1 = os.path.join(staging, "one.fingerprints.json")
+        p2 = os.path.join(staging, "two.fingerprints.json")
+        for path, fingerprints in [
+            (p1, {"a": "1", "b": "2"}),
+            (p2, {"a": "1", "b": "3"}),
+        ]:
+            with open(path, "w") as file_:
+                json.dump(
+                    {"version": 1, "fingerprints": {"upgrades": fingerprints}},
+                    file_,
+                )
+
+        eq_(load_fingerprints([p1, p2], "upgrades"), {"a": "1"})
+        eq_(load_fingerprints([p1], "other_upgrades"), None)
+        eq_(
+            load_fingerprints(
+                [p1, os.path.join(staging, "missing.json")], "upgrades"
+            ),
+            None,
+        )
+        eq_(load_fingerprints([], "upgrades"), None)
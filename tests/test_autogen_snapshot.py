@@ -0,0 +1,471 @@
+from argparse import Namespace
+import json
+import os
+import textwrap
+
+from sqlalchemy import CheckConstraint
+from sqlalchemy import Column
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import Numeric
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import Text
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.types import NullType
+from sqlalchemy.types import VARCHAR
+
+from alembic import autogenerate
+from alembic import command
+from alembic import testing
+from alembic import util
+from alembic.autogenerate import api
+from alembic.autogenerate.snapshot import _encode
+from alembic.autogenerate.snapshot import SnapshotInspector
+from alembic.autogenerate.snapshot import write_snapshot
+from alembic.migration import MigrationContext
+from alembic.operations import ops
+from alembic.script import ScriptDirectory
+from alembic.testing import assert_raises_message
+from alembic.testing import eq_
+from alembic.testing import expect_warnings
+from alembic.testing import is_
+from alembic.testing import mock
+from alembic.testing import TestBase
+from alembic.testing.env import _get_staging_directory
+from alembic.testing.env import _sqlite_file_db
+from alembic.testing.env import _sqlite_testing_config
+from alembic.testing.env import clear_staging_env
+from alembic.testing.env import env_file_fixture
+from alembic.testing.env import staging_env
+from alembic.testing.env import write_script
+from alembic.testing.fixtures import capture_context_buffer
+
+
+class SnapshotCompareTest(TestBase):
+    __requires__ = ("sqlalchemy_2",)
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        staging_env()
+        self.bind = _sqlite_file_db()
+        self.path = os.path.join(_get_staging_directory(), "snapshot.json")
+
+    def tearDown(self):
+        self.bind.dispose()
+        clear_staging_env()
+
+    def _metadata_fixture(self):
+        m1 = MetaData()
+        m2 = MetaData()
+
+        Table(
+            "user",
+            m1,
+            Column("id", Integer, primary_key=True),
+            Column("name", String(50), nullable=False),
+            Column("a1", Text, server_default="x"),
+            UniqueConstraint("name", name="uq_user_name"),
+        )
+        Table(
+            "address",
+            m1,
+            Column("id", Integer, primary_key=True),
+            Column("email_address", String(100), nullable=False),
+            Column("user_id", Integer, ForeignKey("user.id")),
+            Index("ix_address_email", "email_address"),
+        )
+        Table(
+            "order",
+            m1,
+            Column("order_id", Integer, primary_key=True),
+            Column("amount", Numeric(8, 2), nullable=False),
+            CheckConstraint("amount >= 0", name="ck_order_amount"),
+        )
+        Table("extra", m1, Column("x", Integer))
+
+        Table(
+            "user",
+            m2,
+            Column("id", Integer, primary_key=True),
+            Column("name", String(60), nullable=False),
+            Column("a1", Text, server_default="x"),
+            Column("pw", String(50)),
+        )
+        Table(
+            "address",
+            m2,
+            Column("id", Integer, primary_key=True),
+            Column("email_address", String(100), nullable=True),
+            Column("user_id", Integer, ForeignKey("user.id")),
+            Index("ix_address_email", "email_address", unique=True),
+        )
+        Table(
+            "order",
+            m2,
+            Column("order_id", Integer, primary_key=True),
+            Column("amount", Numeric(10, 2), nullable=False),
+            CheckConstraint("amount >= 0", name="ck_order_amount"),
+        )
+        Table("item", m2, Column("id", Integer, primary_key=True))
+
+        m1.create_all(self.bind)
+        return m2
+
+    def _diffs(self, connection, metadata, **opts):
+        context = MigrationContext.configure(
+            connection=connection,
+            dialect_name="sqlite" if connection is None else None,
+            opts=dict(compare_type=True, compare_server_default=True, **opts),
+        )
+        autogen_context = api.AutogenContext(context, metadata)
+        upgrade_ops = ops.UpgradeOps(ops=[])
+        autogenerate._produce_net_changes(autogen_context, upgrade_ops)
+        return upgrade_ops.as_diffs()
+
+    def test_same_diffs_as_database(self):
+        metadata = self._metadata_fixture()
+
+        with self.bind.connect() as conn:
+            expected = self._diffs(conn, metadata)
+            write_snapshot(conn, self.path)
+
+        diffs = self._diffs(None, metadata, schema_snapshot=self.path)
+        eq_(
+            sorted(
+                diff[0][0] if isinstance(diff, list) else diff[0]
+                for diff in expected
+            ),
+            [
+                "add_column",
+                "add_index",
+                "add_table",
+                "modify_nullable",
+                "modify_type",
+                "modify_type",
+                "remove_constraint",
+                "remove_index",
+                "remove_table",
+            ],
+        )
+        eq_(repr(diffs), repr(expected))
+
+    def test_snapshot_contents(self):
+        self._metadata_fixture()
+
+        with self.bind.connect() as conn:
+            write_snapshot(conn, self.path, heads=["abc"])
+
+        with open(self.path) as file_:
+            snapshot = json.load(file_)
+        eq_(snapshot["dialect"], "sqlite")
+        eq_(snapshot["heads"], ["abc"])
+        eq_(
+            [table["name"] for table in snapshot["tables"]],
+            ["address", "extra", "order", "user"],
+        )
+        user = snapshot["tables"][3]
+        eq_(
+            [(col["name"], col["type"]) for col in user["columns"]],
+            [
+                ("id", {"__type__": "INTEGER"}),
+                ("name", {"__type__": "VARCHAR", "kwargs": {"length": 50}}),
+                ("a1", {"__type__": "TEXT"}),
+            ],
+        )
+        eq_(
+            user["unique_constraints"],
+            [{"column_names": ["name"], "name": "uq_user_name"}],
+        )
+
+    def test_reflect_table_as_database(self):
+        self._metadata_fixture()
+
+        with self.bind.connect() as conn:
+            write_snapshot(conn, self.path)
+            expected = MetaData()
+            Table("address", expected, autoload_with=conn)
+
+        with open(self.path) as file_:
+            inspector = SnapshotInspector(json.load(file_), sqlite.dialect())
+        reflected = MetaData()
+        inspector.reflect_table(Table("address", reflected), None)
+
+        # the table referred to by the foreign key is reflected too
+        eq_(sorted(reflected.tables), ["address", "user"])
+        for name in ("address", "user"):
+            eq_(
+                str(CreateTable(reflected.tables[name])),
+                str(CreateTable(expected.tables[name])),
+            )
+            eq_(
+                [
+                    (index.name, [col.name for col in index.columns])
+                    for index in reflected.tables[name].indexes
+                ],
+                [
+                    (index.name, [col.name for col in index.columns])
+                    for index in expected.tables[name].indexes
+                ],
+            )
+
+    def test_tmp_file_removed_on_failure(self):
+        self._metadata_fixture()
+
+        with self.bind.connect() as conn, mock.patch(
+            "alembic.autogenerate.snapshot.json.dump",
+            side_effect=ValueError("can't serialize"),
+        ):
+            assert_raises_message(
+                ValueError,
+                "can't serialize",
+                write_snapshot,
+                conn,
+                self.path,
+            )
+        assert not os.path.exists(self.path)
+        assert not os.path.exists("%s.tmp" % self.path)
+
+    @testing.combinations(
+        (postgresql.TIMESTAMP(timezone=True),),
+        (postgresql.ARRAY(postgresql.INTEGER(), dimensions=2),),
+        (postgresql.ENUM("a", "b", name="my_enum"),),
+        (Numeric(10, 2),),
+        (String(30, collation="C"),),
+        argnames="type_",
+    )
+    def test_type_round_trip(self, type_):
+        encoded = json.loads(json.dumps(_encode(type_)))
+        inspector = SnapshotInspector(
+            {"dialect": "postgresql", "tables": []}, postgresql.dialect()
+        )
+        restored = inspector._decode(encoded)
+        is_(type(restored), type(type_))
+        eq_(repr(restored), repr(type_))
+
+    def test_type_not_evaluated(self):
+        inspector = SnapshotInspector(
+            {"dialect": "sqlite", "tables": []}, sqlite.dialect()
+        )
+        for encoded in [
+            {"__type__": "__import__", "args": ["os"]},
+            {"__type__": "sa.__builtins__['__import__']('os')"},
+            {"__type__": "Column"},
+        ]:
+            with expect_warnings("Couldn't restore type"):
+                is_(type(inspector._decode(encoded)), NullType)
+
+        # only the dialect modules of SQLAlchemy are looked in
+        is_(
+            type(inspector._decode({"__type__": "VARCHAR", "dialect": "os"})),
+            VARCHAR,
+        )
+
+    def test_snapshot_missing(self):
+        context = MigrationContext.configure(
+            dialect_name="sqlite", opts={"schema_snapshot": self.path}
+        )
+        assert_raises_message(
+            util.CommandError,
+            "Schema snapshot .*snapshot.json doesn't exist",
+            context.get_current_heads,
+        )
+
+    def test_snapshot_wrong_dialect(self):
+        with self.bind.connect() as conn:
+            write_snapshot(conn, self.path)
+
+        context = MigrationContext.configure(
+            dialect_name="postgresql", opts={"schema_snapshot": self.path}
+        )
+        autogen_context = api.AutogenContext(context, MetaData())
+        assert_raises_message(
+            util.CommandError,
+            "Schema snapshot was written for dialect 'sqlite'; "
+            "the 'postgresql' dialect is in use",
+            getattr,
+            autogen_context,
+            "inspector",
+        )
+
+
+class SnapshotCommandTest(TestBase):
+    __requires__ = ("sqlalchemy_2",)
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.path = os.path.join(_get_staging_directory(), "snapshot.json")
+        self.cfg.attributes["snapshot_path"] = self.path
+        self.bind = _sqlite_file_db()
+
+        env_file_fixture(
+            textwrap.dedent(
+                """\
+            import sqlalchemy as sa
+            from alembic import context
+            from sqlalchemy import engine_from_config
+
+            config = context.config
+
+            target_metadata = sa.MetaData()
+            sa.Table(
+                "t",
+                target_metadata,
+                sa.Column("id", sa.Integer, primary_key=True),
+                sa.Column("data", sa.String(50)),
+            )
+            if config.attributes.get("add_column"):
+                target_metadata.tables["t"].append_column(
+                    sa.Column("extra", sa.Integer)
+                )
+
+            snapshot = config.attributes["snapshot_path"]
+
+            if context.get_x_argument(as_dictionary=True).get("snapshot"):
+                context.configure(
+                    dialect_name="sqlite",
+                    target_metadata=target_metadata,
+                    schema_snapshot=snapshot,
+                )
+                with context.begin_transaction():
+                    context.run_migrations()
+            else:
+                connectable = engine_from_config(
+                    config.get_section(config.config_ini_section),
+                    prefix="sqlalchemy.",
+                )
+                with connectable.connect() as connection:
+                    if config.attributes.get("external_transaction"):
+                        connection.begin()
+                    context.configure(
+                        connection=connection,
+                        target_metadata=target_metadata,
+                        schema_snapshot=snapshot,
+                        transactional_ddl=config.attributes.get(
+                            "transactional_ddl"
+                        ),
+                    )
+                    with context.begin_transaction():
+                        context.run_migrations()
+                        if config.attributes.get("fail"):
+                            raise Exception("migrations failed")
+                    if config.attributes.get("external_transaction"):
+                        connection.commit()
+                connectable.dispose()
+            """
+            )
+        )
+        self.a = a = util.rev_id()
+        script = ScriptDirectory.from_config(self.cfg)
+        script.generate_revision(a, None, refresh=True)
+        write_script(
+            script,
+            a,
+            f"""\
+import sqlalchemy as sa
+from alembic import op
+
+revision = {a!r}
+down_revision = None
+
+
+def upgrade():
+    op.create_table(
+        "t",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("data", sa.String(50)),
+    )
+
+
+def downgrade():
+    op.drop_table("t")
+""",
+        )
+
+    def tearDown(self):
+        self.bind.dispose()
+        clear_staging_env()
+
+    def test_upgrade_writes_snapshot(self):
+        command.upgrade(self.cfg, "head")
+
+        with open(self.path) as file_:
+            snapshot = json.load(file_)
+        eq_(snapshot["heads"], [self.a])
+        eq_(
+            sorted(table["name"] for table in snapshot["tables"]),
+            ["alembic_version", "t"],
+        )
+
+    def test_snapshot_written_after_commit(self):
+        self.cfg.attributes["transactional_ddl"] = True
+        command.upgrade(self.cfg, "head")
+
+        with open(self.path) as file_:
+            snapshot = json.load(file_)
+        eq_(snapshot["heads"], [self.a])
+
+    def test_snapshot_not_written_in_external_transaction(self):
+        self.cfg.attributes["external_transaction"] = True
+        with expect_warnings(
+            "Schema snapshot .*snapshot.json not written, as migrations "
+            "were run within a transaction begun outside of "
+            "begin_transaction()"
+        ):
+            command.upgrade(self.cfg, "head")
+
+        assert not os.path.exists(self.path)
+
+    def test_snapshot_not_written_on_rollback(self):
+        self.cfg.attributes["transactional_ddl"] = True
+        self.cfg.attributes["fail"] = True
+        assert_raises_message(
+            Exception,
+            "migrations failed",
+            command.upgrade,
+            self.cfg,
+            "head",
+        )
+        assert not os.path.exists(self.path)
+
+    def test_snapshot_not_written_offline(self):
+        with capture_context_buffer():
+            command.upgrade(self.cfg, "head", sql=True)
+        assert not os.path.exists(self.path)
+
+    def test_check_from_snapshot(self):
+        command.upgrade(self.cfg, "head")
+
+        # the database isn't consulted
+        self.bind.dispose()
+        os.remove(self.bind.url.database)
+
+        self.cfg.cmd_opts = Namespace(x=["snapshot=1"])
+        command.check(self.cfg)
+
+        self.cfg.attributes["add_column"] = True
+        assert_raises_message(
+            util.AutogenerateDiffsDetected,
+            r"New upgrade operations detected: \[\('add_column'",
+            command.check,
+            self.cfg,
+        )
+
+    def test_check_from_snapshot_not_up_to_date(self):
+        command.upgrade(self.cfg, "head")
+        command.downgrade(self.cfg, "base")
+
+        self.cfg.cmd_opts = Namespace(x=["snapshot=1"])
+        assert_raises_message(
+            util.CommandError,
+            "Target database is not up to date.",
+            command.check,
+            self.cfg,
+        )
@@ -3,10 +3,13 @@ import inspect
 from io import BytesIO
 from io import StringIO
 from io import TextIOWrapper
+import json
 import os
 import re
 from typing import cast
 
+from sqlalchemy import create_engine
+from sqlalchemy import event
 from sqlalchemy import exc as sqla_exc
 from sqlalchemy import text
 from sqlalchemy import VARCHAR
@@ -18,10 +21,17 @@ from alembic import command
 from alembic import config
 from alembic import testing
 from alembic import util
+from alembic.autogenerate.fingerprint import fingerprints_path
+from alembic.operations import ops
+from alembic.runtime.environment import EnvironmentContext
+from alembic.runtime.migration import MigrationContext
+from alembic.runtime.migration import StepStatistics
 from alembic.script import ScriptDirectory
 from alembic.testing import assert_raises
 from alembic.testing import assert_raises_message
 from alembic.testing import eq_
+from alembic.testing import expect_raises_message
+from alembic.testing import is_
 from alembic.testing import is_false
 from alembic.testing import is_true
 from alembic.testing import mock
@@ -690,6 +700,46 @@ class _StampTest:
 
         assert not expected, "lines remain"
 
+    @contextmanager
+    def _capture_engine_statements(self):
+        """Capture the statements emitted online, along with their
+        parameters, as the version table statements use bound
+        parameters."""
+
+        statements = []
+
+        def before_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            statements.append((statement, parameters))
+
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            with capture_engine_context_buffer():
+                yield statements
+        finally:
+            event.remove(
+                Engine, "before_cursor_execute", before_cursor_execute
+            )
+
+    def _assert_statements(self, statements, origin, destinations):
+        insert = "INSERT INTO alembic_version (version_num) VALUES (?)"
+        expected = [(insert, ()) for elem in destinations]
+        if origin:
+            expected[0] = (
+                "UPDATE alembic_version SET version_num=? WHERE "
+                "alembic_version.version_num = ?",
+                (origin,),
+            )
+        for statement, parameters in statements:
+            if not expected:
+                assert statement != insert, "additional inserts were emitted"
+            elif (statement, tuple(parameters[1:])) == expected[0]:
+                destinations.remove(parameters[0])
+                expected.pop(0)
+
+        assert not expected, "statements remain"
+
 
 class StampMultipleRootsTest(TestBase, _StampTest):
     def setUp(self):
@@ -760,25 +810,25 @@ class StampMultipleHeadsTest(TestBase, _StampTest):
         self._assert_sql(buf.getvalue(), None, {self.a, self.e, self.f})
 
     def test_online_stamp_multi_rev_nonsensical(self):
-        with capture_engine_context_buffer() as buf:
+        with self._capture_engine_statements() as statements:
             command.stamp(self.cfg, [self.a, self.e, self.f])
 
         # TODO: this shouldn't be possible, because e/f require b as a
         # dependency
-        self._assert_sql(buf.getvalue(), None, {self.a, self.e, self.f})
+        self._assert_statements(statements, None, {self.a, self.e, self.f})
 
     def test_online_stamp_multi_rev_from_real_ancestor(self):
         command.stamp(self.cfg, [self.a])
-        with capture_engine_context_buffer() as buf:
+        with self._capture_engine_statements() as statements:
             command.stamp(self.cfg, [self.e, self.f])
 
-        self._assert_sql(buf.getvalue(), self.a, {self.e, self.f})
+        self._assert_statements(statements, self.a, {self.e, self.f})
 
     def test_online_stamp_version_already_there(self):
         command.stamp(self.cfg, [self.c, self.e])
-        with capture_engine_context_buffer() as buf:
+        with self._capture_engine_statements() as statements:
             command.stamp(self.cfg, [self.c, self.e])
-        self._assert_sql(buf.getvalue(), None, {})
+        self._assert_statements(statements, None, {})
 
     def test_sql_stamp_multi_rev_from_multi_start(self):
         with capture_context_buffer() as buf:
@@ -821,10 +871,10 @@ class StampMultipleHeadsTest(TestBase, _StampTest):
             )
             eq_(result.rowcount, 1)
 
-        with capture_engine_context_buffer() as buf:
+        with self._capture_engine_statements() as statements:
             command.stamp(self.cfg, [self.a, self.e, self.f], purge=True)
 
-        self._assert_sql(buf.getvalue(), None, {self.a, self.e, self.f})
+        self._assert_statements(statements, None, {self.a, self.e, self.f})
 
     def test_stamp_purge_no_sql(self):
         assert_raises_message(
@@ -1031,6 +1081,861 @@ down_revision = '%s'
             )
 
 
+class UpgradeManyTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.stdout = StringIO()
+        self.a = a = util.rev_id()
+        self.b = b = util.rev_id()
+        script = ScriptDirectory.from_config(self.cfg)
+        script.generate_revision(a, None, refresh=True)
+        write_script(
+            script,
+            a,
+            """
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = None
+
+
+def upgrade():
+    op.create_table("t1", sa.Column("id", sa.Integer, primary_key=True))
+
+
+def downgrade():
+    op.drop_table("t1")
+"""
+            % a,
+        )
+        script.generate_revision(b, None, refresh=True)
+        write_script(
+            script,
+            b,
+            """
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = '%s'
+
+
+def upgrade():
+    op.create_table("t2", sa.Column("id", sa.Integer, primary_key=True))
+
+
+def downgrade():
+    op.drop_table("t2")
+"""
+            % (b, a),
+        )
+        self.urls = [
+            "sqlite:///%s"
+            % os.path.join(
+                _get_staging_directory(), "scripts", "tenant_%d.db" % i
+            )
+            for i in range(6)
+        ]
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _assert_heads(self, url, heads, tables):
+        engine = create_engine(url)
+        try:
+            with engine.connect() as conn:
+                context = MigrationContext.configure(conn)
+                eq_(context.get_current_heads(), heads)
+                for table in ("t1", "t2"):
+                    eq_(
+                        _connectable_has_table(conn, table, None),
+                        table in tables,
+                    )
+        finally:
+            engine.dispose()
+
+    @testing.combinations((None,), (1,), (4,), argnames="workers")
+    def test_upgrade_many(self, workers):
+        results = command.upgrade_many(
+            self.cfg, self.urls, "head", workers=workers
+        )
+
+        eq_([result.target for result in results], self.urls)
+        is_true(all(result.success for result in results))
+        for url in self.urls:
+            self._assert_heads(url, (self.b,), ("t1", "t2"))
+
+        eq_(
+            re.sub(r"\(\d+\.\d+s\)", "", self.cfg.stdout.getvalue()),
+            "".join("%s: upgraded \n" % url for url in self.urls),
+        )
+
+        # the main configuration is unchanged
+        eq_(
+            self.cfg.get_main_option("sqlalchemy.url"),
+            "sqlite:///%s/scripts/foo.db" % _get_staging_directory(),
+        )
+
+    @testing.combinations((None,), (4,), argnames="workers")
+    def test_upgrade_many_one_fails(self, workers):
+        engine = create_engine(self.urls[2])
+        with engine.begin() as conn:
+            conn.execute(text("create table t2 (id integer)"))
+        engine.dispose()
+
+        with expect_raises_message(
+            util.MultipleTargetsFailed, "1 of 6 targets failed to upgrade"
+        ) as err:
+            command.upgrade_many(self.cfg, self.urls, "head", workers=workers)
+
+        results = err.error.results
+        eq_(
+            [result.success for result in results],
+            [True, True, False, True, True, True],
+        )
+        assert isinstance(results[2].error, sqla_exc.OperationalError)
+        assert "%s: FAILED" % self.urls[2] in self.cfg.stdout.getvalue()
+
+        # the failed target keeps the steps that ran before the failure,
+        # as SQLite DDL isn't transactional
+        self._assert_heads(self.urls[2], (self.a,), ("t1", "t2"))
+        for url in self.urls[0:2] + self.urls[3:]:
+            self._assert_heads(url, (self.b,), ("t1", "t2"))
+
+    def test_upgrade_many_dict_targets(self):
+        targets = [{"sqlalchemy.url": url} for url in self.urls[0:2]]
+        results = command.upgrade_many(self.cfg, targets, self.a, workers=2)
+
+        eq_(
+            [result.name for result in results],
+            ["sqlalchemy.url=%s" % url for url in self.urls[0:2]],
+        )
+        for url in self.urls[0:2]:
+            self._assert_heads(url, (self.a,), ("t1",))
+
+    def test_upgrade_many_range_not_allowed(self):
+        assert_raises_message(
+            util.CommandError,
+            "Range revision not allowed",
+            command.upgrade_many,
+            self.cfg,
+            self.urls,
+            "%s:%s" % (self.a, self.b),
+        )
+
+    def test_context_proxy_restored(self):
+        command.upgrade_many(self.cfg, self.urls[0:2], "head", workers=2)
+
+        from alembic import context
+
+        script = ScriptDirectory.from_config(self.cfg)
+        with EnvironmentContext(self.cfg, script):
+            is_(context.config, self.cfg)
+        assert_raises(AttributeError, getattr, context, "config")
+
+    def test_upgrade_many_cmd_line(self):
+        commandline = config.CommandLine()
+        options = commandline.parser.parse_args(
+            ["upgrade_many", self.urls[0], self.urls[1], "head"]
+            + ["--workers", "2"]
+        )
+        eq_(options.cmd[0], command.upgrade_many)
+        eq_(options.targets, self.urls[0:2])
+        eq_(options.revision, "head")
+        eq_(options.workers, 2)
+
+
+class UpgradeTimingTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.stdout = StringIO()
+        self.a = a = util.rev_id()
+        self.b = b = util.rev_id()
+        script = ScriptDirectory.from_config(self.cfg)
+        script.generate_revision(a, None, refresh=True)
+        write_script(
+            script,
+            a,
+            """
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = None
+
+
+def upgrade():
+    op.create_table("t1", sa.Column("id", sa.Integer, primary_key=True))
+    op.execute("insert into t1 (id) values (1), (2), (3)")
+
+
+def downgrade():
+    op.drop_table("t1")
+"""
+            % a,
+        )
+        script.generate_revision(b, None, refresh=True)
+        write_script(
+            script,
+            b,
+            """
+from alembic import op
+
+revision = '%s'
+down_revision = '%s'
+
+
+def upgrade():
+    op.execute("update t1 set id = id + 10 where id > 1")
+
+
+def downgrade():
+    op.execute("update t1 set id = id - 10 where id > 11")
+"""
+            % (b, a),
+        )
+        self.log = os.path.join(_get_staging_directory(), "timing.log")
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def test_timing_summary(self):
+        command.upgrade(self.cfg, "head", timing=True)
+
+        lines = self.cfg.stdout.getvalue().splitlines()
+        eq_(
+            lines[0].split(),
+            ["Revision", "Elapsed", "DDL", "DML", "Statements", "Rows"],
+        )
+        eq_(
+            sorted((line.split()[0], line.split()[4:]) for line in lines[1:]),
+            sorted(
+                [
+                    (self.a, ["2", "3"]),
+                    (self.b, ["1", "2"]),
+                    ("Total", ["3", "5"]),
+                ]
+            ),
+        )
+        eq_(lines[-1].split()[0], "Total")
+
+    def test_timing_log(self):
+        command.upgrade(self.cfg, self.a, timing_log=self.log)
+        command.upgrade(self.cfg, "head", timing_log=self.log)
+        eq_(self.cfg.stdout.getvalue(), "")
+
+        with open(self.log) as file_:
+            entries = [json.loads(line) for line in file_]
+        eq_(
+            [
+                (
+                    entry["revision"],
+                    entry["down_revisions"],
+                    entry["is_upgrade"],
+                    entry["statements"],
+                    entry["ddl_statements"],
+                    entry["rows"],
+                )
+                for entry in entries
+            ],
+            [
+                (self.a, [], True, 2, 1, 3),
+                (self.b, [self.a], True, 1, 0, 2),
+            ],
+        )
+        for entry in entries:
+            assert entry["elapsed"] >= entry["ddl_elapsed"]
+
+    def test_no_timing(self):
+        with mock.patch.object(
+            command, "_print_timing_summary"
+        ) as print_summary, mock.patch.object(
+            command, "_write_timing_log"
+        ) as write_log, mock.patch.object(
+            StepStatistics, "_add_ddl"
+        ) as add_ddl, mock.patch.object(
+            StepStatistics, "_add_dml"
+        ) as add_dml:
+            command.upgrade(self.cfg, "head")
+        eq_(print_summary.mock_calls, [])
+        eq_(write_log.mock_calls, [])
+
+        # statements aren't timed when nothing reads the statistics
+        eq_(add_ddl.mock_calls, [])
+        eq_(add_dml.mock_calls, [])
+
+    def test_timing_cmd_line(self):
+        commandline = config.CommandLine()
+        options = commandline.parser.parse_args(
+            ["upgrade", "head", "--timing", "--timing-log", self.log]
+        )
+        eq_(options.cmd[0], command.upgrade)
+        is_true(options.timing)
+        eq_(options.timing_log, self.log)
+
+
+class UpgradePlanTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.bind = _sqlite_file_db()
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.stdout = StringIO()
+        self.a = a = util.rev_id()
+        self.b = b = util.rev_id()
+        self.c = c = util.rev_id()
+        script = ScriptDirectory.from_config(self.cfg)
+        script.generate_revision(a, "create t1", refresh=True)
+        write_script(
+            script,
+            a,
+            """
+"create t1"
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = None
+
+
+def upgrade():
+    op.create_table(
+        "t1",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("data", sa.String(20)),
+    )
+    op.execute("insert into t1 (id, data) values (1, 'a'), (2, 'b')")
+
+
+def downgrade():
+    op.drop_table("t1")
+"""
+            % a,
+        )
+        script.generate_revision(b, "alter t1", refresh=True)
+        write_script(
+            script,
+            b,
+            """
+"alter t1"
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = '%s'
+
+
+def upgrade():
+    op.create_index("ix_t1_data", "t1", ["data"])
+    with op.batch_alter_table("t1") as batch_op:
+        batch_op.alter_column("data", type_=sa.String(50))
+    op.execute("update t1 set data = upper(data)")
+
+
+def downgrade():
+    pass
+"""
+            % (b, a),
+        )
+        script.generate_revision(c, "create t2", refresh=True)
+        write_script(
+            script,
+            c,
+            """
+"create t2"
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = '%s'
+
+
+def upgrade():
+    op.create_table("t2", sa.Column("id", sa.Integer, primary_key=True))
+    op.add_column("t2", sa.Column("data", sa.String(20)))
+    op.create_index("ix_t2_data", "t2", ["data"])
+
+
+def downgrade():
+    pass
+"""
+            % (c, b),
+        )
+        command.upgrade(self.cfg, a)
+
+        # row estimates are read from the statistics ANALYZE collects
+        with self.bind.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _plan(self):
+        with mock.patch.object(command, "_print_plan") as print_plan:
+            command.upgrade(self.cfg, "head", plan=True)
+        eq_(len(print_plan.mock_calls), 1)
+        return print_plan.mock_calls[0][1][1]
+
+    def test_plan(self):
+        step_plans = self._plan()
+        eq_(
+            [
+                (
+                    step_plan.info.up_revision_id,
+                    [
+                        (
+                            planned.name,
+                            planned.table_name,
+                            planned.effect,
+                            planned.recreate,
+                            planned.rows,
+                        )
+                        for planned in step_plan.operations
+                    ],
+                )
+                for step_plan in step_plans
+            ],
+            [
+                (
+                    self.b,
+                    [
+                        ("create_index", "t1", "scan", False, 2),
+                        ("alter_column", "t1", "rewrite", True, 2),
+                        ("execute_sql", None, None, False, None),
+                    ],
+                ),
+                (
+                    self.c,
+                    [
+                        ("create_table", "t2", None, False, None),
+                        ("add_column", "t2", None, False, 0),
+                        ("create_index", "t2", "scan", False, 0),
+                    ],
+                ),
+            ],
+        )
+
+    def test_plan_no_statistics(self):
+        with self.bind.begin() as conn:
+            conn.execute(text("DROP TABLE sqlite_stat1"))
+
+        step_plans = self._plan()
+        eq_(
+            [planned.rows for planned in step_plans[0].operations],
+            [None, None, None],
+        )
+
+    def test_plan_does_not_run(self):
+        command.upgrade(self.cfg, "head", plan=True)
+
+        with self.bind.connect() as conn:
+            context = MigrationContext.configure(conn)
+            eq_(context.get_current_heads(), (self.a,))
+            eq_(
+                conn.execute(text("select data from t1 order by id")).all(),
+                [("a",), ("b",)],
+            )
+            is_false(_connectable_has_table(conn, "t2", None))
+            eq_(
+                conn.execute(
+                    text(
+                        "select name from sqlite_master where name like 'ix%'"
+                    )
+                ).all(),
+                [],
+            )
+
+    def _get_bind_fixture(self):
+        d = util.rev_id()
+        script = ScriptDirectory.from_config(self.cfg)
+        script.generate_revision(d, "delete from t1", refresh=True)
+        write_script(
+            script,
+            d,
+            """
+import sqlalchemy as sa
+from alembic import op
+
+revision = '%s'
+down_revision = '%s'
+
+
+def upgrade():
+    op.get_bind().execute(sa.text("delete from t1"))
+
+
+def downgrade():
+    pass
+"""
+            % (d, self.c),
+        )
+
+    def test_plan_get_bind_rolled_back(self):
+        self._get_bind_fixture()
+        env_file_fixture(
+            """
+from sqlalchemy import engine_from_config
+
+config = context.config
+connectable = engine_from_config(
+    config.get_section(config.config_ini_section), prefix="sqlalchemy."
+)
+with connectable.connect() as connection:
+    context.configure(connection=connection, transactional_ddl=True)
+    with context.begin_transaction():
+        context.run_migrations()
+connectable.dispose()
+"""
+        )
+        command.upgrade(self.cfg, "head", plan=True)
+
+        with self.bind.connect() as conn:
+            eq_(
+                conn.execute(text("select data from t1 order by id")).all(),
+                [("a",), ("b",)],
+            )
+
+    def test_plan_get_bind_refused(self):
+        self._get_bind_fixture()
+        assert_raises_message(
+            util.CommandError,
+            "Can't execute statements using op.get_bind",
+            command.upgrade,
+            self.cfg,
+            "head",
+            plan=True,
+        )
+
+        with self.bind.connect() as conn:
+            eq_(
+                conn.execute(text("select data from t1 order by id")).all(),
+                [("a",), ("b",)],
+            )
+
+    def test_print_plan(self):
+        command.upgrade(self.cfg, "head", plan=True)
+        lines = self.cfg.stdout.getvalue().splitlines()
+        eq_(
+            [line.split() for line in lines],
+            [
+                ["Operation", "Table", "Effect", "Rows", "Size"],
+                ["%s" % self.a, "->", "%s," % self.b, "alter", "t1"],
+                ["create_index", "t1", "scan", "2", "-"],
+                ["alter_column", "t1", "rewrite", "2", "-"],
+                ["execute_sql", "-", "-", "-", "-"],
+                ["%s" % self.b, "->", "%s," % self.c, "create", "t2"],
+                ["create_table", "t2", "-", "-", "-"],
+                ["add_column", "t2", "-", "0", "0", "bytes"],
+                ["create_index", "t2", "scan", "0", "0", "bytes"],
+            ],
+        )
+
+    def test_print_plan_large_table(self):
+        with mock.patch("alembic.runtime.plan.LARGE_TABLE_ROWS", 2):
+            command.upgrade(self.cfg, "head", plan=True)
+        lines = self.cfg.stdout.getvalue().splitlines()
+        eq_(lines[1], "! %s -> %s, alter t1" % (self.a, self.b))
+        eq_(lines[5], "%s -> %s, create t2" % (self.b, self.c))
+        eq_(
+            lines[-1], "1 of 2 steps rewrite or scan large tables: %s" % self.b
+        )
+
+    def test_plan_up_to_date(self):
+        command.upgrade(self.cfg, "head")
+        self.cfg.stdout = StringIO()
+        command.upgrade(self.cfg, "head", plan=True)
+        eq_(self.cfg.stdout.getvalue(), "No migrations to run.\n")
+
+    def test_plan_not_with_sql(self):
+        assert_raises_message(
+            util.CommandError,
+            "--plan can't be combined with --sql",
+            command.upgrade,
+            self.cfg,
+            "head",
+            sql=True,
+            plan=True,
+        )
+
+    @testing.combinations(
+        ("default", ops.AlterColumnOp("t", "c", modify_name="d"), None),
+        (
+            "default",
+            ops.AlterColumnOp("t", "c", modify_type=VARCHAR()),
+            "rewrite",
+        ),
+        (
+            "default",
+            ops.AlterColumnOp("t", "c", modify_nullable=False),
+            "scan",
+        ),
+        ("default", ops.AddColumnOp("t", Column("c", VARCHAR())), None),
+        ("default", ops.CreateIndexOp("ix", "t", ["c"]), "scan"),
+        (
+            "default",
+            ops.CreateForeignKeyOp("fk", "t", "r", ["c"], ["id"]),
+            "scan",
+        ),
+        (
+            "postgresql",
+            ops.CreateIndexOp("ix", "t", ["c"], postgresql_concurrently=True),
+            None,
+        ),
+        ("postgresql", ops.CreateIndexOp("ix", "t", ["c"]), "scan"),
+        (
+            "mysql",
+            ops.AlterColumnOp("t", "c", modify_nullable=True),
+            "rewrite",
+        ),
+        ("mysql", ops.AlterColumnOp("t", "c", modify_name="d"), None),
+        ("mariadb", ops.DropColumnOp("t", "c"), "rewrite"),
+        (
+            "mysql",
+            ops.CreateForeignKeyOp("fk", "t", "r", ["c"], ["id"]),
+            "rewrite",
+        ),
+    )
+    def test_effect(self, dialect, operation, effect):
+        from alembic.runtime import plan
+
+        eq_(plan._effects.dispatch(operation, dialect)(operation), effect)
+
+    def test_format_size(self):
+        eq_(command._format_size(512), "512 bytes")
+        eq_(command._format_size(2048), "2.0 kB")
+        eq_(command._format_size(150 * 1024 * 1024), "150.0 MB")
+        eq_(command._format_size(3 * 1024**4), "3072.0 GB")
+
+    def test_plan_cmd_line(self):
+        commandline = config.CommandLine()
+        options = commandline.parser.parse_args(["upgrade", "head", "--plan"])
+        eq_(options.cmd[0], command.upgrade)
+        is_true(options.plan)
+
+
+class SquashTest(_BufMixin, TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.bind = _sqlite_file_db()
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.stdout = self._buf_fixture()
+        self.a, self.b, self.c, self.d = "a1a1", "b2b2", "c3c3", "d4d4"
+        script = ScriptDirectory.from_config(self.cfg)
+        for rev, down, body in [
+            (
+                self.a,
+                None,
+                "op.create_table('t1', sa.Column('id', sa.Integer, "
+                "primary_key=True))",
+            ),
+            (
+                self.b,
+                self.a,
+                "op.add_column('t1', sa.Column('x', sa.Integer))",
+            ),
+            (
+                self.c,
+                self.b,
+                "op.create_table('t2', sa.Column('id', sa.Integer, "
+                "primary_key=True), sa.Column('t1_id', sa.Integer, "
+                "sa.ForeignKey('t1.id')))",
+            ),
+            (self.d, self.c, "op.create_index('ix_t2', 't2', ['t1_id'])"),
+        ]:
+            script.generate_revision(rev, "rev %s" % rev, head=down)
+            write_script(
+                script,
+                rev,
+                """\
+"rev %s"
+revision = '%s'
+down_revision = %r
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    %s
+
+def downgrade():
+    pass
+"""
+                % (rev, rev, down, body),
+            )
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _version(self):
+        with self.bind.connect() as conn:
+            return conn.scalar(text("select version_num from alembic_version"))
+
+    def _archived(self):
+        return sorted(
+            os.listdir(os.path.join(self.env.dir, "archive")), key=lambda n: n
+        )
+
+    def test_squash(self):
+        command.upgrade(self.cfg, self.c)
+        baseline = command.squash(self.cfg, self.c, message="squashed")
+
+        eq_(baseline.revision, self.c)
+        eq_(baseline.down_revision, None)
+        eq_(baseline.replaces, (self.a, self.b))
+        eq_(baseline.doc, "squashed")
+        eq_(
+            [name.split("_")[0] for name in self._archived()],
+            [self.a, self.b, self.c],
+        )
+
+        script = ScriptDirectory.from_config(self.cfg)
+        eq_(
+            [sc.revision for sc in script.walk_revisions()],
+            [self.d, self.c],
+        )
+        eq_(
+            script.revision_map._replaced_revisions,
+            {self.a: self.c, self.b: self.c},
+        )
+
+        with open(baseline.path) as file_:
+            source = file_.read()
+        assert "op.create_table('t1'" in source
+        assert "op.create_table('t2'" in source
+        assert "sa.Column('x'" in source
+        assert "alembic_version" not in source
+
+    def test_baseline_upgrade_downgrade(self):
+        command.upgrade(self.cfg, self.c)
+        command.squash(self.cfg, "base:%s" % self.c)
+
+        command.downgrade(self.cfg, "base")
+        with self.bind.connect() as conn:
+            is_false(_connectable_has_table(conn, "t1", None))
+
+        command.upgrade(self.cfg, "head")
+        eq_(self._version(), self.d)
+        with self.bind.connect() as conn:
+            is_true(_connectable_has_table(conn, "t2", None))
+
+    def test_current_and_stamp_replaced_revision(self):
+        command.upgrade(self.cfg, self.c)
+        command.squash(self.cfg, self.c)
+
+        with self.bind.begin() as conn:
+            conn.execute(
+                text("update alembic_version set version_num=:rev"),
+                {"rev": self.b},
+            )
+
+        assert_raises_message(
+            util.CommandError,
+            "Database is at revision %s, which was squashed into "
+            "baseline revision %s" % (self.b, self.c),
+            command.current,
+            self.cfg,
+        )
+        eq_(self._version(), self.b)
+
+        command.stamp(self.cfg, self.c)
+        eq_(self._version(), self.c)
+
+    def test_upgrade_from_replaced_revision(self):
+        command.upgrade(self.cfg, self.c)
+        command.squash(self.cfg, self.c)
+
+        with self.bind.begin() as conn:
+            conn.execute(
+                text("update alembic_version set version_num=:rev"),
+                {"rev": self.a},
+            )
+
+        assert_raises_message(
+            util.CommandError,
+            "Database is at revision %s, which was squashed into "
+            "baseline revision %s" % (self.a, self.c),
+            command.upgrade,
+            self.cfg,
+            "head",
+        )
+        eq_(self._version(), self.a)
+
+    def test_squash_archives_fingerprints(self):
+        command.upgrade(self.cfg, self.c)
+        script = ScriptDirectory.from_config(self.cfg)
+        for rev in (self.b, self.d):
+            with open(
+                fingerprints_path(script.get_revision(rev).path), "w"
+            ) as file_:
+                file_.write("{}")
+
+        command.squash(self.cfg, self.c)
+
+        b_fingerprints = fingerprints_path(script.get_revision(self.b).path)
+        d_fingerprints = fingerprints_path(script.get_revision(self.d).path)
+        is_false(os.path.exists(b_fingerprints))
+        is_true(os.path.exists(d_fingerprints))
+        assert os.path.basename(b_fingerprints) in self._archived()
+
+    def test_squash_baseline_again(self):
+        command.upgrade(self.cfg, self.c)
+        command.squash(self.cfg, self.c)
+        command.upgrade(self.cfg, self.d)
+
+        baseline = command.squash(self.cfg, self.d)
+        eq_(baseline.replaces, (self.a, self.b, self.c))
+
+    def test_range_must_start_at_base(self):
+        assert_raises_message(
+            util.CommandError,
+            "Squash range must start at base",
+            command.squash,
+            self.cfg,
+            "%s:%s" % (self.a, self.c),
+        )
+
+    def test_base_revision(self):
+        assert_raises_message(
+            util.CommandError,
+            "Revision %s is a base revision" % self.a,
+            command.squash,
+            self.cfg,
+            self.a,
+        )
+
+    def test_database_not_at_revision(self):
+        command.upgrade(self.cfg, self.b)
+        assert_raises_message(
+            util.CommandError,
+            "Target database must be at revision %s in order to squash; "
+            "it is at %s" % (self.c, self.b),
+            command.squash,
+            self.cfg,
+            self.c,
+        )
+        assert not os.path.exists(os.path.join(self.env.dir, "archive"))
+
+    def test_branch_point(self):
+        self.env.generate_revision("e5e5", "e", head=self.a, splice=True)
+        assert_raises_message(
+            util.CommandError,
+            "Revision %s has more than one revision depending on it" % self.a,
+            command.squash,
+            self.cfg,
+            self.c,
+        )
+
+
 class EditTest(TestBase):
     @classmethod
     def setup_class(cls):
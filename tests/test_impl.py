@@ -1,10 +1,18 @@
 from sqlalchemy import Column
+from sqlalchemy import exc
 from sqlalchemy import Integer
 from sqlalchemy import Table
 from sqlalchemy.sql import text
 
 from alembic import testing
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from alembic.runtime.tracing import SlowStatementLog
+from alembic.runtime.tracing import StatementTracer
 from alembic.testing import eq_
+from alembic.testing import expect_raises
+from alembic.testing import is_
+from alembic.testing import mock
 from alembic.testing.fixtures import FutureEngineMixin
 from alembic.testing.fixtures import TablesTest
 
@@ -43,3 +51,184 @@ class ImplTest(TablesTest):
 
 class FutureImplTest(FutureEngineMixin, ImplTest):
     pass
+
+
+class RecordingTracer(StatementTracer):
+    def __init__(self):
+        self.events = []
+
+    def before_execute(self, statement):
+        self.events.append(("before", statement.sql, statement.duration))
+
+    def after_execute(self, statement):
+        self.events.append(("after", statement.sql, statement.rowcount))
+
+    def handle_error(self, statement, exception):
+        self.events.append(("error", statement.sql, type(exception)))
+
+
+class TracingTest(TablesTest):
+    __only_on__ = "sqlite"
+
+    @classmethod
+    def define_tables(cls, metadata):
+        Table(
+            "some_table", metadata, Column("x", Integer), Column("y", Integer)
+        )
+
+    @testing.fixture
+    def tracer(self):
+        return RecordingTracer()
+
+    @testing.fixture
+    def op(self, connection, tracer):
+        context = MigrationContext.configure(
+            connection,
+            opts={
+                "transaction_per_migration": True,
+                "statement_tracers": tracer,
+                "explain_dml": True,
+            },
+        )
+        with context.begin_transaction(_per_migration=True):
+            yield Operations(context)
+
+    def test_events(self, op, tracer):
+        op.execute("insert into some_table (x, y) values (1, 2), (3, 4)")
+        op.execute("CREATE TEMPORARY TABLE IF NOT EXISTS t_tmp (id INTEGER)")
+        with expect_raises(Exception):
+            op.execute("select * from nonexistent")
+
+        eq_(
+            tracer.events,
+            [
+                (
+                    "before",
+                    "insert into some_table (x, y) values (1, 2), (3, 4)",
+                    None,
+                ),
+                (
+                    "after",
+                    "insert into some_table (x, y) values (1, 2), (3, 4)",
+                    2,
+                ),
+                (
+                    "before",
+                    "CREATE TEMPORARY TABLE IF NOT EXISTS t_tmp (id INTEGER)",
+                    None,
+                ),
+                (
+                    "after",
+                    "CREATE TEMPORARY TABLE IF NOT EXISTS t_tmp (id INTEGER)",
+                    None,
+                ),
+                ("before", "select * from nonexistent", None),
+                (
+                    "error",
+                    "select * from nonexistent",
+                    exc.OperationalError,
+                ),
+            ],
+        )
+
+    def test_explain_dml(self, op, tracer):
+        statements = []
+        tracer.before_execute = statements.append
+
+        some_table = self.tables.some_table
+        op.execute(some_table.update().values(y=5).where(some_table.c.x > 2))
+        op.execute("select x from some_table")
+        op.execute("CREATE TEMPORARY TABLE IF NOT EXISTS t_tmp (id INTEGER)")
+
+        update, select, create_table = statements
+        assert update.plan
+        assert any("some_table" in line for line in update.plan)
+        is_(select.plan, None)
+        is_(create_table.plan, None)
+
+    def test_explain_not_supported(self, op, tracer):
+        statements = []
+        tracer.before_execute = statements.append
+
+        with mock.patch.object(op.impl, "explain_prefix", None):
+            op.execute("delete from some_table")
+        is_(statements[0].plan, None)
+
+    def test_sql_compiled_when_accessed(self, connection):
+        statements = []
+        tracer = StatementTracer()
+        tracer.after_execute = statements.append
+        context = MigrationContext.configure(
+            connection, opts={"statement_tracers": tracer}
+        )
+        some_table = self.tables.some_table
+        Operations(context).execute(some_table.delete())
+
+        # the statement is only compiled again when a tracer reads it
+        (statement,) = statements
+        assert "sql" not in statement.__dict__
+        with mock.patch.object(
+            statement.construct, "compile", wraps=statement.construct.compile
+        ) as compile_:
+            eq_(statement.sql, "DELETE FROM some_table")
+            eq_(statement.sql, "DELETE FROM some_table")
+        eq_(len(compile_.mock_calls), 1)
+
+    def test_slow_statement_log(self, connection):
+        context = MigrationContext.configure(
+            connection, opts={"slow_statement_threshold": 0}
+        )
+        tracer = context.impl.tracers[0]
+        assert isinstance(tracer, SlowStatementLog)
+        eq_(tracer.threshold, 0)
+
+        tracer.logger = logger = mock.Mock()
+        Operations(context).execute("delete from some_table")
+        eq_(
+            logger.warning.mock_calls,
+            [
+                mock.call(
+                    "Slow %s statement took %.3fs: %s",
+                    "DML",
+                    mock.ANY,
+                    "delete from some_table",
+                )
+            ],
+        )
+
+    def test_slow_statement_threshold(self):
+        logger = mock.Mock()
+        tracer = SlowStatementLog(1.5, logger=logger)
+        statement = mock.Mock(duration=1.0, is_ddl=True, sql="DROP TABLE t")
+        tracer.after_execute(statement)
+        tracer.handle_error(statement, Exception())
+        eq_(logger.warning.mock_calls, [])
+
+        statement.duration = 2.0
+        tracer.after_execute(statement)
+        tracer.handle_error(statement, Exception())
+        eq_(
+            logger.warning.mock_calls,
+            [
+                mock.call(
+                    "Slow %s statement took %.3fs: %s",
+                    "DDL",
+                    2.0,
+                    "DROP TABLE t",
+                ),
+                mock.call(
+                    "Slow %s statement failed after %.3fs: %s",
+                    "DDL",
+                    2.0,
+                    "DROP TABLE t",
+                ),
+            ],
+        )
+
+    def test_no_tracers(self, migration_context):
+        eq_(migration_context.impl.tracers, ())
+        with mock.patch.object(
+            migration_context.impl, "_exec_construct"
+        ) as exec_construct:
+            migration_context.impl.execute("delete from some_table")
+        eq_(len(exec_construct.mock_calls), 1)
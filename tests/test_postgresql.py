@@ -46,6 +46,7 @@ from alembic.testing import combinations
 from alembic.testing import config
 from alembic.testing import eq_
 from alembic.testing import eq_ignore_whitespace
+from alembic.testing import mock
 from alembic.testing import provide_metadata
 from alembic.testing.env import _no_sql_testing_config
 from alembic.testing.env import clear_staging_env
@@ -717,6 +718,42 @@ class PostgresqlDefaultCompareTest(TestBase):
     def test_compare_string_nonblank_default(self):
         self._compare_default_roundtrip(String(8), "hi")
 
+    def test_compare_defaults_together(self):
+        for i in range(5):
+            Table(
+                "t%d" % i,
+                self.metadata,
+                Column("x", Integer, server_default=text("5")),
+            )
+        with config.db.begin() as conn:
+            self.metadata.create_all(conn)
+
+        new_metadata = MetaData()
+        for i in range(5):
+            Table(
+                "t%d" % i,
+                new_metadata,
+                Column("x", Integer, server_default="5"),
+            )
+
+        with self.bind.connect() as conn:
+            context = MigrationContext.configure(
+                connection=conn, opts={"compare_server_default": True}
+            )
+            impl = context.impl
+            with mock.patch.object(
+                impl,
+                "_server_defaults_equal",
+                wraps=impl._server_defaults_equal,
+            ) as defaults_equal:
+                eq_(autogenerate.compare_metadata(context, new_metadata), [])
+
+        # the comparisons of all columns are evaluated at once, and the
+        # repeated comparison is evaluated by the server once
+        eq_(defaults_equal.call_count, 1)
+        eq_(len(defaults_equal.call_args[0][0]), 5)
+        eq_(len(impl._server_defaults_equal_cache), 1)
+
     def test_compare_interval_str(self):
         # this form shouldn't be used but testing here
         # for compatibility
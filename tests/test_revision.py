@@ -1,21 +1,47 @@
+import random
+import sys
+
 from sqlalchemy.testing import util as sqla_testing_util
 
+from alembic import util
 from alembic.script.revision import CycleDetected
 from alembic.script.revision import DependencyCycleDetected
 from alembic.script.revision import DependencyLoopDetected
 from alembic.script.revision import LoopDetected
 from alembic.script.revision import MultipleHeads
+from alembic.script.revision import ResolutionError
 from alembic.script.revision import Revision
 from alembic.script.revision import RevisionError
 from alembic.script.revision import RevisionMap
 from alembic.testing import assert_raises_message
+from alembic.testing import combinations
 from alembic.testing import eq_
 from alembic.testing import expect_raises_message
+from alembic.testing import expect_warnings
+from alembic.testing import is_
 from alembic.testing.fixtures import TestBase
 from . import _large_map
 
 
 class APITest(TestBase):
+    def test_compact_representation(self):
+        rev_id = "".join(["1a2b", "3c4d"])
+        down_rev_id = "".join(["5e6f", "7a8b"])
+        map_ = RevisionMap(
+            lambda: [
+                Revision("5e6f7a8b", ()),
+                Revision(rev_id, (down_rev_id,)),
+            ]
+        )
+        rev = map_.get_revision("1a2b3c4d")
+        down_rev = map_.get_revision("5e6f7a8b")
+
+        assert not hasattr(rev, "__dict__")
+        is_(rev.revision, sys.intern("1a2b3c4d"))
+        is_(rev.down_revision, down_rev.revision)
+        is_(down_rev._all_nextrev, down_rev.nextrev)
+        eq_(down_rev.nextrev, {"1a2b3c4d"})
+
     def test_invalid_datatype(self):
         map_ = RevisionMap(
             lambda: [
@@ -48,6 +74,65 @@ class APITest(TestBase):
         map_.get_revision(("a",))
         map_.get_revision("a")
 
+    def test_partial_id_ambiguous_in_map_order(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("abcd1", ()),
+                Revision("abcd0", ("abcd1",)),
+                Revision("abce9", ("abcd0",)),
+                Revision("abcd3", ("abce9",)),
+            ]
+        )
+        eq_(map_.get_revision("abce").revision, "abce9")
+        with expect_raises_message(
+            RevisionError,
+            "Multiple revisions start with 'abcd': "
+            "'abcd1', 'abcd0', 'abcd3'...",
+        ):
+            map_.get_revision("abcd")
+
+    def test_partial_id_after_add_revision(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("abcd1", ()),
+            ]
+        )
+        eq_(map_.get_revision("abcd").revision, "abcd1")
+
+        map_.add_revision(
+            Revision("bcde1", ("abcd1",), branch_labels="somebranch")
+        )
+        eq_(map_.get_revision("bcde").revision, "bcde1")
+        eq_(map_.get_revision("someb").revision, "bcde1")
+
+        map_.add_revision(Revision("abcd2", ("bcde1",)))
+        with expect_raises_message(
+            RevisionError, "Multiple revisions start with 'abcd'"
+        ):
+            map_.get_revision("abcd")
+
+    def test_partial_id_after_remove_revision(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("abcd1", ()),
+                Revision("abcd3", ("abcd1",)),
+                Revision("abcd4", ("abcd1",)),
+            ]
+        )
+        with expect_raises_message(
+            RevisionError, "Multiple revisions start with 'abcd'"
+        ):
+            map_.get_revision("abcd")
+
+        map_.remove_revision("abcd3")
+        map_.add_revision(Revision("abcd2", ("abcd4",)))
+        with expect_raises_message(
+            RevisionError,
+            "Multiple revisions start with 'abcd': "
+            "'abcd1', 'abcd4', 'abcd2'...",
+        ):
+            map_.get_revision("abcd")
+
     def test_add_revision_one_head(self):
         map_ = RevisionMap(
             lambda: [
@@ -1303,6 +1388,126 @@ class LargeMapTest(DownIterateTest):
                 assert remaining.intersection(ancestors)
 
 
+def _generate_revisions(size, seed):
+    # a single-based map with many branches, merges and
+    # dependencies, in the style of _large_map
+    rand = random.Random(seed)
+    revs = [Revision("r0", None)]
+    open_heads = ["r0"]
+    for idx in range(1, size):
+        roll = rand.random()
+        if len(open_heads) > 1 and roll < 0.3:
+            down = tuple(rand.sample(open_heads, 2))
+            for rev_id in down:
+                open_heads.remove(rev_id)
+        elif roll < 0.5 and len(open_heads) < 8:
+            down = rand.choice(open_heads)
+        else:
+            down = rand.choice(open_heads)
+            open_heads.remove(down)
+        dependencies = None
+        if roll > 0.9:
+            dependencies = rand.choice(revs).revision
+        revs.append(Revision("r%d" % idx, down, dependencies=dependencies))
+        open_heads.append("r%d" % idx)
+    rand.shuffle(revs)
+    return revs
+
+
+def _reference_topological_sort(map_, revisions, heads):
+    """The topological sort as formerly implemented, recomputing the
+    full ancestry of each head; used to verify that the ordering
+    produced by RevisionMap._topological_sort is unchanged.
+
+    """
+
+    def get_ancestors(rev_id):
+        return {
+            r.revision
+            for r in map_._get_ancestor_nodes([map_._revision_map[rev_id]])
+        }
+
+    todo = {d.revision for d in revisions}
+    inserted_order = list(map_._revision_map)
+    current_heads = sorted(
+        {d.revision for d in heads if d.revision in todo},
+        key=inserted_order.index,
+    )
+    ancestors_by_idx = [get_ancestors(rev_id) for rev_id in current_heads]
+
+    output = []
+    idx = 0
+    while current_heads:
+        candidate = current_heads[idx]
+        for check_idx, ancestors in enumerate(ancestors_by_idx):
+            if check_idx != idx and candidate in ancestors:
+                idx = check_idx
+                break
+        else:
+            output.append(candidate)
+            todo.remove(candidate)
+            heads_to_add = [
+                r
+                for r in map_._revision_map[
+                    candidate
+                ]._normalized_down_revisions
+                if r in todo and r not in current_heads
+            ]
+            if not heads_to_add:
+                del current_heads[idx]
+                del ancestors_by_idx[idx]
+                idx = max(idx - 1, 0)
+            else:
+                current_heads[idx] = heads_to_add[0]
+                current_heads.extend(heads_to_add[1:])
+                ancestors_by_idx[idx] = get_ancestors(heads_to_add[0])
+                ancestors_by_idx.extend(
+                    get_ancestors(head) for head in heads_to_add[1:]
+                )
+    return output
+
+
+class TopologicalSortTest(TestBase):
+    def _assert_matches_reference(self, map_, revisions, heads):
+        eq_(
+            map_._topological_sort(revisions, heads),
+            _reference_topological_sort(map_, revisions, heads),
+        )
+
+    def _assert_map_matches_reference(self, map_):
+        revs = [
+            rev
+            for key, rev in map_._revision_map.items()
+            if rev is not None and key == rev.revision
+        ]
+        self._assert_matches_reference(
+            map_, revs, map_.get_revisions(map_.heads)
+        )
+        for rev in revs:
+            if rev.is_merge_point or rev.is_branch_point:
+                self._assert_matches_reference(
+                    map_, list(map_._get_ancestor_nodes([rev])), [rev]
+                )
+
+    def test_large_map(self):
+        self._assert_map_matches_reference(_large_map.map_)
+
+    @combinations(*range(5), argnames="seed")
+    def test_generated_map(self, seed):
+        revs = _generate_revisions(100, seed)
+        self._assert_map_matches_reference(RevisionMap(lambda: revs))
+
+    def test_long_chain(self):
+        revs = [Revision("r0", None)] + [
+            Revision("r%d" % idx, "r%d" % (idx - 1)) for idx in range(1, 5000)
+        ]
+        map_ = RevisionMap(lambda: revs)
+        eq_(
+            map_._topological_sort(revs, [revs[-1]]),
+            ["r%d" % idx for idx in reversed(range(5000))],
+        )
+
+
 class DepResolutionFailedTest(DownIterateTest):
     def setUp(self):
         self.map = RevisionMap(
@@ -1329,6 +1534,365 @@ class DepResolutionFailedTest(DownIterateTest):
         )
 
 
+class ReplacedRevisionTest(DownIterateTest):
+    def setUp(self):
+        self.map = RevisionMap(
+            lambda: [
+                Revision("c", (), replaces=("a", "b")),
+                Revision("d", "c"),
+            ]
+        )
+
+    def test_replaced_not_resolved(self):
+        eq_(self.map._replaced_revisions, {"a": "c", "b": "c"})
+        assert_raises_message(
+            ResolutionError,
+            "Revision a was squashed into baseline revision c",
+            self.map.get_revision,
+            "a",
+        )
+        assert_raises_message(
+            ResolutionError,
+            "Revision b was squashed into baseline revision c",
+            self.map.get_revisions,
+            ("b", "d"),
+        )
+
+    def test_add_revision(self):
+        self.map.add_revision(Revision("e", "d", replaces="x"))
+        eq_(self.map._replaced_revisions, {"a": "c", "b": "c", "x": "e"})
+
+    def test_replaced_still_present(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("a", ()),
+                Revision("c", "a", replaces=("a",)),
+            ]
+        )
+        with expect_warnings(
+            "Revision a is replaced by revision c, however it is still "
+            "present"
+        ):
+            map_.heads
+        eq_(map_.get_revision("a").revision, "a")
+
+
+class ReachabilityIndexTest(TestBase):
+    def setUp(self):
+        self.map = RevisionMap(
+            lambda: [
+                Revision("base1", ()),
+                Revision("a1", "base1"),
+                Revision("b1", "a1"),
+                Revision("base2", ()),
+                Revision("a2", "base2", dependencies="a1"),
+                Revision("b2", "a2"),
+                Revision("mergepoint", ("b1", "b2")),
+            ]
+        )
+
+    def _revs(self, *ids):
+        return [self.map.get_revision(id_) for id_ in ids]
+
+    def _assert_matches_traversal(self, name, targets, **kw):
+        self.map.reachability_index = False
+        expected = getattr(self.map, name)(targets, **kw)
+        self.map.reachability_index = True
+        eq_(getattr(self.map, name)(targets, **kw), expected)
+
+    @combinations(
+        ("_get_ancestor_set",),
+        ("_get_descendant_set",),
+        argnames="name",
+    )
+    @combinations((True,), (False,), argnames="include_dependencies")
+    def test_matches_traversal(self, name, include_dependencies):
+        for rev_id in self.map._revision_map:
+            if rev_id:
+                self._assert_matches_traversal(
+                    name,
+                    self._revs(rev_id),
+                    include_dependencies=include_dependencies,
+                )
+        self._assert_matches_traversal(
+            name,
+            self._revs("b1", "base2"),
+            include_dependencies=include_dependencies,
+        )
+
+    def test_shares_lineage(self):
+        self.map.reachability_index = True
+        assert self.map._shares_lineage("base1", ["mergepoint"])
+        assert self.map._shares_lineage("b2", ["base2"])
+        assert not self.map._shares_lineage("b2", ["base1"])
+        assert self.map._shares_lineage(
+            "b2", ["base1"], include_dependencies=True
+        )
+
+    @combinations((True,), (False,), argnames="reachability_index")
+    def test_overlap_check(self, reachability_index):
+        self.map.reachability_index = reachability_index
+        assert_raises_message(
+            RevisionError,
+            "Requested revision b1 overlaps with other requested "
+            "revisions a1",
+            self.map._get_ancestor_set,
+            self._revs("b1", "b2", "a1"),
+            check=True,
+        )
+
+    def test_add_revision_resets_index(self):
+        self.map.reachability_index = True
+        eq_(
+            self.map._get_descendant_set(self._revs("mergepoint")),
+            set(self._revs("mergepoint")),
+        )
+        self.map.add_revision(Revision("c1", "mergepoint"))
+        eq_(
+            self.map._get_descendant_set(self._revs("mergepoint")),
+            set(self._revs("mergepoint", "c1")),
+        )
+
+
+class ReachabilityIndexLabeledBranchTest(LabeledBranchTest):
+    def setUp(self):
+        super().setUp()
+        self.map.reachability_index = True
+
+
+class ReachabilityIndexBranchTravellingTest(BranchTravellingTest):
+    def setUp(self):
+        super().setUp()
+        self.map.reachability_index = True
+
+
+class ReachabilityIndexMultipleBaseCrossDependencyTest(
+    MultipleBaseCrossDependencyTestOne
+):
+    def setUp(self):
+        super().setUp()
+        self.map.reachability_index = True
+
+
+class IncrementalMapTest(TestBase):
+    def _copy(self, rev):
+        return Revision(
+            rev.revision,
+            rev.down_revision,
+            dependencies=rev.dependencies,
+            branch_labels=rev._orig_branch_labels,
+        )
+
+    def _revisions(self, map_):
+        return [
+            rev
+            for key, rev in map_._revision_map.items()
+            if rev is not None and key == rev.revision
+        ]
+
+    def _assert_matches_rebuild(self, map_):
+        revs = [self._copy(rev) for rev in self._revisions(map_)]
+        rebuilt = RevisionMap(lambda: revs)
+
+        eq_(
+            [rev.revision for rev in self._revisions(map_)],
+            [rev.revision for rev in self._revisions(rebuilt)],
+        )
+        eq_(
+            {
+                key: rev.revision
+                for key, rev in map_._revision_map.items()
+                if rev is not None
+            },
+            {
+                key: rev.revision
+                for key, rev in rebuilt._revision_map.items()
+                if rev is not None
+            },
+        )
+        eq_(map_.heads, rebuilt.heads)
+        eq_(map_._real_heads, rebuilt._real_heads)
+        eq_(map_.bases, rebuilt.bases)
+        eq_(map_._real_bases, rebuilt._real_bases)
+        for rev, rebuilt_rev in zip(
+            self._revisions(map_), self._revisions(rebuilt)
+        ):
+            eq_(rev.nextrev, rebuilt_rev.nextrev)
+            eq_(rev._all_nextrev, rebuilt_rev._all_nextrev)
+            eq_(
+                set(rev._normalized_resolved_dependencies),
+                set(rebuilt_rev._normalized_resolved_dependencies),
+            )
+            eq_(rev.branch_labels, rebuilt_rev.branch_labels)
+
+    @combinations(*range(5), argnames="seed")
+    def test_random_changes_match_rebuild(self, seed):
+        rand = random.Random(seed)
+        counter = iter(range(1000))
+
+        def new_id():
+            return "rev%d" % next(counter)
+
+        map_ = RevisionMap(lambda: [Revision("rev_base", ())])
+
+        for _ in range(150):
+            revs = self._revisions(map_)
+            roll = rand.random()
+            if roll < 0.6 or len(revs) < 3:
+                if rand.random() < 0.1:
+                    # a new base, sometimes labeled
+                    rev_id = new_id()
+                    map_.add_revision(
+                        Revision(
+                            rev_id,
+                            (),
+                            branch_labels="label_%s" % rev_id
+                            if rand.random() < 0.5
+                            else None,
+                        )
+                    )
+                    continue
+                down = tuple(
+                    rev.revision
+                    for rev in rand.sample(
+                        revs, min(len(revs), rand.choice([1, 1, 2]))
+                    )
+                )
+                dependencies = None
+                if rand.random() < 0.2:
+                    dependencies = rand.choice(revs).revision
+                    if dependencies in down:
+                        dependencies = None
+                rev_id = new_id()
+                map_.add_revision(
+                    Revision(
+                        rev_id,
+                        down,
+                        dependencies=dependencies,
+                        branch_labels="label_%s" % rev_id
+                        if rand.random() < 0.1
+                        else None,
+                    )
+                )
+            elif roll < 0.85:
+                removable = [rev for rev in revs if not rev._all_nextrev]
+                map_.remove_revision(rand.choice(removable))
+            else:
+                rev = rand.choice(revs)
+                descendants = set(map_._get_descendant_nodes([rev]))
+                candidates = [
+                    other
+                    for other in revs
+                    if other not in descendants
+                    and other.revision
+                    not in util.to_tuple(rev.down_revision, default=())
+                ]
+                dependencies = (
+                    rand.choice(candidates).revision if candidates else None
+                )
+                map_.add_revision(
+                    Revision(
+                        rev.revision,
+                        rev.down_revision,
+                        dependencies=dependencies,
+                        branch_labels=rev._orig_branch_labels,
+                    ),
+                    _replace=True,
+                )
+
+            self._assert_matches_rebuild(map_)
+
+    def test_add_to_labeled_branch(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("a", ()),
+                Revision("b", "a", branch_labels="lbl"),
+                Revision("c", "b"),
+            ]
+        )
+        map_.add_revision(Revision("d", "c"))
+        eq_(map_.get_revision("d").branch_labels, {"lbl"})
+        eq_(map_.get_revision("lbl@head").revision, "d")
+        self._assert_matches_rebuild(map_)
+
+    def test_add_branch_point_below_label(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("a", ()),
+                Revision("b", "a"),
+                Revision("c", "b", branch_labels="lbl"),
+            ]
+        )
+        eq_(map_.get_revision("a").branch_labels, {"lbl"})
+
+        map_.add_revision(Revision("d", "a"))
+        eq_(map_.get_revision("a").branch_labels, set())
+        eq_(map_.get_revision("b").branch_labels, {"lbl"})
+        eq_(map_.get_revision("d").branch_labels, set())
+        self._assert_matches_rebuild(map_)
+
+        map_.add_revision(Revision("e", ("c", "d")))
+        eq_(map_.get_revision("b").branch_labels, set())
+        eq_(map_.get_revision("e").branch_labels, {"lbl"})
+        self._assert_matches_rebuild(map_)
+
+    def test_remove_revision(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("a", ()),
+                Revision("b", "a"),
+                Revision("c", "a"),
+                Revision("d", "c", branch_labels="lbl"),
+            ]
+        )
+        map_.remove_revision("d")
+        eq_(map_.heads, ("b", "c"))
+        is_(map_._revision_map.get("lbl"), None)
+        map_.remove_revision(map_.get_revision("b"))
+        eq_(map_.heads, ("c",))
+        self._assert_matches_rebuild(map_)
+
+    def test_remove_revision_referred_to(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("a", ()),
+                Revision("b", "a"),
+                Revision("c", (), dependencies="a"),
+            ]
+        )
+        assert_raises_message(
+            RevisionError,
+            r"Revision a can't be removed, as it's referred to by "
+            r"revision\(s\) b, c",
+            map_.remove_revision,
+            "a",
+        )
+        assert_raises_message(
+            RevisionError,
+            "Revision x is not present",
+            map_.remove_revision,
+            "x",
+        )
+        self._assert_matches_rebuild(map_)
+
+    def test_replace_creates_cycle(self):
+        map_ = RevisionMap(
+            lambda: [
+                Revision("a", ()),
+                Revision("b", "a"),
+                Revision("c", "b"),
+            ]
+        )
+        assert_raises_message(
+            DependencyCycleDetected,
+            r"Dependency cycle is detected in revisions \(b, c\)",
+            map_.add_revision,
+            Revision("b", "a", dependencies="c"),
+            _replace=True,
+        )
+        self._assert_matches_rebuild(map_)
+
+
 class InvalidRevisionMapTest(TestBase):
     def _assert_raises_revision_map(self, map_, except_cls, msg):
         assert_raises_message(except_cls, msg, lambda: map_._revision_map)
@@ -1590,6 +2154,28 @@ class GraphWithCycleTest(InvalidRevisionMapTest):
             map_, ["a", "b", "c", "d", "e"]
         )
 
+    def test_revision_map_cycle_in_large_map(self):
+        revs = _generate_revisions(100, 0) + [
+            Revision("c1", ("r5", "c2")),
+            Revision("c2", "c1"),
+        ]
+        self._assert_raises_revision_map(
+            RevisionMap(lambda: revs),
+            CycleDetected,
+            r"^Cycle is detected in revisions \(c1, c2\)$",
+        )
+
+    def test_revision_map_dep_cycle_in_large_map(self):
+        revs = _generate_revisions(100, 0) + [
+            Revision("c1", "r5", dependencies="c2"),
+            Revision("c2", "c1"),
+        ]
+        self._assert_raises_revision_map(
+            RevisionMap(lambda: revs),
+            DependencyCycleDetected,
+            r"^Dependency cycle is detected in revisions \(c1, c2\)$",
+        )
+
 
 class NormalizedDownRevTest(DownIterateTest):
     def setUp(self):
@@ -1614,6 +2200,27 @@ class NormalizedDownRevTest(DownIterateTest):
         # "a3" is not included because ancestor b2 is also dependent
         eq_(b4._normalized_down_revisions, ("b3",))
 
+    @combinations(*range(5), argnames="seed")
+    def test_generated_map(self, seed):
+        revs = _generate_revisions(200, seed)
+        map_ = RevisionMap(lambda: revs)
+        map_._revision_map
+        normalized = {
+            rev.revision: set(rev._normalized_resolved_dependencies)
+            for rev in revs
+        }
+
+        # compare to the dependencies as normalized for each
+        # revision separately
+        map_._normalize_depends_on(revs, map_._revision_map)
+        eq_(
+            normalized,
+            {
+                rev.revision: set(rev._normalized_resolved_dependencies)
+                for rev in revs
+            },
+        )
+
     def test_dupe_dependency(self):
         b5 = self.map.get_revision("b5")
         eq_(b5._all_down_revisions, ("b4",))
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import json
 import os
 import re
 import shutil
 import textwrap
+import threading
 from typing import Dict
 from typing import List
 
@@ -16,6 +19,8 @@ from alembic import testing
 from alembic import util
 from alembic.config import Config
 from alembic.environment import EnvironmentContext
+from alembic.migration import MigrationContext
+from alembic.runtime.migration import StepStatistics
 from alembic.script import Script
 from alembic.script import ScriptDirectory
 from alembic.testing import assert_raises_message
@@ -23,6 +28,7 @@ from alembic.testing import assertions
 from alembic.testing import config
 from alembic.testing import eq_
 from alembic.testing import expect_raises_message
+from alembic.testing import is_
 from alembic.testing import mock
 from alembic.testing.env import _get_staging_directory
 from alembic.testing.env import _multi_dir_testing_config
@@ -409,6 +415,14 @@ class CallbackEnvironmentTest(ApplyVersionsFunctionalTest):
             for h in heads:
                 assert h is None or isinstance(h, str)
 
+            # each revision in the fixture emits a single CREATE or DROP
+            statistics = step.statistics
+            assert isinstance(statistics, StepStatistics)
+            eq_(statistics.statements, 1 if step.is_migration else 0)
+            eq_(statistics.ddl_statements, statistics.statements)
+            eq_(statistics.rows, 0)
+            assert statistics.elapsed >= statistics.ddl_elapsed
+
 
 class OfflineTransactionalDDLTest(TestBase):
     def setUp(self):
@@ -651,6 +665,453 @@ class FutureOnlineTransactionalDDLTest(
     pass
 
 
+class BranchWorkersTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.bind = _sqlite_file_db()
+        env_file_fixture(
+            textwrap.dedent(
+                """\
+            import alembic
+            from alembic import context
+            from sqlalchemy import engine_from_config
+
+            config = context.config
+
+            def run_migrations_online():
+                connectable = engine_from_config(
+                    config.get_section(config.config_ini_section),
+                    prefix='sqlalchemy.',
+                )
+                with connectable.connect() as connection:
+                    context.configure(
+                        connection=connection,
+                        branch_workers=config.attributes["branch_workers"],
+                        on_version_apply=alembic.mock_event_listener,
+                    )
+                    with context.begin_transaction():
+                        context.run_migrations()
+                connectable.dispose()
+
+            run_migrations_online()
+            """
+            )
+        )
+
+    def tearDown(self):
+        self.bind.dispose()
+        clear_staging_env()
+
+    def _branch_fixture(self, label, upgrade="pass", down_revision=None):
+        script = ScriptDirectory.from_config(self.cfg)
+        base = util.rev_id()
+        script.generate_revision(
+            base,
+            None,
+            refresh=True,
+            head=down_revision or "base",
+            splice=down_revision is not None,
+            branch_labels=[label],
+        )
+        write_script(
+            script,
+            base,
+            f"""\
+import alembic
+from alembic import op
+
+revision = {base!r}
+down_revision = {down_revision!r}
+branch_labels = ({label!r},)
+
+
+def upgrade():
+    {upgrade}
+    op.execute("create table {label}_1 (id integer)")
+
+
+def downgrade():
+    pass
+""",
+        )
+        head = util.rev_id()
+        script.generate_revision(head, None, refresh=True, head=base)
+        write_script(
+            script,
+            head,
+            f"""\
+from alembic import op
+
+revision = {head!r}
+down_revision = {base!r}
+
+
+def upgrade():
+    op.execute("create table {label}_2 (id integer)")
+
+
+def downgrade():
+    pass
+""",
+        )
+        return base, head
+
+    def _heads(self):
+        with self.bind.connect() as conn:
+            return set(MigrationContext.configure(conn).get_current_heads())
+
+    def _tables(self):
+        return set(sa.inspect(self.bind).get_table_names())
+
+    @testing.combinations((1,), (4,), argnames="branch_workers")
+    def test_independent_branches(self, branch_workers):
+        heads = [self._branch_fixture(label)[1] for label in ("a", "b", "c")]
+
+        self.cfg.attributes["branch_workers"] = branch_workers
+        with mock.patch(
+            "alembic.mock_event_listener", mock.Mock(), create=True
+        ) as m:
+            command.upgrade(self.cfg, "heads")
+
+        eq_(self._heads(), set(heads))
+        eq_(
+            self._tables(),
+            {"alembic_version"}
+            | {"%s_%d" % (label, i) for label in "abc" for i in (1, 2)},
+        )
+        eq_(len(m.mock_calls), 6)
+        eq_(m.mock_calls[-1][2]["heads"], set(heads))
+
+    def test_branches_run_concurrently(self):
+        # each branch waits for the others within its first migration,
+        # which would time out if they were run one at a time
+        heads = [
+            self._branch_fixture(label, upgrade="alembic.mock_barrier.wait()")[
+                1
+            ]
+            for label in ("a", "b", "c")
+        ]
+
+        self.cfg.attributes["branch_workers"] = 3
+        with mock.patch(
+            "alembic.mock_barrier",
+            threading.Barrier(3, timeout=10),
+            create=True,
+        ), mock.patch("alembic.mock_event_listener", None, create=True):
+            command.upgrade(self.cfg, "heads")
+
+        eq_(self._heads(), set(heads))
+
+    def test_branch_fails(self):
+        a_base, a_head = self._branch_fixture("a")
+        b_base, b_head = self._branch_fixture(
+            "b", upgrade="raise Exception('b failed')"
+        )
+
+        self.cfg.attributes["branch_workers"] = 2
+        with mock.patch("alembic.mock_event_listener", None, create=True):
+            with expect_raises_message(Exception, "b failed"):
+                command.upgrade(self.cfg, "heads")
+
+        # the steps of the other branch which ran are committed as they
+        # were run, however no more are started once a step fails
+        heads = self._heads()
+        expected_tables = {
+            frozenset(): set(),
+            frozenset([a_base]): {"a_1"},
+            frozenset([a_head]): {"a_1", "a_2"},
+        }
+        assert frozenset(heads) in expected_tables, heads
+        eq_(
+            self._tables(),
+            {"alembic_version"} | expected_tables[frozenset(heads)],
+        )
+
+    def test_partition(self):
+        a_base, a_head = self._branch_fixture("a")
+        b_base, b_head = self._branch_fixture("b")
+
+        # a branch from a revision of branch "a"
+        c_base, c_head = self._branch_fixture("c", down_revision=a_base)
+
+        script = ScriptDirectory.from_config(self.cfg)
+
+        def partition(destination, heads):
+            steps = script._upgrade_revs(destination, heads)
+            return {
+                frozenset(step.revision.revision for step in steps)
+                for steps in MigrationContext._independent_branches(steps)
+            }
+
+        eq_(
+            partition("heads", ()),
+            {
+                frozenset([a_base, a_head, c_base, c_head]),
+                frozenset([b_base, b_head]),
+            },
+        )
+
+        # branches "a" and "c" both continue from the same revision
+        eq_(
+            partition("heads", (a_base,)),
+            {
+                frozenset([a_head, c_base, c_head]),
+                frozenset([b_base, b_head]),
+            },
+        )
+
+        eq_(
+            partition("heads", (c_base, a_head)),
+            {frozenset([c_head]), frozenset([b_base, b_head])},
+        )
+
+    def test_deferred_not_allowed(self):
+        with expect_raises_message(
+            util.CommandError,
+            "version_table_write_mode='deferred' can't be used "
+            "with branch_workers",
+        ):
+            MigrationContext.configure(
+                dialect_name="sqlite",
+                opts={
+                    "branch_workers": 2,
+                    "version_table_write_mode": "deferred",
+                },
+            )
+
+
+class CheckpointTest(TestBase):
+    __only_on__ = "sqlite"
+
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.attributes["write_mode"] = "immediate"
+        self.bind = _sqlite_file_db()
+        env_file_fixture(
+            textwrap.dedent(
+                """\
+            from alembic import context
+            from sqlalchemy import engine_from_config
+
+            config = context.config
+
+            def run_migrations_online():
+                connectable = engine_from_config(
+                    config.get_section(config.config_ini_section),
+                    prefix='sqlalchemy.',
+                )
+                with connectable.connect() as connection:
+                    context.configure(
+                        connection=connection,
+                        transaction_per_migration=(
+                            config.attributes["write_mode"] == "immediate"
+                        ),
+                        version_table_write_mode=config.attributes[
+                            "write_mode"
+                        ],
+                    )
+                    with context.begin_transaction():
+                        context.run_migrations()
+                connectable.dispose()
+
+            run_migrations_online()
+            """
+            )
+        )
+        self.a = a = util.rev_id()
+        self.b = b = util.rev_id()
+        script = ScriptDirectory.from_config(self.cfg)
+        script.generate_revision(a, None, refresh=True)
+        write_script(
+            script,
+            a,
+            f"""\
+import sqlalchemy as sa
+from alembic import op
+
+revision = {a!r}
+down_revision = None
+
+
+def upgrade():
+    t = op.create_table(
+        "t",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("flag", sa.Integer, server_default="0"),
+    )
+    op.bulk_insert(t, [{{"id": i}} for i in range(1, 11)])
+
+
+def downgrade():
+    op.drop_table("t")
+""",
+        )
+        script.generate_revision(b, None, refresh=True)
+        write_script(
+            script,
+            b,
+            f"""\
+import sqlalchemy as sa
+import alembic
+from alembic import op
+
+revision = {b!r}
+down_revision = {a!r}
+
+
+def upgrade():
+    context = op.get_context()
+    last_id = context.get_checkpoint("last_id", 0)
+    while True:
+        ids = [
+            row.id
+            for row in op.get_bind().execute(
+                sa.text(
+                    "select id from t where id > :last_id "
+                    "order by id limit 3"
+                ),
+                {{"last_id": last_id}},
+            )
+        ]
+        if not ids:
+            break
+        alembic.mock_chunks.append(ids)
+        op.execute(
+            sa.text("update t set flag = 1 where id in (%s)" % (
+                ", ".join(str(id_) for id_ in ids)
+            ))
+        )
+        if alembic.mock_fail_at in ids:
+            raise Exception("chunk failed")
+        last_id = ids[-1]
+        context.checkpoint("last_id", last_id)
+
+
+def downgrade():
+    pass
+""",
+        )
+
+    def tearDown(self):
+        self.bind.dispose()
+        clear_staging_env()
+
+    def _upgrade(self, fail_at=None):
+        chunks = []
+        with mock.patch(
+            "alembic.mock_chunks", chunks, create=True
+        ), mock.patch("alembic.mock_fail_at", fail_at, create=True):
+            if fail_at is None:
+                command.upgrade(self.cfg, "head")
+            else:
+                with expect_raises_message(Exception, "chunk failed"):
+                    command.upgrade(self.cfg, "head")
+        return chunks
+
+    def _get_checkpoints(self):
+        with self.bind.connect() as conn:
+            return MigrationContext.configure(conn).get_checkpoints()
+
+    def _flagged(self):
+        with self.bind.connect() as conn:
+            return [
+                row.id
+                for row in conn.execute(
+                    sa.text("select id from t where flag = 1 order by id")
+                )
+            ]
+
+    def _heads(self):
+        with self.bind.connect() as conn:
+            return MigrationContext.configure(conn).get_current_heads()
+
+    def test_resume(self):
+        eq_(self._upgrade(fail_at=8), [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+
+        # chunks preceding the failed one were committed along with the
+        # checkpoint
+        eq_(self._heads(), (self.a,))
+        eq_(self._flagged(), [1, 2, 3, 4, 5, 6])
+        eq_(self._get_checkpoints(), {self.b: {"last_id": 6}})
+
+        with self.bind.connect() as conn:
+            eq_(
+                conn.execute(
+                    sa.text("select * from alembic_version_checkpoint")
+                ).all(),
+                [(self.b, "last_id", "6")],
+            )
+
+        with mock.patch("alembic.runtime.migration.log") as log:
+            eq_(self._upgrade(), [[7, 8, 9], [10]])
+        eq_(
+            [
+                call[1][0] % call[1][1:]
+                for call in log.info.mock_calls
+                if call[1][0].startswith("Resuming")
+            ],
+            [
+                "Resuming upgrade %s -> %s from checkpoints last_id"
+                % (self.a, self.b)
+            ],
+        )
+
+        eq_(self._heads(), (self.b,))
+        eq_(self._flagged(), list(range(1, 11)))
+        eq_(self._get_checkpoints(), {})
+
+    def test_no_checkpoints(self):
+        eq_(self._get_checkpoints(), {})
+        eq_(self._upgrade(), [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10]])
+        eq_(self._flagged(), list(range(1, 11)))
+        eq_(self._get_checkpoints(), {})
+
+    def test_not_loaded_unless_used(self):
+        with mock.patch.object(
+            MigrationContext,
+            "get_checkpoints",
+            autospec=True,
+            side_effect=MigrationContext.get_checkpoints,
+        ) as get_checkpoints:
+            command.upgrade(self.cfg, self.a)
+            eq_(get_checkpoints.call_count, 0)
+
+            eq_(self._upgrade(), [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10]])
+            eq_(get_checkpoints.call_count, 1)
+
+    def test_deferred_write_mode(self):
+        self.cfg.attributes["write_mode"] = "deferred"
+        with expect_raises_message(
+            util.CommandError,
+            "checkpoint\\(\\) can't be used with "
+            "version_table_write_mode='deferred'",
+        ):
+            self._upgrade()
+
+    def test_outside_of_migration(self):
+        with self.bind.connect() as conn:
+            context = MigrationContext.configure(conn)
+            eq_(context.get_checkpoint("last_id", 5), 5)
+            with expect_raises_message(
+                util.CommandError,
+                "checkpoint\\(\\) may only be called within a migration "
+                "script",
+            ):
+                context.checkpoint("last_id", 10)
+
+    def test_offline(self):
+        context = MigrationContext.configure(
+            dialect_name="sqlite", opts={"as_sql": True}
+        )
+        eq_(context.get_checkpoints(), {})
+        context.checkpoint("last_id", 10)
+        eq_(context.get_checkpoint("last_id"), None)
+
+
 class EncodingTest(TestBase):
     def setUp(self):
         self.env = staging_env()
@@ -1231,3 +1692,399 @@ class RecursiveScriptDirectoryTest(TestBase):
             ("r1", "dir_1", "model1"),
             ("r2", "dir_1/nested", "model1"),
         )
+
+
+class RevisionCacheTest(TestBase):
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.set_main_option("revision_cache", "true")
+        self.a, self.b, self.c = three_rev_fixture(self.cfg)
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _load(self):
+        load_python_file = util.load_python_file
+        script = ScriptDirectory.from_config(self.cfg)
+        with mock.patch(
+            "alembic.util.load_python_file", side_effect=load_python_file
+        ) as load:
+            revs = list(script.walk_revisions())
+        return script, revs, load
+
+    def _cache_contents(self, path=None):
+        if path is None:
+            path = os.path.join(
+                _get_staging_directory(),
+                "scripts",
+                "__pycache__",
+                "alembic_revisions.json",
+            )
+        with open(path) as file_:
+            return json.load(file_)
+
+    def test_index_written(self):
+        script, revs, load = self._load()
+        eq_(load.call_count, 3)
+
+        files = self._cache_contents()["files"]
+        eq_(
+            sorted(entry["header"]["revision"] for entry in files.values()),
+            sorted([self.a, self.b, self.c]),
+        )
+        eq_(
+            files[script.get_revision(self.c).path]["header"],
+            {
+                "revision": self.c,
+                "down_revision": self.b,
+                "branch_labels": [],
+                "depends_on": [],
+                "replaces": [],
+                "doc": "Rev C",
+            },
+        )
+
+    def test_unchanged_files_not_loaded(self):
+        self._load()
+        script, revs, load = self._load()
+        eq_(load.call_count, 0)
+
+        eq_(script.get_heads(), [self.c])
+        eq_([rev.revision for rev in revs], [self.c, self.b, self.a])
+
+        rev_b = script.get_revision(self.b)
+        eq_(rev_b.doc, "Rev B, méil, %3")
+        eq_(rev_b.down_revision, self.a)
+        is_(rev_b._module, None)
+
+        assert callable(rev_b.module.upgrade)
+        eq_(rev_b.module.revision, self.b)
+
+    def test_changed_file_reloaded(self):
+        script, revs, load = self._load()
+        write_script(
+            script,
+            self.c,
+            """\
+"Rev C, changed"
+revision = '%s'
+down_revision = '%s'
+branch_labels = ('c_branch',)
+
+from alembic import op
+
+
+def upgrade():
+    op.execute("CREATE STEP 3")
+
+
+def downgrade():
+    op.execute("DROP STEP 3")
+
+"""
+            % (self.c, self.b),
+        )
+
+        script, revs, load = self._load()
+        eq_(load.call_count, 1)
+        rev_c = script.get_revision(self.c)
+        eq_(rev_c.doc, "Rev C, changed")
+        eq_(rev_c.branch_labels, {"c_branch"})
+
+        script, revs, load = self._load()
+        eq_(load.call_count, 0)
+        eq_(script.get_revision("c_branch@head").revision, self.c)
+
+    def test_removed_file_pruned(self):
+        script, revs, load = self._load()
+        os.remove(script.get_revision(self.c).path)
+
+        script, revs, load = self._load()
+        eq_(script.get_heads(), [self.b])
+        eq_(len(self._cache_contents()["files"]), 2)
+
+    def test_unreadable_index_ignored(self):
+        script, revs, load = self._load()
+        path = os.path.join(
+            script.dir, "__pycache__", "alembic_revisions.json"
+        )
+        with open(path, "w") as file_:
+            file_.write("not json")
+
+        script, revs, load = self._load()
+        eq_(load.call_count, 3)
+        eq_(len(self._cache_contents()["files"]), 3)
+
+    def test_cache_path(self):
+        path = os.path.join(_get_staging_directory(), "revisions.json")
+        self.cfg.set_main_option("revision_cache", "false")
+        self.cfg.set_main_option("revision_cache_path", path)
+
+        self._load()
+        eq_(len(self._cache_contents(path)["files"]), 3)
+
+    def test_upgrade_from_index(self):
+        self._load()
+
+        with capture_context_buffer() as buf:
+            command.upgrade(self.cfg, "head", sql=True)
+
+        output = buf.getvalue()
+        assert "CREATE STEP 1" in output
+        assert "CREATE STEP 2" in output
+        assert "CREATE STEP 3" in output
+
+
+class LazyLoadRevisionsTest(TestBase):
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.set_main_option("lazy_load_revisions", "true")
+        self.a, self.b, self.c = three_rev_fixture(self.cfg)
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _load(self):
+        load_python_file = util.load_python_file
+        script = ScriptDirectory.from_config(self.cfg)
+        with mock.patch(
+            "alembic.util.load_python_file", side_effect=load_python_file
+        ) as load:
+            revs = list(script.walk_revisions())
+        return script, revs, load
+
+    def test_revisions_not_loaded(self):
+        script, revs, load = self._load()
+        eq_(load.call_count, 0)
+
+        eq_([rev.revision for rev in revs], [self.c, self.b, self.a])
+        eq_([rev.doc for rev in revs], ["Rev C", "Rev B, méil, %3", "Rev A"])
+        for rev in revs:
+            is_(rev._module, None)
+
+        rev_b = script.get_revision(self.b)
+        assert callable(rev_b.module.upgrade)
+        eq_(rev_b.module.down_revision, self.a)
+
+    def test_generated_revision_parsed(self):
+        d = command.revision(
+            self.cfg,
+            message="rev d",
+            branch_label="d_branch",
+            depends_on=self.a,
+        )
+
+        script, revs, load = self._load()
+        eq_(load.call_count, 0)
+
+        rev_d = script.get_revision(d.revision)
+        eq_(rev_d.down_revision, self.c)
+        eq_(rev_d.branch_labels, {"d_branch"})
+        eq_(rev_d.dependencies, self.a)
+        eq_(rev_d.doc, "rev d")
+
+    @testing.combinations(
+        ("down_revision = %(b)r.strip()\n",),
+        ("down_revision = None\nif True:\n    down_revision = %(b)r\n",),
+        ("from os import path as down_revision\ndown_revision = %(b)r\n",),
+        ("down_revision: str\nfor down_revision in [%(b)r]:\n    pass\n",),
+        argnames="assignment",
+    )
+    def test_non_literal_loaded(self, assignment):
+        script = ScriptDirectory.from_config(self.cfg)
+        write_script(
+            script,
+            self.c,
+            """\
+"Rev C"
+revision = %(c)r
+%(assignment)s
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
+
+"""
+            % {
+                "c": self.c,
+                "assignment": assignment % {"b": self.b},
+            },
+        )
+
+        script, revs, load = self._load()
+        eq_(load.call_count, 1)
+        eq_(script.get_revision(self.c).down_revision, self.b)
+        eq_(script.get_heads(), [self.c])
+
+    def test_upgrade(self):
+        with capture_context_buffer() as buf:
+            command.upgrade(self.cfg, "%s:%s" % (self.a, self.c), sql=True)
+
+        output = buf.getvalue()
+        assert "CREATE STEP 1" not in output
+        assert "CREATE STEP 2" in output
+        assert "CREATE STEP 3" in output
+
+
+class RevisionLoadWorkersTest(TestBase):
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.cfg.set_main_option("recursive_version_locations", "true")
+
+        a, b, c = three_rev_fixture(self.cfg)
+        multi_heads_fixture(self.cfg, a, b, c)
+        for i in range(5):
+            command.revision(self.cfg, message="rev %d" % i, head="base")
+
+        os.makedirs(os.path.join(self.env.versions, "sub"))
+        for rev in list(self.env.walk_revisions())[0:4]:
+            shutil.move(
+                rev.path,
+                os.path.join(
+                    self.env.versions, "sub", os.path.basename(rev.path)
+                ),
+            )
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _revisions(self):
+        script = ScriptDirectory.from_config(self.cfg)
+        return (
+            list(script.revision_map._revision_map),
+            [rev.revision for rev in script.walk_revisions()],
+        )
+
+    @testing.combinations(("false",), ("true",), argnames="lazy")
+    def test_same_order_as_serial(self, lazy):
+        self.cfg.set_main_option("lazy_load_revisions", lazy)
+        serial = self._revisions()
+
+        self.cfg.set_main_option("revision_load_workers", "4")
+        with mock.patch(
+            "alembic.script.base.ThreadPoolExecutor",
+            side_effect=ThreadPoolExecutor,
+        ) as executor:
+            parallel = self._revisions()
+
+        eq_(executor.mock_calls[0], mock.call(4))
+        eq_(len(serial[1]), 11)
+        eq_(parallel, serial)
+
+
+class ReachabilityIndexTest(TestBase):
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.a, self.b, self.c = three_rev_fixture(self.cfg)
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def test_upgrade_downgrade(self):
+        self.cfg.set_main_option("revision_reachability_index", "true")
+        script = ScriptDirectory.from_config(self.cfg)
+        is_(script.revision_map.reachability_index, True)
+
+        eq_(
+            [
+                step.revision.revision
+                for step in script._upgrade_revs("head", ())
+            ],
+            [self.a, self.b, self.c],
+        )
+        eq_(
+            [
+                step.revision.revision
+                for step in script._downgrade_revs(self.a, (self.c,))
+            ],
+            [self.c, self.b],
+        )
+        assert "_reachability_index" in script.revision_map.__dict__
+
+
+class RevisionBundleTest(TestBase):
+    def setUp(self):
+        self.env = staging_env()
+        self.cfg = _sqlite_testing_config()
+        self.a, self.b, self.c = three_rev_fixture(self.cfg)
+        command.compile_versions(self.cfg)
+        self.cfg.set_main_option("revision_bundle", "true")
+
+    def tearDown(self):
+        clear_staging_env()
+
+    def _load(self):
+        load_python_file = util.load_python_file
+        script = ScriptDirectory.from_config(self.cfg)
+        with mock.patch(
+            "alembic.util.load_python_file", side_effect=load_python_file
+        ) as load:
+            revs = list(script.walk_revisions())
+        return script, revs, load
+
+    def test_files_not_loaded(self):
+        script, revs, load = self._load()
+        eq_(load.call_count, 0)
+        eq_([rev.revision for rev in revs], [self.c, self.b, self.a])
+        eq_(revs[0].down_revision, self.b)
+        eq_(revs[0].doc, "Rev C")
+
+    def test_module_from_bundle(self):
+        script, revs, load = self._load()
+        with mock.patch("alembic.util.load_python_file") as load:
+            module = revs[0].module
+        eq_(load.call_count, 0)
+        eq_(module.revision, self.c)
+        eq_(module.__file__, revs[0].path)
+
+    def test_changed_file_loaded(self):
+        write_script(
+            self.env,
+            self.b,
+            """\
+"Rev B, changed"
+revision = '%s'
+down_revision = '%s'
+"""
+            % (self.b, self.a),
+        )
+        script, revs, load = self._load()
+        eq_(load.call_count, 1)
+        eq_(script.get_revision(self.b).doc, "Rev B, changed")
+
+    def test_new_file_loaded(self):
+        command.revision(self.cfg, message="d")
+        script, revs, load = self._load()
+        eq_(load.call_count, 1)
+        eq_(len(revs), 4)
+
+    def test_other_python_version_ignored(self):
+        with mock.patch("importlib.util.MAGIC_NUMBER", b"\x00\x00\r\n"):
+            script, revs, load = self._load()
+        eq_(load.call_count, 3)
+
+    def test_bundle_path(self):
+        path = os.path.join(_get_staging_directory(), "versions.bundle")
+        self.cfg.set_main_option("revision_bundle", "false")
+        self.cfg.set_main_option("revision_bundle_path", path)
+        command.compile_versions(self.cfg)
+        assert os.path.exists(path)
+
+        script, revs, load = self._load()
+        eq_(load.call_count, 0)
+
+    def test_upgrade_from_bundle(self):
+        with capture_context_buffer() as buf:
+            command.upgrade(self.cfg, "%s:%s" % (self.a, self.c), sql=True)
+
+        output = buf.getvalue()
+        assert "CREATE STEP 1" not in output
+        assert "CREATE STEP 2" in output
+        assert "CREATE STEP 3" in output
@@ -3,6 +3,7 @@ from sqlalchemy import inspect
 from sqlalchemy import MetaData
 from sqlalchemy import String
 from sqlalchemy import Table
+from sqlalchemy.engine.default import CACHE_HIT
 
 from alembic import migration
 from alembic.testing import assert_raises
@@ -170,6 +171,81 @@ class TestMigrationContext(TestBase):
         eq_(context.get_current_heads(), ("a", "b"))
         assert "alembic_version" in inspect(self.connection).get_table_names()
 
+    def test_config_invalid_version_table_write_mode(self):
+        assert_raises_message(
+            CommandError,
+            "version_table_write_mode must be 'immediate' or 'deferred'; "
+            "got 'later'",
+            self.make_one,
+            connection=self.connection,
+            opts={"version_table_write_mode": "later"},
+        )
+
+    def test_config_deferred_w_transaction_per_migration(self):
+        assert_raises_message(
+            CommandError,
+            "version_table_write_mode='deferred' can't be used with "
+            "transaction_per_migration",
+            self.make_one,
+            connection=self.connection,
+            opts={
+                "version_table_write_mode": "deferred",
+                "transaction_per_migration": True,
+            },
+        )
+
+    def test_stamp_deferred(self):
+        context = self.make_one(
+            connection=self.connection,
+            opts={
+                "version_table": "version_table",
+                "version_table_write_mode": "deferred",
+            },
+        )
+        script = mock.Mock(
+            _stamp_revs=lambda revision, heads: [
+                _up(None, "a", True),
+                _up("a", "b"),
+                _up(None, "c", True),
+            ]
+        )
+
+        context.stamp(script, "b")
+        eq_(set(context.get_current_heads()), {"b", "c"})
+
+    def _run_failing_deferred(self, transactional_ddl):
+        context = self.make_one(
+            connection=self.connection,
+            opts={
+                "version_table": "version_table",
+                "version_table_write_mode": "deferred",
+                "transactional_ddl": transactional_ddl,
+                "fn": lambda heads, context: [
+                    _up(None, "a", True),
+                    _up("a", "b"),
+                    mock.Mock(
+                        migration_fn=mock.Mock(
+                            side_effect=Exception("migration failed")
+                        )
+                    ),
+                ],
+            },
+        )
+        assert_raises_message(
+            Exception, "migration failed", context.run_migrations
+        )
+        return context
+
+    def test_deferred_error_non_transactional_ddl(self):
+        # the migrations which completed can't be rolled back, so
+        # they're recorded
+        context = self._run_failing_deferred(False)
+        eq_(context.get_current_heads(), ("b",))
+
+    def test_deferred_error_transactional_ddl(self):
+        context = self._run_failing_deferred(True)
+        eq_(context.get_current_heads(), ())
+
 
 class UpdateRevTest(TestBase):
     __backend__ = True
@@ -264,6 +340,35 @@ class UpdateRevTest(TestBase):
             self.updater.update_to_step(_down("d2", "c2"))
             self._assert_heads(("c2", "d1"))
 
+    def test_statements_cached(self):
+        results = []
+        _exec = self.context.impl._exec
+
+        def exec_(*arg, **kw):
+            result = _exec(*arg, **kw)
+            results.append(result)
+            return result
+
+        with self.connection.begin():
+            with mock.patch.object(self.context.impl, "_exec", exec_):
+                self.updater.update_to_step(_up(None, "a", True))
+                self.updater.update_to_step(_up("a", "b"))
+                self.updater.update_to_step(_up("b", "c"))
+                self.updater.update_to_step(_up(None, "d", True))
+                self.updater.update_to_step(_down("c", None, True))
+                self.updater.update_to_step(_down("d", None, True))
+            self._assert_heads(())
+
+        # the second execution of each statement is compiled from
+        # the cache
+        eq_(
+            [
+                result.context.cache_hit
+                for result in results[2:4] + [results[5]]
+            ],
+            [CACHE_HIT, CACHE_HIT, CACHE_HIT],
+        )
+
     def test_update_no_match(self):
         with self.connection.begin():
             self.updater.update_to_step(_up(None, "a", True))
@@ -373,3 +478,119 @@ class UpdateRevTest(TestBase):
                 self.connection.dialect, "supports_sane_rowcount", False
             ):
                 self.updater.update_to_step(_down("a", None, True))
+
+
+class DeferredUpdateRevTest(TestBase):
+    __backend__ = True
+
+    @classmethod
+    def setup_class(cls):
+        cls.bind = config.db
+
+    def setUp(self):
+        self.connection = self.bind.connect()
+        self.context = migration.MigrationContext.configure(
+            connection=self.connection,
+            opts={
+                "version_table": "version_table",
+                "version_table_write_mode": "deferred",
+            },
+        )
+        with self.connection.begin():
+            version_table.create(self.connection)
+
+    def tearDown(self):
+        in_t = getattr(self.connection, "in_transaction", lambda: False)
+        if in_t():
+            self.connection.rollback()
+        with self.connection.begin():
+            version_table.drop(self.connection, checkfirst=True)
+        self.connection.close()
+
+    def _updater(self, *heads):
+        for head in heads:
+            self.connection.execute(
+                version_table.insert(), dict(version_num=head)
+            )
+        return migration.HeadMaintainer(self.context, heads, deferred=True)
+
+    def _assert_heads(self, updater, written, heads):
+        eq_(set(self.context.get_current_heads()), set(written))
+        eq_(updater.heads, set(heads))
+
+    def _flush(self, updater):
+        with mock.patch.object(
+            self.context.impl, "_exec", wraps=self.context.impl._exec
+        ) as exec_:
+            updater.flush()
+        return exec_.call_count
+
+    def test_writes_deferred_until_flush(self):
+        with self.connection.begin():
+            updater = self._updater()
+            updater.update_to_step(_up(None, "a", True))
+            updater.update_to_step(_up("a", "b"))
+            updater.update_to_step(_up(None, "c", True))
+            self._assert_heads(updater, (), ("b", "c"))
+
+            eq_(self._flush(updater), 2)
+            self._assert_heads(updater, ("b", "c"), ("b", "c"))
+
+    def test_single_update_for_chain(self):
+        with self.connection.begin():
+            updater = self._updater("a")
+            updater.update_to_step(_up("a", "b"))
+            updater.update_to_step(_up("b", "c"))
+            updater.update_to_step(_up("c", "d"))
+            self._assert_heads(updater, ("a",), ("d",))
+
+            eq_(self._flush(updater), 1)
+            self._assert_heads(updater, ("d",), ("d",))
+
+    def test_flush_no_changes(self):
+        with self.connection.begin():
+            updater = self._updater("a")
+            updater.update_to_step(_up("a", "b"))
+            updater.update_to_step(_down("b", "a"))
+
+            eq_(self._flush(updater), 0)
+            self._assert_heads(updater, ("a",), ("a",))
+
+    def test_flush_twice(self):
+        with self.connection.begin():
+            updater = self._updater("a")
+            updater.update_to_step(_up("a", "b"))
+            eq_(self._flush(updater), 1)
+            updater.update_to_step(_up("b", "c"))
+            eq_(self._flush(updater), 1)
+            self._assert_heads(updater, ("c",), ("c",))
+
+    def test_resolve_merges(self):
+        with self.connection.begin():
+            updater = self._updater("d1", "d2")
+            updater.update_to_step(_up(("d1", "d2"), "e"))
+
+            eq_(self._flush(updater), 2)
+            self._assert_heads(updater, ("e",), ("e",))
+
+    def test_unresolve_merges(self):
+        with self.connection.begin():
+            updater = self._updater("e")
+            updater.update_to_step(_down("e", ("d1", "d2")))
+            updater.update_to_step(_down("d2", "c2"))
+
+            eq_(self._flush(updater), 2)
+            self._assert_heads(updater, ("c2", "d1"), ("c2", "d1"))
+
+    def test_flush_no_match(self):
+        with self.connection.begin():
+            updater = self._updater("a")
+            updater.heads.add("x")
+            updater._written_heads.add("x")
+            updater.update_to_step(_up("x", "b"))
+            assert_raises_message(
+                CommandError,
+                "Online migration expected to match one row when updating "
+                "'x' to 'b' in 'version_table'; 0 found",
+                updater.flush,
+            )
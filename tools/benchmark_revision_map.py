@@ -0,0 +1,95 @@
+"""Time the construction of generated revision maps of increasing size,
+along with the cycle detection that's part of it.
+
+The maps are generated in the same way as for
+``benchmark_topological_sort.py``.   The time per revision should stay
+roughly constant as the size of the map grows.
+
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from pathlib import Path
+import sys
+import timeit
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+if True:  # avoid flake/zimports messing with the order
+    from alembic.script.revision import RevisionMap
+    from benchmark_topological_sort import generate_map
+
+
+def _build(map_: RevisionMap) -> None:
+    map_.__dict__.pop("_revision_map", None)
+    for rev in map_._generator():
+        rev.nextrev = rev._all_nextrev = frozenset()
+    map_._revision_map
+
+
+def main(args) -> None:
+    print(
+        "%10s %10s %14s %10s %14s"
+        % (
+            "revisions",
+            "map secs",
+            "usec/revision",
+            "cycle secs",
+            "usec/revision",
+        )
+    )
+    for size in args.sizes:
+        map_ = generate_map(size, args.seed)
+        map_elapsed = min(
+            timeit.repeat(lambda: _build(map_), number=1, repeat=args.repeat)
+        )
+
+        revision_map = map_._revision_map
+        rev_map = {rev.revision: rev for rev in map_._generator()}
+        detect_args = (
+            rev_map,
+            map_.get_revisions(map_.heads),
+            map_.get_revisions(map_.bases),
+            map_.get_revisions(map_._real_heads),
+            map_.get_revisions(map_._real_bases),
+        )
+        assert len(rev_map) == len(revision_map) - 2
+        cycle_elapsed = min(
+            timeit.repeat(
+                lambda: map_._detect_cycles(*detect_args),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(
+            "%10d %10.4f %14.2f %10.4f %14.2f"
+            % (
+                size,
+                map_elapsed,
+                map_elapsed / size * 1000000,
+                cycle_elapsed,
+                cycle_elapsed / size * 1000000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of revisions in the generated maps",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for the generated maps"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timings to take the best of for each map",
+    )
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,86 @@
+"""Measure the memory used by a generated revision map.
+
+The map is generated in the style of ``tests/_large_map.py``, with
+identifiers parsed separately for each revision as they would be when
+read from individual revision files.
+
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from pathlib import Path
+import random
+import sys
+import tracemalloc
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+if True:  # avoid flake/zimports messing with the order
+    from alembic.script.revision import Revision
+    from alembic.script.revision import RevisionMap
+
+
+def _copy(rev_id: str) -> str:
+    # a distinct string object, as produced when parsing each file
+    return "".join(list(rev_id))
+
+
+def generate_revisions(size: int, seed: int) -> list:
+    rand = random.Random(seed)
+    rev_ids = ["%012x" % rand.getrandbits(48) for _ in range(size)]
+    revs = [Revision(_copy(rev_ids[0]), None)]
+    open_heads = [0]
+    for idx in range(1, size):
+        roll = rand.random()
+        if len(open_heads) > 1 and roll < 0.3:
+            down = rand.sample(open_heads, 2)
+            for pos in down:
+                open_heads.remove(pos)
+        elif roll < 0.5 and len(open_heads) < 8:
+            down = [rand.choice(open_heads)]
+        else:
+            down = [rand.choice(open_heads)]
+            open_heads.remove(down[0])
+        revs.append(
+            Revision(
+                _copy(rev_ids[idx]),
+                tuple(_copy(rev_ids[pos]) for pos in down)
+                if len(down) > 1
+                else _copy(rev_ids[down[0]]),
+            )
+        )
+        open_heads.append(idx)
+    return revs
+
+
+def main(args) -> None:
+    tracemalloc.start()
+    revs = generate_revisions(args.size, args.seed)
+    map_ = RevisionMap(lambda: revs)
+    map_.heads
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        "%d revisions: %.1f MiB (%.0f bytes/revision), peak %.1f MiB"
+        % (
+            args.size,
+            current / 1048576,
+            current / args.size,
+            peak / 1048576,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=50000,
+        help="Number of revisions in the generated map",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for the generated map"
+    )
+    args = parser.parse_args()
+    main(args)
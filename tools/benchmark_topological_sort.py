@@ -0,0 +1,87 @@
+"""Time the topological sort of generated revision maps of increasing size.
+
+The maps are generated in the style of ``tests/_large_map.py``; a single
+base and head with many branch points, merge points and cross-branch
+dependencies.   The time per revision should stay roughly constant as the
+size of the map grows.
+
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from pathlib import Path
+import random
+import sys
+import timeit
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+if True:  # avoid flake/zimports messing with the order
+    from alembic.script.revision import Revision
+    from alembic.script.revision import RevisionMap
+
+
+def generate_map(size: int, seed: int) -> RevisionMap:
+    rand = random.Random(seed)
+    revs = [Revision("%012x" % rand.getrandbits(48), None)]
+    open_heads = [revs[0].revision]
+    while len(revs) < size - 1:
+        roll = rand.random()
+        if len(open_heads) > 1 and roll < 0.3:
+            down = tuple(rand.sample(open_heads, 2))
+            for rev_id in down:
+                open_heads.remove(rev_id)
+        elif roll < 0.5 and len(open_heads) < 8:
+            down = rand.choice(open_heads)
+        else:
+            down = rand.choice(open_heads)
+            open_heads.remove(down)
+        dependencies = None
+        if roll > 0.9:
+            dependencies = rand.choice(revs[-30:]).revision
+        rev = Revision(
+            "%012x" % rand.getrandbits(48), down, dependencies=dependencies
+        )
+        revs.append(rev)
+        open_heads.append(rev.revision)
+    revs.append(Revision("%012x" % rand.getrandbits(48), tuple(open_heads)))
+    rand.shuffle(revs)
+    return RevisionMap(lambda: revs)
+
+
+def main(args) -> None:
+    print("%10s %10s %14s" % ("revisions", "seconds", "usec/revision"))
+    for size in args.sizes:
+        map_ = generate_map(size, args.seed)
+        revs = list(map_.iterate_revisions("heads", "base"))
+        heads = map_.get_revisions(map_.heads)
+        elapsed = min(
+            timeit.repeat(
+                lambda: map_._topological_sort(revs, heads),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print("%10d %10.4f %14.2f" % (size, elapsed, elapsed / size * 1000000))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 2000, 4000, 8000, 16000],
+        help="Numbers of revisions in the generated maps",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for the generated maps"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timings to take the best of for each map",
+    )
+    args = parser.parse_args()
+    main(args)